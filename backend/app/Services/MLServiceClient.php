@@ -11,6 +11,17 @@ use Illuminate\Support\Facades\Log;
  */
 class MLServiceClient
 {
+    /**
+     * Seconds we wait for recommendation responses
+     */
+    private const RECOMMENDATION_TIMEOUT = 30;
+
+    /**
+     * Seconds of our timeout not offered to the ML service, covering the network and serialization,
+     * so an answer it degrades to fit its deadline still reaches us before we give up
+     */
+    private const DEADLINE_MARGIN = 3;
+
     private string $mlServiceUrl;
 
     public function __construct()
@@ -29,10 +40,9 @@ class MLServiceClient
     public function getRecommendations(int $limit): Response
     {
         try {
-            $response = Http::timeout(30)->get(
-                $this->mlServiceUrl.'/recommendations',
-                ['limit' => $limit]
-            );
+            $response = Http::timeout(self::RECOMMENDATION_TIMEOUT)
+                ->withHeaders($this->deadlineHeaders())
+                ->get($this->mlServiceUrl.'/recommendations', ['limit' => $limit]);
 
             Log::info('ML service getRecommendations response status: '.$response->status());
 
@@ -57,13 +67,12 @@ class MLServiceClient
         try {
             Log::info('Calling ML service: '.$this->mlServiceUrl."/recommendations/{$userId}");
 
-            $response = Http::timeout(30)->post(
-                $this->mlServiceUrl."/recommendations/{$userId}",
-                [
+            $response = Http::timeout(self::RECOMMENDATION_TIMEOUT)
+                ->withHeaders($this->deadlineHeaders())
+                ->post($this->mlServiceUrl."/recommendations/{$userId}", [
                     'user_data' => $userData,
                     'limit' => 10,
-                ]
-            );
+                ]);
 
             Log::info('ML service response status: '.$response->status());
 
@@ -74,6 +83,16 @@ class MLServiceClient
         }
     }
 
+    /**
+     * Headers telling the ML service how long it has to answer, so it stops work we would discard
+     *
+     * @return array<string, string>
+     */
+    private function deadlineHeaders(): array
+    {
+        return ['X-Request-Timeout' => (string) (self::RECOMMENDATION_TIMEOUT - self::DEADLINE_MARGIN)];
+    }
+
     /**
      * Update training data on ML service
      *
@@ -52,6 +52,22 @@ class MLServiceClientTest extends TestCase
         });
     }
 
+    public function test_recommendation_requests_send_their_deadline()
+    {
+        Http::fake([
+            '*/recommendations*' => Http::response(['recommendations' => []], 200),
+        ]);
+
+        $this->mlServiceClient->getRecommendations(10);
+        $this->mlServiceClient->getPersonalizedRecommendations(1, ['user_id' => 1]);
+
+        Http::assertSentCount(2);
+        // The ML service gets our 30 second timeout less the margin for the round trip
+        Http::assertNotSent(function ($request) {
+            return ! $request->hasHeader('X-Request-Timeout', '27');
+        });
+    }
+
     public function test_get_recommendations_handles_timeout()
     {
         Http::fake([
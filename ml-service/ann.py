@@ -0,0 +1,208 @@
+import os
+
+import numpy as np
+from scipy import sparse
+
+from ranking import top_k, top_k_rows
+
+_EMPTY_ROWS = np.empty(0, dtype=np.int64)
+_EMPTY_SCORES = np.empty(0, dtype=np.float32)
+ASSIGN_CHUNK_ROWS = 8192
+
+
+def assign_clusters(vectors, centroids):
+    """Index of the most similar centroid (by dot product) for every vector, in row chunks"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_CHUNK_ROWS):
+        block = vectors[start:start + ASSIGN_CHUNK_ROWS].astype(np.float32, copy=False)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(vectors, n_clusters, iterations=10, random_state=0):
+    """Unit-norm centroids clustering `vectors` by cosine similarity (Lloyd iterations)"""
+    rng = np.random.RandomState(random_state)
+    vectors = vectors.astype(np.float32, copy=False)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_clusters(vectors, centroids)
+        # Cluster sums as one sparse (clusters x rows) product instead of a scatter-add
+        membership = sparse.csr_matrix(
+            (np.ones(len(vectors), dtype=np.float32), (assignments, np.arange(len(vectors)))),
+            shape=(n_clusters, len(vectors))
+        )
+        sums = np.asarray(membership @ vectors)
+        norms = np.linalg.norm(sums, axis=1)
+        # Clusters that lost all members are re-seeded from random vectors
+        empty = norms == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        norms[empty] = np.linalg.norm(sums[empty], axis=1)
+        centroids = sums / np.maximum(norms, 1e-12)[:, None]
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index over L2-normalised vectors
+
+    Vectors are partitioned by spherical k-means and each list keeps the row
+    numbers of its members (CSR offsets/rows); the item matrix itself is only
+    referenced, not copied. A query scores the centroids, gathers the rows of
+    the `probes` closest lists, scores them with one matrix-vector product and
+    returns the best. More probes trade latency for recall; probing every list
+    is an exact search.
+    """
+
+    def __init__(self, n_lists=None, probes=32, iterations=10, sample_size=65536, random_state=0):
+        self.n_lists = n_lists
+        self.probes = probes
+        self.iterations = iterations
+        self.sample_size = sample_size
+        self.random_state = random_state
+        self.key = ''
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.int32)
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def fit(self, vectors, key=''):
+        """Cluster `vectors` (rows of the item matrix); `key` identifies what they were built from"""
+        n_rows = len(vectors)
+        n_lists = self.n_lists or max(1, int(4 * np.sqrt(n_rows)))
+        n_lists = min(n_lists, n_rows)
+        self.key = key
+        if not n_rows:
+            self.__init__(self.n_lists, self.probes, self.iterations, self.sample_size, self.random_state)
+            self.key = key
+            return self
+
+        # Centroids are trained on a sample; every vector is then assigned to its nearest one
+        rng = np.random.RandomState(self.random_state)
+        sample = vectors if n_rows <= self.sample_size else vectors[np.sort(rng.choice(n_rows, self.sample_size, replace=False))]
+        self.centroids = spherical_kmeans(sample, n_lists, self.iterations, self.random_state)
+        assignments = assign_clusters(vectors, self.centroids)
+
+        order = np.argsort(assignments, kind='stable')
+        self.offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=n_lists), out=self.offsets[1:])
+        self.rows = order.astype(np.int32)
+        self.vectors = vectors
+        return self
+
+    def search(self, query, k, probes=None, threshold=None):
+        """(rows, scores) of the k best items in the probed lists, best first"""
+        if not len(self.rows) or k <= 0 or not np.any(query):
+            return _EMPTY_ROWS, _EMPTY_SCORES
+        query = np.asarray(query, dtype=np.float32)
+        probes = min(probes or self.probes, len(self.centroids))
+        lists = top_k(self.centroids @ query, probes)
+
+        # Gather the probed lists' positions at once (same trick as the text index postings)
+        starts = self.offsets[lists]
+        lengths = self.offsets[lists + 1] - starts
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(int(lengths.sum()))
+        rows = self.rows[positions]
+        scores = self.vectors[rows].astype(np.float32, copy=False) @ query
+        best = top_k(scores, k, threshold=threshold)
+        return rows[best].astype(np.int64), scores[best]
+
+    def search_batch(self, queries, k, probes=None, threshold=None):
+        """search() for every row of `queries`, yielding (rows, scores) per query in order
+
+        Queries are grouped by the lists they probe, so each probed list is
+        gathered once and scored against all of its queries with one matrix
+        product; each (list, query) pair keeps its k best before the final merge.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        n_queries = len(queries)
+        if not len(self.rows) or k <= 0:
+            for _ in range(n_queries):
+                yield _EMPTY_ROWS, _EMPTY_SCORES
+            return
+        probes = min(probes or self.probes, len(self.centroids))
+        lists, _ = top_k_rows(queries @ self.centroids.T, probes)
+        pair_queries = np.repeat(np.arange(n_queries), probes)
+        pair_lists = lists.ravel()
+        order = np.argsort(pair_lists, kind='stable')
+        boundaries = np.flatnonzero(np.diff(pair_lists[order])) + 1
+
+        candidate_queries, candidate_rows, candidate_scores = [], [], []
+        for group in np.split(order, boundaries):
+            if not len(group):
+                continue
+            list_id = pair_lists[group[0]]
+            rows = self.rows[self.offsets[list_id]:self.offsets[list_id + 1]]
+            if not len(rows):
+                continue
+            group_queries = pair_queries[group]
+            scores = queries[group_queries] @ self.vectors[rows].astype(np.float32, copy=False).T
+            best, best_scores = top_k_rows(scores, k)
+            candidate_queries.append(np.repeat(group_queries, best.shape[1]))
+            candidate_rows.append(rows[best].ravel())
+            candidate_scores.append(best_scores.ravel())
+
+        if not candidate_queries:
+            for _ in range(n_queries):
+                yield _EMPTY_ROWS, _EMPTY_SCORES
+            return
+        candidate_queries = np.concatenate(candidate_queries)
+        candidate_rows = np.concatenate(candidate_rows).astype(np.int64)
+        candidate_scores = np.concatenate(candidate_scores)
+        keep = np.isfinite(candidate_scores) & np.any(queries, axis=1)[candidate_queries]
+        if threshold is not None:
+            keep &= candidate_scores > threshold
+        candidate_queries, candidate_rows, candidate_scores = (
+            candidate_queries[keep], candidate_rows[keep], candidate_scores[keep]
+        )
+        # Best first within each query, then cut every query's run to k
+        order = np.lexsort((-candidate_scores, candidate_queries))
+        candidate_queries, candidate_rows, candidate_scores = (
+            candidate_queries[order], candidate_rows[order], candidate_scores[order]
+        )
+        starts = np.searchsorted(candidate_queries, np.arange(n_queries + 1))
+        for query in range(n_queries):
+            end = min(starts[query] + k, starts[query + 1])
+            yield candidate_rows[starts[query]:end], candidate_scores[starts[query]:end]
+
+    def save(self, path):
+        """Persist the lists atomically as an .npz file (the item vectors are stored by their owner)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=self.centroids, offsets=self.offsets, rows=self.rows,
+            key=np.array(self.key),
+            meta=np.array([self.probes, self.iterations, self.sample_size, self.random_state], dtype=np.int64)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, vectors):
+        """Load saved lists over `vectors`, the same item matrix they were fitted on"""
+        with np.load(path) as data:
+            probes, iterations, sample_size, random_state = data['meta'].tolist()
+            index = cls(n_lists=len(data['centroids']), probes=probes, iterations=iterations,
+                        sample_size=sample_size, random_state=random_state)
+            index.centroids = data['centroids']
+            index.offsets = data['offsets']
+            index.rows = data['rows']
+            index.key = str(data['key'])
+        if len(vectors) != len(index.rows):
+            raise ValueError(f"IVF index covers {len(index.rows)} items, got {len(vectors)} vectors")
+        index.vectors = vectors
+        return index
+
+    def nbytes(self):
+        return self.centroids.nbytes + self.offsets.nbytes + self.rows.nbytes
+
+    def stats(self):
+        sizes = np.diff(self.offsets)
+        return {
+            'items': len(self),
+            'lists': len(self.centroids),
+            'probes': self.probes,
+            'largest_list': int(sizes.max()) if len(sizes) else 0,
+            'bytes': self.nbytes(),
+        }
@@ -1,4 +1,5 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
@@ -6,10 +7,36 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.ensemble import RandomForestClassifier
 import pickle
+import json
 import os
 import requests
 from datetime import datetime, timedelta
 import logging
+import hmac
+import threading
+import time
+from popularity import DecayedCounters
+from sketches import InteractionAnalytics
+from interactions import InteractionLog, interaction_weights
+from collaborative import ItemItemModel
+from factorization import ImplicitALS
+from precompute import PrecomputedStore, precompute_top_n, seen_matrix
+from ranking import top_k
+from catalog import Catalog, CatalogRecords, days_old, parse_epoch
+from autocomplete import normalize_query
+from caching import ResultCache, SingleFlight
+from similarity import SIMILARITY_MODES, SimilarityIndexStore
+from feature_hashing import HashingFeatureStore
+from dedup import DUPLICATE_THRESHOLD, earlier_duplicates
+from snapshot import CatalogSnapshotStore
+from resilience import CircuitBreaker, CircuitOpenError, ConcurrencyLimiter, Overloaded
+from metrics import CONTENT_TYPE, MetricsRegistry
+from profiling import Profiler
+from deadlines import DEADLINE_HEADER, Deadline, DeadlineExceeded, current_deadline, reset_deadline, set_deadline
+from structured_logging import (
+    REQUEST_ID_HEADER, StructuredLogger, configure_logging, current_request_id, parse_sample_rates,
+    request_id_from_header, reset_request_id, set_request_id
+)
 
 app = Flask(__name__)
 CORS(app)
@@ -18,9 +45,50 @@ CORS(app)
 def health():
     return {'status': 'ok', 'service': 'ml-service'}
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: records are queued and written by a background thread, so requests never wait on stderr
+log_handler = configure_logging(os.getenv('LOG_LEVEL', 'INFO').upper(), int(os.getenv('LOG_QUEUE_SIZE', 10000)))
 logger = logging.getLogger(__name__)
+# Hot-path events are key-value and sampled per event; override with LOG_SAMPLE_RATES=event=rate,...
+DEFAULT_LOG_SAMPLE_RATES = 'recommendations.generated=0.01,interaction.tracked=0.01,recommendations.fallback=0.1'
+log = StructuredLogger(logger, parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', DEFAULT_LOG_SAMPLE_RATES)))
+
+# Categories with the most user activity, boosted in trending scores
+HIGH_ACTIVITY_CATEGORIES = ['tehnologija', 'technology', 'it', 'poslovanje', 'business']
+
+# Trending time decay: (content younger than N days, factor); older content gets the default
+TRENDING_TIME_BUCKETS = [(1, 1.5), (7, 1.2), (30, 1.0), (90, 0.8)]
+TRENDING_TIME_DEFAULT = 0.6
+
+# Size of the popular list served when a user's data is unavailable
+FALLBACK_RECOMMENDATIONS = 5
+
+# Admission control: endpoint -> class sharing one concurrency limit; unlisted endpoints are never limited
+ENDPOINT_CLASSES = {
+    'get_general_recommendations': 'read',
+    'get_trending': 'read',
+    'autocomplete': 'read',
+    'find_similar_abbreviations': 'read',
+    'check_duplicate': 'read',
+    'track_interaction': 'read',
+    'get_abbreviation_analytics': 'read',
+    'get_heavy_hitters': 'read',
+    'get_user_profile': 'read',
+    'get_recommendations': 'scoring',
+    'get_batch_recommendations': 'scoring',
+    'find_similar_abbreviations_batch': 'scoring',
+    'check_duplicate_batch': 'scoring',
+    'train_model': 'training',
+    'update_training_data': 'training',
+    'precompute_recommendations': 'training',
+}
+# Queue priorities (lower is served first); batch endpoints yield to interactive requests unless asked otherwise
+PRIORITY_HEADER = 'X-Request-Priority'
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+LOW_PRIORITY_ENDPOINTS = {'get_batch_recommendations', 'find_similar_abbreviations_batch', 'check_duplicate_batch'}
+# Defaults per class: (max concurrent, max queued)
+ADMISSION_LIMITS = {'read': (32, 64), 'scoring': (8, 16), 'training': (1, 0)}
+# Admin endpoints (profiling) compare this header with PROFILING_TOKEN
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
 
 class MLService:
     def __init__(self):
@@ -30,22 +98,204 @@ class MLService:
         self.abbreviations_cache = []
         self.cache_timestamp = None
         self.cache_ttl = 300  # 5 minutes
+        self.popularity = DecayedCounters()
+        self.analytics = InteractionAnalytics(
+            epsilon=float(os.getenv('ANALYTICS_CMS_EPSILON', 0.001)),
+            delta=float(os.getenv('ANALYTICS_CMS_DELTA', 0.01)),
+            user_error=float(os.getenv('ANALYTICS_HLL_ERROR', 0.01)),
+            max_keys=int(os.getenv('ANALYTICS_MAX_KEYS', 20000))
+        )
+        self.interaction_log = InteractionLog(int(os.getenv('INTERACTION_LOG_CAPACITY', 1_000_000)))
+        self.item_similarity = ItemItemModel(top_n=int(os.getenv('CF_TOP_N', 20)))
+        self.cf_weight = float(os.getenv('CF_WEIGHT', 0.3))
+        self.cf_rebuild_every = int(os.getenv('CF_REBUILD_EVERY', 500))
+        self.cf_rebuild_interval = int(os.getenv('CF_REBUILD_INTERVAL', 60))
+        self._cf_rebuild_lock = threading.Lock()
+        self._catalog_state = (None, Catalog.from_records([]))
+        self.artifacts_dir = os.getenv('ARTIFACTS_DIR', 'models')
+        self.factor_model = ImplicitALS()
+        self.factor_min_interactions = int(os.getenv('ALS_MIN_INTERACTIONS', 50))
+        self._factor_training_lock = threading.Lock()
+        self.precomputed = PrecomputedStore(
+            os.path.join(self.artifacts_dir, 'precomputed'),
+            max_age=int(os.getenv('PRECOMPUTED_MAX_AGE', 86400))
+        )
+        self._precompute_lock = threading.Lock()
+        # Guards the catalog waiting to be indexed and published (the newest fetched one wins)
+        self._publish_lock = threading.Lock()
+        self._pending_publish = None
+        self._publishing = False
+        self.similarity_cache = ResultCache(int(os.getenv('SIMILARITY_CACHE_BYTES', 32 * 1024 * 1024)))
+        self.batch_max_queries = int(os.getenv('SIMILARITY_BATCH_MAX_QUERIES', 1000))
+        self.batch_max_limit = int(os.getenv('SIMILARITY_BATCH_MAX_LIMIT', 100))
+        self.duplicate_batch_max_items = int(os.getenv('DUPLICATE_BATCH_MAX_ITEMS', 10000))
+        self.duplicate_batch_max_limit = int(os.getenv('DUPLICATE_BATCH_MAX_LIMIT', 100))
+        self.similarity_mode = os.getenv('SIMILARITY_MODE', 'tfidf')
+        if self.similarity_mode not in SIMILARITY_MODES:
+            logger.warning(f"Unknown SIMILARITY_MODE '{self.similarity_mode}', using tfidf")
+            self.similarity_mode = 'tfidf'
+        self.lsa_dimensions = int(os.getenv('LSA_DIMENSIONS', 128))
+        self.lsa_dtype = np.float16 if os.getenv('LSA_DTYPE', 'float32') == 'float16' else np.float32
+        self.ann_min_items = int(os.getenv('ANN_MIN_ITEMS', 50000))
+        self.ann_probes = int(os.getenv('ANN_PROBES', 32))
+        self.similarity_store = SimilarityIndexStore(os.path.join(self.artifacts_dir, 'similarity'))
+        # Hashed term counts survive catalog refreshes, so each refresh only vectorizes changed abbreviations
+        self.hashing_features = HashingFeatureStore(int(os.getenv('HASHING_FEATURES', 2 ** 18)))
+        self.snapshots = CatalogSnapshotStore(os.path.join(self.artifacts_dir, 'snapshot'))
+        self._refresh_lock = threading.Lock()
+        # Backend calls fail fast while the backend is failing, instead of each waiting out its timeout
+        self.backend_breaker = CircuitBreaker(
+            'backend',
+            failure_rate=float(os.getenv('BACKEND_BREAKER_FAILURE_RATE', 0.5)),
+            window=int(os.getenv('BACKEND_BREAKER_WINDOW', 20)),
+            min_calls=int(os.getenv('BACKEND_BREAKER_MIN_CALLS', 5)),
+            reset_timeout=float(os.getenv('BACKEND_BREAKER_RESET_TIMEOUT', 30))
+        )
+        self._fallback_state = (None, [])
+        # Requests carry a deadline (DEADLINE_HEADER or this default); work is cut to what the caller will wait for
+        self.request_timeout = float(os.getenv('REQUEST_TIMEOUT', 30))
+        self.catalog_fetch_timeout = 15
+        self.similarity_min_budget = float(os.getenv('SIMILARITY_MIN_BUDGET', 0.05))
+        self.deadline_stats = {'rejected': 0, 'backend_skipped': 0, 'similarity_skipped': 0, 'trending_served': 0}
+        # Bounded concurrency per endpoint class; overflow is shed with 429/503 instead of queueing without limit
+        queue_timeout = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 1.0))
+        self.admission = {
+            name: ConcurrencyLimiter(
+                name,
+                int(os.getenv(f"ADMISSION_{name.upper()}_CONCURRENCY", concurrency)),
+                int(os.getenv(f"ADMISSION_{name.upper()}_QUEUE", queue)),
+                queue_timeout
+            )
+            for name, (concurrency, queue) in ADMISSION_LIMITS.items()
+        }
+        self.metrics = MetricsRegistry()
+        self.register_metrics()
+        # Identical concurrent computations (catalog refresh, user data, scoring, similarity) run once
+        self.single_flight = SingleFlight()
+        # On-demand CPU/allocation profiling, only reachable with PROFILING_TOKEN; request hooks skip it while idle
+        self.profiler = Profiler(os.path.join(self.artifacts_dir, 'profiles'), token=os.getenv('PROFILING_TOKEN'))
         self.load_models()
+        self.load_factor_model()
+        self.load_precomputed()
+        self.load_snapshot()
+        self.start_startup_profile()
+    
+    def start_startup_profile(self):
+        """Capture a profile from boot when PROFILE_SECONDS or PROFILE_REQUESTS is set"""
+        seconds = os.getenv('PROFILE_SECONDS')
+        requests_count = os.getenv('PROFILE_REQUESTS')
+        if not seconds and not requests_count:
+            return
+        try:
+            self.profiler.start(
+                mode=os.getenv('PROFILE_MODE', 'sample'),
+                seconds=float(seconds) if seconds else None,
+                requests=int(requests_count) if requests_count else None,
+                allocations=os.getenv('PROFILE_ALLOCATIONS', 'false').lower() == 'true'
+            )
+            logger.info(f"Profiling started, writing to {self.profiler.directory}")
+        except ValueError as e:
+            logger.warning(f"Startup profile not started: {e}")
+    
+    def register_metrics(self):
+        """Request and stage histograms, backend outcomes, and gauges read from the service's state on scrape"""
+        metrics = self.metrics
+        self.request_seconds = metrics.histogram(
+            'request_duration_seconds', 'Request latency by route, method and status', ('route', 'method', 'status')
+        )
+        self.stage_seconds = metrics.histogram(
+            'stage_duration_seconds',
+            'Time per processing stage: fetch, vectorize, score (includes its vectorize), rank, serialize',
+            ('stage',)
+        )
+        self.backend_calls = metrics.counter('backend_requests_total', 'Backend API calls by outcome', ('outcome',))
+        
+        def catalog():
+            return self._catalog_state[1]
+        metrics.collected('catalog_rows', 'Rows in the cached catalog', lambda: {(): len(catalog())})
+        metrics.collected('catalog_age_seconds', 'Seconds since the cached catalog was built',
+                          lambda: {(): time.time() - catalog().built_at})
+        metrics.collected(
+            'model_info', 'Versions of the catalog snapshot and models being served',
+            lambda: {(catalog().version, self.snapshots.current or '', self.factor_model.version,
+                      self.similarity_mode, int(self.model is not None)): 1},
+            labelnames=('catalog_version', 'snapshot', 'factor_model_version', 'similarity_mode', 'classifier_loaded')
+        )
+        metrics.collected('precomputed_age_seconds', 'Age of the precomputed recommendations (NaN if none)',
+                          lambda: {(): self.precomputed.stats()['age_seconds']})
+        metrics.collected(
+            'cache_lookups_total', 'Similarity result cache lookups by result',
+            lambda: {('hit',): self.similarity_cache.hits, ('miss',): self.similarity_cache.misses},
+            kind='counter', labelnames=('result',)
+        )
+        metrics.collected('cache_hit_ratio', 'Similarity result cache hit ratio',
+                          lambda: {(): self.similarity_cache.stats()['hit_ratio']})
+        metrics.collected('cache_saved_cpu_seconds_total', 'CPU time saved by similarity result cache hits',
+                          lambda: {(): self.similarity_cache.stats()['saved_cpu_seconds']}, kind='counter')
+        metrics.collected('coalesced_calls_total', 'Calls that shared an in-flight computation, by operation',
+                          lambda: {(op,): n for op, n in self.single_flight.stats()['coalesced_by_operation'].items()},
+                          kind='counter', labelnames=('operation',))
+        metrics.collected('backend_circuit_open', '1 while the backend circuit breaker is open or half-open',
+                          lambda: {(): int(self.backend_breaker.stats()['state'] != 'closed')})
+        metrics.collected('deadline_degradations_total', 'Work skipped or cut short by request deadlines',
+                          lambda: {(kind,): n for kind, n in self.deadline_stats.items()},
+                          kind='counter', labelnames=('kind',))
+        metrics.collected('admission_active', 'Requests holding an admission slot, by class',
+                          lambda: {(name,): l.stats()['active'] for name, l in self.admission.items()},
+                          labelnames=('class',))
+        metrics.collected('admission_queue_depth', 'Requests waiting for an admission slot, by class',
+                          lambda: {(name,): l.stats()['queue_depth'] for name, l in self.admission.items()},
+                          labelnames=('class',))
+        metrics.collected(
+            'admission_rejected_total', 'Requests shed by admission control, by class and status',
+            lambda: {(name, status): l.rejected[status] for name, l in self.admission.items() for status in l.rejected},
+            kind='counter', labelnames=('class', 'status')
+        )
+        metrics.collected('log_records_dropped_total', 'Log records dropped because the log queue was full',
+                          lambda: {(): log_handler.dropped}, kind='counter')
+        metrics.collected('log_records_sampled_out_total', 'Log events skipped by their sample rate, by event',
+                          lambda: {(event,): n for event, n in log.stats()['sampled_out'].items()},
+                          kind='counter', labelnames=('event',))
     
     def get_cached_abbreviations(self):
         """Get abbreviations with caching to avoid repeated API calls"""
         current_time = datetime.now()
         
+        # Attach to a snapshot another worker on this host has published
+        if self.snapshots.changed():
+            self.load_snapshot(refresh=False)
+        
         # Check if cache is valid
         if (self.cache_timestamp and 
             self.abbreviations_cache and 
             (current_time - self.cache_timestamp).seconds < self.cache_ttl):
             return self.abbreviations_cache
         
-        # Fetch fresh data
+        # Only the host's refresher fetches; other workers keep serving until it publishes,
+        # unless it has gone quiet (idle or stuck) for two TTLs, in which case they fetch and publish themselves
+        if self.abbreviations_cache and not self.snapshots.acquire_refresh():
+            age = self.snapshots.age()
+            if age is not None and age < 2 * self.cache_ttl:
+                return self.abbreviations_cache
+        # A caller that can't wait out a full fetch gets the stale catalog while it refreshes in the background
+        if self.abbreviations_cache and current_deadline().remaining() < self.catalog_fetch_timeout:
+            self.run_in_background(self._refresh_lock, self.fetch_abbreviations, 'catalog refresh')
+            return self.abbreviations_cache
+        return self.fetch_abbreviations()
+    
+    def fetch_abbreviations(self):
+        """Fetch the catalog from the backend and swap it in; callers arriving during a fetch share it"""
         try:
-            backend_url = os.getenv('BACKEND_URL', 'http://backend:8000')
-            response = requests.get(f"{backend_url}/api/abbreviations", timeout=15)
+            return self.single_flight.do(('catalog',), self.fetch_catalog, timeout=current_deadline().timeout())
+        except (DeadlineExceeded, TimeoutError):
+            # The caller's budget ran out first; a fetch in progress goes on for the others
+            self.deadline_stats['backend_skipped'] += 1
+            return self.abbreviations_cache
+    
+    def fetch_catalog(self):
+        """One backend catalog fetch; keeps the cached data if the fetch fails"""
+        try:
+            response = self.backend_get('/api/abbreviations', timeout=self.catalog_fetch_timeout)
             
             if response.status_code == 200:
                 api_response = response.json()
@@ -53,22 +303,249 @@ class MLService:
                 
                 # Handle paginated response
                 if isinstance(data, dict) and 'data' in data:
-                    self.abbreviations_cache = data['data']
+                    records = data['data']
                 elif isinstance(data, list):
-                    self.abbreviations_cache = data
+                    records = data
                 else:
-                    self.abbreviations_cache = []
+                    records = []
                 
-                self.cache_timestamp = current_time
-                logger.info(f"Cached {len(self.abbreviations_cache)} abbreviations")
+                # Keep only the columnar snapshot; the raw JSON list is dropped here
+                catalog = Catalog.from_records(records)
+                self.abbreviations_cache = catalog.records()
+                self.cache_timestamp = datetime.now()
+                self.get_catalog(self.abbreviations_cache)
+                log.info(
+                    'catalog.cached', rows=len(catalog), version=catalog.version,
+                    columnar_mb=round(catalog.memory_usage()['total'] / 1e6, 1)
+                )
+                # Build indexes off the request path, then persist them for the next restart;
+                # requests arriving first build lazily
+                self.publish_catalog(catalog)
                 
             return self.abbreviations_cache
             
         except Exception as e:
-            logger.error(f"Error fetching abbreviations: {e}")
+            log.error('catalog.fetch_failed', error=e)
             # Return cached data if available, even if stale
             return self.abbreviations_cache
     
+    def backend_get(self, path, timeout=None):
+        """GET a backend API path through the circuit breaker; errors and 5xx responses count as failures
+
+        The timeout is cut to the request's remaining budget, which is also
+        forwarded in DEADLINE_HEADER; DeadlineExceeded is raised when none is left.
+        """
+        try:
+            budget = current_deadline().timeout(timeout)
+        except DeadlineExceeded:
+            self.deadline_stats['backend_skipped'] += 1
+            self.backend_calls.inc(outcome='deadline')
+            raise
+        cut = budget is not None and (timeout is None or budget < timeout)
+        headers = {DEADLINE_HEADER: f"{budget:.3f}"} if budget is not None else {}
+        request_id = current_request_id()
+        if request_id != '-':
+            headers[REQUEST_ID_HEADER] = request_id
+        backend_url = os.getenv('BACKEND_URL', 'http://backend:8000')
+        try:
+            with self.stage_seconds.time(stage='fetch'):
+                response = self.backend_breaker.call(
+                    requests.get, f"{backend_url}{path}", timeout=budget,
+                    headers=headers,
+                    is_failure=lambda response: response.status_code >= 500,
+                    # Timing out on our own budget says nothing about the backend's health
+                    ignore=(requests.Timeout,) if cut else ()
+                )
+        except CircuitOpenError:
+            self.backend_calls.inc(outcome='circuit_open')
+            raise
+        except requests.Timeout:
+            self.backend_calls.inc(outcome='timeout')
+            raise
+        except Exception:
+            self.backend_calls.inc(outcome='error')
+            raise
+        status = response.status_code
+        self.backend_calls.inc(outcome='http_5xx' if status >= 500 else 'http_4xx' if status >= 400 else 'success')
+        return response
+    
+    def publish_catalog(self, catalog):
+        """Build a fetched catalog's indexes and publish its snapshot on a background thread
+
+        A catalog fetched while an earlier one is still being built waits for
+        it instead of being dropped; only the newest waiting catalog is built.
+        """
+        with self._publish_lock:
+            self._pending_publish = catalog
+            if self._publishing:
+                return False
+            self._publishing = True
+        threading.Thread(target=self._publish_pending, daemon=True).start()
+        return True
+    
+    def _publish_pending(self):
+        while True:
+            with self._publish_lock:
+                catalog, self._pending_publish = self._pending_publish, None
+                if catalog is None:
+                    self._publishing = False
+                    return
+            try:
+                catalog.build_indexes()
+                self.similarity_index(catalog)
+                self.save_snapshot(catalog)
+                logger.info("Background catalog index build finished")
+            except Exception as e:
+                logger.error(f"Error in background catalog index build: {e}")
+    
+    def load_snapshot(self, refresh=True):
+        """Serve the last persisted catalog snapshot right away and, if this worker is the refresher, refresh it in the background"""
+        try:
+            snapshot = self.snapshots.load()
+            if snapshot is None:
+                return False
+            catalog = snapshot.catalog
+            if snapshot.similarity_index is not None:
+                catalog.add_similarity_index(snapshot.similarity_index)
+            # Item neighbours only seed an empty model; afterwards each worker folds in its own interactions
+            if snapshot.item_state is not None and not len(self.item_similarity):
+                self.item_similarity.load_state(*snapshot.item_state)
+            self.abbreviations_cache = catalog.records()
+            self.cache_timestamp = datetime.now()
+            self.get_catalog(self.abbreviations_cache)
+            logger.info(f"Loaded catalog snapshot {snapshot.version}: {self.snapshots.stats()}")
+        except Exception as e:
+            logger.error(f"Error loading catalog snapshot: {e}")
+            return False
+        if refresh and self.snapshots.acquire_refresh():
+            self.run_in_background(self._refresh_lock, self.fetch_abbreviations, 'catalog refresh')
+        return True
+    
+    def save_snapshot(self, catalog):
+        """Persist the catalog with its TF-IDF index, item neighbours and trending scores for warm restarts"""
+        self.trending_scores(catalog, datetime.now())
+        version = self.snapshots.write(catalog, self.similarity_index(catalog), self.item_similarity)
+        if version is None:
+            logger.warning(f"Could not write catalog snapshot: {self.snapshots.stats()}")
+        return version
+    
+    def trending_scores(self, catalog, current_time):
+        """Trending scores of every catalog row, reused for cache_ttl seconds (including a snapshot's saved scores)"""
+        now = current_time.timestamp()
+        if catalog.trending is not None and 0 <= now - catalog.trending[1] < self.cache_ttl:
+            return catalog.trending[0]
+        scores = calculate_trending_scores(catalog, current_time)
+        catalog.trending = (scores, now)
+        return scores
+    
+    def get_catalog(self, abbreviations=None):
+        """Columnar catalog for the cached abbreviations, rebuilt only when the cached list changes"""
+        if abbreviations is None:
+            abbreviations = self.get_cached_abbreviations()
+        source, catalog = self._catalog_state
+        if abbreviations is source:
+            return catalog
+        
+        if isinstance(abbreviations, CatalogRecords):
+            catalog = abbreviations.catalog
+        else:
+            catalog = Catalog.from_records(abbreviations)
+        # Re-align per-abbreviation state with the new catalog rows
+        self.popularity.reindex(catalog.ids)
+        self._catalog_state = (abbreviations, catalog)
+        return catalog
+    
+    def record_interaction(self, user_id, abbreviation_id, interaction_type):
+        """Feed a tracked interaction into the streaming popularity counters"""
+        self.interaction_log.append(user_id, abbreviation_id, interaction_type or 'view')
+        self.maybe_refresh_item_similarity()
+        
+        # Use whatever catalog is cached; tracking must never trigger a backend fetch
+        catalog = self.get_catalog(self.abbreviations_cache)
+        if not self.popularity.track(abbreviation_id, interaction_type or 'view'):
+            return False
+        
+        abbreviation_id = int(abbreviation_id)
+        self.analytics.record(user_id, abbreviation_id, catalog.category(catalog.row_of(abbreviation_id)))
+        return True
+    
+    def maybe_refresh_item_similarity(self):
+        """Fold new interactions into the item-item model in the background when enough have arrived"""
+        pending = self.item_similarity.pending(self.interaction_log)
+        built_at = self.item_similarity.built_at or 0
+        if pending < self.cf_rebuild_every and not (pending and time.time() - built_at >= self.cf_rebuild_interval):
+            return False
+        return self.run_in_background(
+            self._cf_rebuild_lock, lambda: self.item_similarity.update(self.interaction_log), 'item-item model update'
+        )
+    
+    def run_in_background(self, lock, target, description):
+        """Run `target` on a daemon thread unless a job guarded by `lock` is already running"""
+        if not lock.acquire(blocking=False):
+            return False
+        
+        def run():
+            try:
+                target()
+                logger.info(f"Background {description} finished")
+            except Exception as e:
+                logger.error(f"Error in background {description}: {e}")
+            finally:
+                lock.release()
+        
+        threading.Thread(target=run, daemon=True).start()
+        return True
+    
+    def get_collaborative_scores(self, user_data, catalog):
+        """Item-item CF scores aligned with the catalog rows, normalised to 0-1 (None without signal)"""
+        weights = interaction_weights(user_data)
+        if not weights:
+            return None
+        result = self.item_similarity.score(weights)
+        if result is None:
+            return None
+        item_ids, item_scores = result
+        
+        rows = catalog.rows_for(item_ids)
+        known = rows >= 0
+        scores = np.zeros(len(catalog), dtype=np.float64)
+        scores[rows[known]] = item_scores[known]
+        max_score = scores.max() if len(scores) else 0.0
+        if max_score <= 0:
+            return None
+        return scores / max_score
+    
+    def get_realtime_trending(self, limit=10, window=None):
+        """Rank abbreviations by decayed interaction counters (no backend calls)"""
+        catalog = self.get_catalog(self.abbreviations_cache)
+        if not len(catalog):
+            return []
+        
+        now = self.popularity.clock()
+        scores = self.popularity.scores(now, window=window)
+        top_rows = top_k(scores, limit, threshold=0.0)
+        if not len(top_rows):
+            return []
+        
+        counts = self.popularity.snapshot(now)
+        max_score = scores[top_rows[0]]
+        
+        trending = []
+        for row in top_rows:
+            abbr_id = int(catalog.ids[row])
+            trending.append({
+                'id': abbr_id,
+                'score': round(float(scores[row] / max_score), 3),
+                'abbreviation': catalog.abbreviations[row],
+                'meaning': catalog.meanings[row],
+                'activity': {
+                    name: round(float(counts[i, row]), 2)
+                    for i, name in enumerate(self.popularity.window_names)
+                },
+                'unique_users': self.analytics.unique_users(abbr_id)
+            })
+        return trending
+    
     def load_models(self):
         """Load pre-trained models or initialize new ones"""
         try:
@@ -86,6 +563,122 @@ class MLService:
         except Exception as e:
             logger.error(f"Error loading models: {e}")
     
+    def load_factor_model(self):
+        """Load persisted ALS factors if a previous background training run saved them"""
+        path = os.path.join(self.artifacts_dir, 'als_factors.npz')
+        try:
+            if os.path.exists(path):
+                self.factor_model = ImplicitALS.load(path)
+                logger.info(f"Loaded factor model: {self.factor_model.stats()}")
+        except Exception as e:
+            logger.error(f"Error loading factor model: {e}")
+    
+    def train_factor_model(self):
+        """Train the implicit-feedback ALS model on tracked interactions and swap it in"""
+        entries = self.interaction_log.entries()
+        if len(entries['seq']) < self.factor_min_interactions:
+            logger.info("Not enough tracked interactions to train factor model")
+            return False
+        
+        model = ImplicitALS(
+            factors=int(os.getenv('ALS_FACTORS', 32)),
+            iterations=int(os.getenv('ALS_ITERATIONS', 10)),
+            regularization=float(os.getenv('ALS_REGULARIZATION', 0.05)),
+            alpha=float(os.getenv('ALS_ALPHA', 20.0)),
+            min_user_interactions=int(os.getenv('ALS_MIN_USER_INTERACTIONS', 5))
+        )
+        model.version = self.factor_model.version
+        model.fit(entries['user_ids'], entries['item_ids'], entries['weights'])
+        model.save(os.path.join(self.artifacts_dir, 'als_factors.npz'))
+        self.factor_model = model
+        logger.info(f"Factor model trained in {model.training_seconds:.1f}s: {model.stats()}")
+        return True
+    
+    def generate_factor_recommendations(self, user_id, user_data, limit=10):
+        """Serve users with rich history straight from the latent factors (None if not applicable)"""
+        model = self.factor_model
+        if not model.is_trained or not model.has_user(user_id):
+            return None
+        
+        catalog = self.get_catalog()
+        if not len(catalog):
+            return None
+        
+        user_data = user_data or {}
+        excluded = set(user_data.get('viewed_abbreviations', []) or []) | set(user_data.get('voted_abbreviations', []) or [])
+        # Over-fetch a little so items missing from the current catalog can be skipped
+        item_ids, scores = model.recommend(user_id, limit * 2, exclude_ids=excluded)
+        
+        recommendations = []
+        for abbr_id, score in zip(item_ids.tolist(), scores.tolist()):
+            row = catalog.row_of(abbr_id)
+            if row is None:
+                continue
+            recommendations.append({
+                'id': abbr_id,
+                'score': round(min(max(score, 0.01), 1.0), 3),
+                'abbreviation': catalog.abbreviations[row],
+                'meaning': catalog.meanings[row]
+            })
+            if len(recommendations) >= limit:
+                break
+        return recommendations or None
+    
+    def load_precomputed(self):
+        """Memory-map the last precomputed recommendation run, if any"""
+        try:
+            if self.precomputed.load():
+                logger.info(f"Loaded precomputed recommendations: {self.precomputed.stats()}")
+        except Exception as e:
+            logger.error(f"Error loading precomputed recommendations: {e}")
+    
+    def precompute_recommendations(self, top_n=None):
+        """Compute and store ranked lists for every user known to the factor model"""
+        model = self.factor_model
+        if not model.is_trained:
+            logger.warning("Factor model is not trained, skipping recommendation precomputation")
+            return None
+        
+        started = time.time()
+        entries = self.interaction_log.entries()
+        user_ids, items, scores = precompute_top_n(
+            model,
+            top_n=top_n or int(os.getenv('PRECOMPUTED_TOP_N', 50)),
+            chunk_size=int(os.getenv('PRECOMPUTED_CHUNK_SIZE', 1024)),
+            # Pairs the model was trained on (saved with it, so CLI runs exclude them too) plus newer tracked ones
+            seen=model.seen + seen_matrix(model, entries['user_ids'], entries['item_ids'])
+        )
+        meta = self.precomputed.write(user_ids, items, scores, model_version=model.version)
+        logger.info(f"Precomputed recommendations for {meta['users']} users in {time.time() - started:.1f}s")
+        return meta
+    
+    def get_precomputed_recommendations(self, user_id, user_data=None, limit=10):
+        """Serve a fresh precomputed list for the user, or None to fall back to live scoring"""
+        result = self.precomputed.lookup(user_id)
+        if result is None:
+            return None
+        
+        catalog = self.get_catalog()
+        if not len(catalog):
+            return None
+        
+        user_data = user_data or {}
+        excluded = set(user_data.get('viewed_abbreviations', []) or []) | set(user_data.get('voted_abbreviations', []) or [])
+        recommendations = []
+        for abbr_id, score in zip(*(values.tolist() for values in result)):
+            row = catalog.row_of(abbr_id)
+            if row is None or abbr_id in excluded:
+                continue
+            recommendations.append({
+                'id': abbr_id,
+                'score': round(min(max(score, 0.01), 1.0), 3),
+                'abbreviation': catalog.abbreviations[row],
+                'meaning': catalog.meanings[row]
+            })
+            if len(recommendations) >= limit:
+                break
+        return recommendations or None
+    
     def save_models(self):
         """Save trained models"""
         try:
@@ -104,9 +697,14 @@ class MLService:
         """Get personalized recommendations with provided user data (avoiding backend call)"""
         try:
             if not user_data:
-                logger.warning(f"No user data provided for {user_id}, returning fallback recommendations")
+                log.warning('recommendations.fallback', user_id=user_id, reason='no user data')
                 return self.get_fallback_recommendations(user_id)
             
+            # Users with rich history are served from the latent-factor model
+            recommendations = self.generate_factor_recommendations(user_id, user_data, limit)
+            if recommendations:
+                return recommendations
+            
             # Extract features for recommendation
             features = self.extract_user_features(user_data)
             
@@ -116,21 +714,41 @@ class MLService:
             return recommendations
             
         except Exception as e:
-            logger.error(f"Error generating recommendations for user {user_id}: {e}")
+            log.error('recommendations.failed', user_id=user_id, error=e)
             return self.get_fallback_recommendations(user_id)
     
     def get_personalized_recommendations(self, user_id, user_data=None):
-        """Get personalized abbreviation recommendations for a user"""
+        """Get personalized abbreviation recommendations for a user; concurrent requests for one user share the work"""
+        try:
+            return self.single_flight.do(
+                ('recommendations', user_id), lambda: self.compute_personalized_recommendations(user_id),
+                timeout=current_deadline().timeout()
+            )
+        except (DeadlineExceeded, TimeoutError):
+            self.deadline_stats['trending_served'] += 1
+            return self.get_fallback_recommendations(user_id)
+    
+    def fetch_user_data(self, user_id):
+        """User interaction data from the backend, or None if unavailable; concurrent fetches for one user are merged"""
+        def fetch():
+            response = self.backend_get(f"/api/ml/user-data/{user_id}", timeout=10)
+            return response.json() if response.status_code == 200 else None
+        return self.single_flight.do(('user-data', user_id), fetch)
+    
+    def compute_personalized_recommendations(self, user_id):
+        """Fetch a user's data and score the catalog for them, falling back to popular abbreviations"""
         try:
             # Fetch user interaction data from backend
-            backend_url = os.getenv('BACKEND_URL', 'http://backend:8000')
-            response = requests.get(f"{backend_url}/api/ml/user-data/{user_id}", timeout=10)
+            user_data = self.fetch_user_data(user_id)
             
-            if response.status_code != 200:
-                logger.warning(f"Could not fetch user data for {user_id}, returning fallback recommendations")
+            if user_data is None:
+                log.warning('recommendations.fallback', user_id=user_id, reason='user data unavailable')
                 return self.get_fallback_recommendations(user_id)
             
-            user_data = response.json()
+            # Users with rich history are served from the latent-factor model
+            recommendations = self.generate_factor_recommendations(user_id, user_data)
+            if recommendations:
+                return recommendations
             
             # Extract features for recommendation
             features = self.extract_user_features(user_data)
@@ -140,16 +758,23 @@ class MLService:
             
             return recommendations
             
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            log.warning('recommendations.fallback', user_id=user_id, reason=e)
+            return self.get_fallback_recommendations(user_id)
         except Exception as e:
-            logger.error(f"Error getting recommendations for user {user_id}: {e}")
+            log.error('recommendations.failed', user_id=user_id, error=e)
             return self.get_fallback_recommendations(user_id)
     
     def get_fallback_recommendations(self, user_id):
         """Get basic recommendations when user data is not available"""
+        # Serve the popular set from the cached catalog: fallbacks are needed exactly when the backend is struggling
+        catalog = self.get_catalog(self.abbreviations_cache)
+        if len(catalog):
+            return self.popular_recommendations(catalog)
+        
         try:
-            # Just return some popular abbreviations
-            backend_url = os.getenv('BACKEND_URL', 'http://backend:8000')
-            response = requests.get(f"{backend_url}/api/abbreviations?limit=10", timeout=15)
+            # Nothing cached yet: just return some popular abbreviations from the backend
+            response = self.backend_get('/api/abbreviations?limit=10', timeout=15)
             
             if response.status_code == 200:
                 api_response = response.json()
@@ -164,10 +789,10 @@ class MLService:
                 
                 # Return abbreviations with calculated scores 
                 results = []
-                for abbr in abbreviations[:5]:
+                current_time = datetime.now()
+                for abbr in abbreviations[:FALLBACK_RECOMMENDATIONS]:
                     # Calculate a basic score based on popularity
-                    from datetime import datetime
-                    score = calculate_trending_score(abbr, datetime.now())
+                    score = calculate_trending_score(abbr, current_time)
                     results.append({
                         'id': abbr['id'],
                         'score': round(score, 2),
@@ -183,6 +808,21 @@ class MLService:
             logger.error(f"Error getting fallback recommendations: {e}")
             return []
     
+    def popular_recommendations(self, catalog):
+        """Top trending abbreviations of the cached catalog, recomputed only when its trending scores are"""
+        scores = self.trending_scores(catalog, datetime.now())
+        source, recommendations = self._fallback_state
+        if source is not scores:
+            with self.stage_seconds.time(stage='rank'):
+                recommendations = [{
+                    'id': int(catalog.ids[row]),
+                    'score': round(float(scores[row]), 2),
+                    'abbreviation': catalog.abbreviations[row],
+                    'meaning': catalog.meanings[row]
+                } for row in top_k(scores, FALLBACK_RECOMMENDATIONS)]
+            self._fallback_state = (scores, recommendations)
+        return list(recommendations)
+    
     def extract_user_features(self, user_data):
         """Extract features from user interaction data"""
         features = {
@@ -246,28 +886,86 @@ class MLService:
             # Create abbreviation text (same format as in find_similar_abbreviations)
             abbr_text = f"{abbreviation['abbreviation']} {abbreviation['meaning']} {abbreviation.get('description', '')}"
             
-            # Create corpus: [user_profile, abbreviation_text]
-            corpus = [user_profile_text, abbr_text.lower()]
-            
-            # TF-IDF vectorization (reuse existing configuration)
-            vectorizer = TfidfVectorizer(
-                stop_words='english',
-                ngram_range=(1, 2),
-                max_features=1000
-            )
-            
-            # Vectorize both texts
-            tfidf_matrix = vectorizer.fit_transform(corpus)
-            
-            # Calculate cosine similarity between user profile [0] and abbreviation [1]
-            similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-            
-            return float(similarity)  # Returns 0.0 - 1.0
+            return self.text_similarity(user_profile_text, abbr_text.lower())
             
         except Exception as e:
             logger.warning(f"Error calculating text similarity: {e}")
             return 0.0  # Fallback to no similarity
     
+    def text_similarity(self, user_profile_text, abbr_text):
+        """TF-IDF cosine similarity between a user profile and a lowercased abbreviation text"""
+        # Create corpus: [user_profile, abbreviation_text]
+        corpus = [user_profile_text, abbr_text]
+        
+        # TF-IDF vectorization (reuse existing configuration)
+        vectorizer = TfidfVectorizer(
+            stop_words='english',
+            ngram_range=(1, 2),
+            max_features=1000
+        )
+        
+        # Vectorize both texts
+        tfidf_matrix = vectorizer.fit_transform(corpus)
+        
+        # Calculate cosine similarity between user profile [0] and abbreviation [1]
+        similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
+        
+        return float(similarity)  # Returns 0.0 - 1.0
+    
+    def similarity_index(self, catalog):
+        """The catalog's similarity index in the configured mode (sparse TF-IDF, dense LSA or hashed TF-IDF)"""
+        return catalog.similarity_index(
+            self.similarity_mode,
+            dimensions=self.lsa_dimensions,
+            dtype=self.lsa_dtype,
+            ann_min_items=self.ann_min_items,
+            ann_probes=self.ann_probes,
+            store=self.similarity_store,
+            hashing_store=self.hashing_features
+        )
+    
+    def find_similar_abbreviations(self, catalog, query_text, limit):
+        """Catalog entries most similar to the query by cosine similarity in the configured mode"""
+        # Item vectors are fitted once per snapshot; only the query is transformed here
+        index = self.similarity_index(catalog)
+        with self.stage_seconds.time(stage='vectorize'):
+            rows, similarity_scores = index.nearest(query_text, limit, threshold=0.1)
+        return self.similar_abbreviation_entries(catalog, rows, similarity_scores)
+    
+    def find_similar_abbreviations_batch(self, catalog, query_texts, limit):
+        """find_similar_abbreviations for many queries, scored in blocks with one matrix product each"""
+        index = self.similarity_index(catalog)
+        for rows, similarity_scores in index.nearest_batch(query_texts, limit, threshold=0.1):
+            yield self.similar_abbreviation_entries(catalog, rows, similarity_scores)
+    
+    def similar_abbreviation_entries(self, catalog, rows, similarity_scores):
+        """Response entries for similar catalog rows above the minimum similarity threshold"""
+        similar_abbreviations = []
+        for idx, similarity_score in zip(rows.tolist(), similarity_scores.tolist()):
+            similar_abbreviations.append({
+                'id': int(catalog.ids[idx]),
+                'abbreviation': catalog.abbreviations[idx],
+                'meaning': catalog.meanings[idx],
+                'description': catalog.descriptions[idx],
+                'category': catalog.category(idx) or '',
+                'similarity_score': round(similarity_score, 3)
+            })
+        return similar_abbreviations
+    
+    def duplicate_entries(self, catalog, rows, similarity_scores, exact):
+        """Response entries for catalog rows duplicating a submission, exact matches first"""
+        duplicates = []
+        for idx, similarity_score, is_exact in zip(rows.tolist(), similarity_scores.tolist(), exact.tolist()):
+            duplicates.append({
+                'id': int(catalog.ids[idx]),
+                'abbreviation': catalog.abbreviations[idx],
+                'meaning': catalog.meanings[idx],
+                'category': catalog.category(idx) or '',
+                'similarity_score': round(similarity_score, 3),
+                'exact': is_exact
+            })
+        return duplicates
+    
     def generate_recommendations(self, features, user_data, limit=10):
         """Generate abbreviation recommendations based on user features"""
         try:
@@ -275,49 +973,52 @@ class MLService:
             limit = int(limit)
             
             # Get real abbreviations from backend
-            abbreviations = self.get_cached_abbreviations()
+            catalog = self.get_catalog()
             
-            if not abbreviations:
-                logger.warning("No abbreviations available from backend, returning empty recommendations")
+            if not len(catalog):
+                log.warning('recommendations.empty_catalog')
                 return []
             
-            logger.info(f"Using {len(abbreviations)} real abbreviations for recommendations")
-            
             # Get user's already interacted abbreviations to exclude them
             viewed_abbrs = set(user_data.get('viewed_abbreviations', []))
             voted_abbrs = set(user_data.get('voted_abbreviations', []))
             interacted_abbrs = viewed_abbrs.union(voted_abbrs)
             
-            logger.info(f"User has interacted with {len(interacted_abbrs)} abbreviations")
+            # Out of budget before scoring: the cached popular list is the best answer still worth sending
+            if current_deadline().expired():
+                self.deadline_stats['trending_served'] += 1
+                return self.popular_recommendations(catalog)[:limit]
             
-            # Score abbreviations based on user profile
-            scored_abbreviations = []
+            # Collaborative signal from co-occurring interactions of other users
+            cf_scores = self.get_collaborative_scores(user_data, catalog)
             
-            for abbr in abbreviations:
-                # Skip abbreviations user already interacted with
-                if abbr['id'] in interacted_abbrs:
-                    continue
-                    
-                score = self.calculate_abbreviation_score(abbr, features)
-                scored_abbreviations.append({
-                    'id': abbr['id'],
-                    'score': round(score, 2),
-                    'abbreviation': abbr['abbreviation'],
-                    'meaning': abbr['meaning']
-                })
-            
-            logger.info(f"Scored {len(scored_abbreviations)} new abbreviations")
-            
-            # Sort by score and return top recommendations
-            scored_abbreviations.sort(key=lambda x: x['score'], reverse=True)
+            # Score abbreviations based on user profile; already interacted ones are masked out
+            with self.stage_seconds.time(stage='score'):
+                eligible = ~catalog.id_mask(interacted_abbrs)
+                scores = np.where(eligible, self.calculate_abbreviation_scores(catalog, features, eligible, time.time()), -np.inf)
+                if cf_scores is not None:
+                    scores = (1 - self.cf_weight) * scores + self.cf_weight * cf_scores
             
-            result = scored_abbreviations[:limit]
-            logger.info(f"Returning {len(result)} recommendations with scores")
+            # Select the top recommendations and only build results for those
+            result = []
+            with self.stage_seconds.time(stage='rank'):
+                for row in top_k(scores, limit, mask=eligible):
+                    result.append({
+                        'id': int(catalog.ids[row]),
+                        'score': round(float(scores[row]), 2),
+                        'abbreviation': catalog.abbreviations[row],
+                        'meaning': catalog.meanings[row]
+                    })
+            # One sampled line per request instead of one per step
+            log.info(
+                'recommendations.generated', catalog=len(catalog), interacted=len(interacted_abbrs),
+                eligible=int(eligible.sum()), returned=len(result)
+            )
             
             return result
             
         except Exception as e:
-            logger.error(f"Error generating recommendations: {e}")
+            log.error('recommendations.failed', error=e)
             return []
     
     def calculate_abbreviation_score(self, abbreviation, user_features):
@@ -353,14 +1054,8 @@ class MLService:
         vote_count = abbreviation.get('votes_count', 0)
         score += min(vote_count * 0.1, 2.0)  # Cap at 2.0
         
-        # Recency bonus
-        try:
-            created_at = datetime.fromisoformat(abbreviation['created_at'].replace('Z', '+00:00'))
-            days_old = (datetime.now().replace(tzinfo=created_at.tzinfo) - created_at).days
-            if days_old < 30:
-                score += 1.0 - (days_old / 30)
-        except:
-            pass  # Skip if date parsing fails
+        # Recency bonus (none if the creation date is missing or invalid)
+        score += recency_bonus(days_old(parse_epoch(abbreviation.get('created_at')), time.time()))
         
         # Normalize score to 0-1 range for consistent display 
         # Max possible score is now: 2.5 + 1.5 + 1.0 + 3.0 + 2.0 + 1.0 = 11.0
@@ -368,8 +1063,54 @@ class MLService:
         
         return round(max(normalized_score, 0.01), 3)  # Minimum score of 0.01, max 1.0
     
+    def calculate_abbreviation_scores(self, catalog, user_features, eligible=None, now=None):
+        """Vectorised calculate_abbreviation_score over the catalog columns
+
+        `eligible` limits the per-row TF-IDF similarity to rows that can be recommended,
+        `now` is the request's epoch time (sampled here if not given).
+        """
+        score = np.zeros(len(catalog), dtype=np.float64)
+        score += 2.5 * catalog.department_mask([user_features['department']])
+        score += 1.5 * catalog.category_mask(user_features['common_categories'])
+        
+        # Each search term adds 1.0 to every row whose text contains it (postings from the snapshot index)
+        matches = [catalog.search_index.rows(search_term) for search_term in user_features['search_history']]
+        if matches:
+            np.add.at(score, np.concatenate(matches), 1.0)
+        
+        user_profile_text = self.get_user_profile_text(user_features)
+        deadline = current_deadline()
+        if user_profile_text.strip() and deadline.remaining() < self.similarity_min_budget:
+            # Too little of the request's budget left: rank on the rule-based signals alone
+            self.deadline_stats['similarity_skipped'] += 1
+        elif user_profile_text.strip() and self.similarity_mode != 'tfidf':
+            # One product against the snapshot's LSA / hashed vectors replaces the per-row fits
+            with self.stage_seconds.time(stage='vectorize'):
+                similarity = np.clip(self.similarity_index(catalog).scores(user_profile_text), 0.0, 1.0)
+            score += 3.0 * (similarity if eligible is None else np.where(eligible, similarity, 0.0))
+        elif user_profile_text.strip():
+            rows = np.flatnonzero(eligible) if eligible is not None else range(len(catalog))
+            with self.stage_seconds.time(stage='vectorize'):
+                for i, row in enumerate(rows):
+                    # Per-row fits are slow; once the budget is gone the remaining rows go without similarity
+                    if i % 64 == 0 and deadline.expired():
+                        self.deadline_stats['similarity_skipped'] += 1
+                        break
+                    try:
+                        score[row] += 3.0 * self.text_similarity(user_profile_text, catalog.similarity_text[row])
+                    except ValueError as e:
+                        logger.warning(f"Error calculating text similarity: {e}")
+        
+        score += np.minimum(catalog.votes * 0.1, 2.0)
+        score += recency_bonus(catalog.age_days(time.time() if now is None else now))
+        
+        return np.round(np.clip(score / 11.0, 0.01, 1.0), 3)
+    
     def train_model(self, training_data=None):
         """Train the recommendation model with new data"""
+        # The latent-factor model learns from tracked interactions, independently of the catalog data
+        self.run_in_background(self._factor_training_lock, self.train_factor_model, 'factor model training')
+        
         try:
             if not training_data:
                 # Fetch training data from backend
@@ -399,8 +1140,7 @@ class MLService:
     def fetch_training_data(self):
         """Fetch training data from backend"""
         try:
-            backend_url = os.getenv('BACKEND_URL', 'http://backend:8000')
-            response = requests.get(f"{backend_url}/api/abbreviations")
+            response = self.backend_get('/api/abbreviations')
             
             if response.status_code == 200:
                 api_response = response.json()
@@ -423,6 +1163,7 @@ class MLService:
     def prepare_training_data(self, data):
         """Prepare real training data for model training"""
         try:
+            now = time.time()
             if not data or len(data) < 2:
                 logger.warning("Insufficient training data")
                 # Return minimal dummy data if no real data available
@@ -465,13 +1206,9 @@ class MLService:
                     dept_hash = hash(department.lower()) % 100 if department else 0
                     feature_vector.append(dept_hash)
                     
-                    # Recency feature (days since creation)
-                    try:
-                        created_at = datetime.fromisoformat(abbr['created_at'].replace('Z', '+00:00'))
-                        days_old = (datetime.now() - created_at).days
-                        feature_vector.append(min(days_old, 365))  # Cap at 365 days
-                    except:
-                        feature_vector.append(30)  # Default value
+                    # Recency feature (days since creation, capped at 365; 30 if unknown)
+                    age = days_old(parse_epoch(abbr.get('created_at')), now)
+                    feature_vector.append(30 if np.isnan(age) else min(int(age), 365))
                     
                     # Text complexity (word count)
                     word_count = len(meaning_text.split()) + len(desc_text.split())
@@ -513,6 +1250,92 @@ class MLService:
 # Initialize ML service
 ml_service = MLService()
 
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, timing every jsonify into the 'serialize' stage"""
+    
+    def dumps(self, obj, **kwargs):
+        with ml_service.stage_seconds.time(stage='serialize'):
+            return super().dumps(obj, **kwargs)
+
+app.json = TimedJSONProvider(app)
+
+@app.before_request
+def assign_request_id():
+    """Tag the request's log lines (and backend calls) with the caller's X-Request-ID or a new one"""
+    g.request_id = request_id_from_header(request.headers.get(REQUEST_ID_HEADER))
+    g.request_id_token = set_request_id(g.request_id)
+
+@app.after_request
+def echo_request_id(response):
+    request_id = g.get('request_id')
+    if request_id is not None:
+        response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if ml_service.profiler.session is not None:
+        g.profiling = ml_service.profiler.request_started()
+
+@app.after_request
+def observe_request(response):
+    """Request latency, observed when the response is closed so streamed bodies are included"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        labels = {
+            'route': request.url_rule.rule if request.url_rule else 'unmatched',
+            'method': request.method,
+            'status': str(response.status_code)
+        }
+        response.call_on_close(lambda: ml_service.request_seconds.observe(time.perf_counter() - started, **labels))
+    return response
+
+@app.before_request
+def start_deadline():
+    """Attach the caller's deadline (DEADLINE_HEADER, else REQUEST_TIMEOUT) and reject requests already past it"""
+    deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER), ml_service.request_timeout)
+    g.deadline_token = set_deadline(deadline)
+    if deadline.expired():
+        ml_service.deadline_stats['rejected'] += 1
+        return jsonify({'status': 'error', 'message': 'Request deadline exceeded'}), 504
+
+@app.before_request
+def admit_request():
+    """Take a slot in the endpoint's admission class, or shed the request with Retry-After"""
+    limiter = ml_service.admission.get(ENDPOINT_CLASSES.get(request.endpoint))
+    if limiter is None:
+        return None
+    default = 'low' if request.endpoint in LOW_PRIORITY_ENDPOINTS else 'normal'
+    priority = PRIORITIES.get(request.headers.get(PRIORITY_HEADER, default), PRIORITIES[default])
+    try:
+        g.admission = (limiter, limiter.acquire(priority, timeout=current_deadline().remaining()))
+    except Overloaded as e:
+        response = jsonify({'status': 'error', 'message': f"Service overloaded: {e}"})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, e.status
+
+@app.teardown_request
+def end_request(exc=None):
+    admission = g.pop('admission', None)
+    if admission is not None:
+        limiter, acquired_at = admission
+        limiter.release(acquired_at)
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        reset_deadline(token)
+    profiling = g.pop('profiling', None)
+    if profiling is not None:
+        ml_service.profiler.request_finished(profiling)
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        reset_request_id(token)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of request, stage, backend, cache, catalog, model and admission metrics"""
+    return Response(ml_service.metrics.render(), content_type=CONTENT_TYPE)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -541,18 +1364,24 @@ def get_general_recommendations():
 def get_recommendations(user_id):
     """Get personalized recommendations for a user"""
     try:
+        data = (request.get_json(silent=True) or {}) if request.method == 'POST' else {}
+        user_data = data.get('user_data')
+        limit = int(data.get('limit', 10))  # Ensure limit is integer
+        
+        # Serve from the nightly precomputed store when the user's entry is fresh
+        recommendations = ml_service.get_precomputed_recommendations(user_id, user_data, limit)
+        if recommendations:
+            return jsonify({
+                'status': 'success',
+                'user_id': user_id,
+                'recommendations': recommendations,
+                'source': 'precomputed'
+            })
+        
         # Handle POST request with user data
-        if request.method == 'POST':
-            data = request.get_json() or {}
-            user_data = data.get('user_data')
-            limit = int(data.get('limit', 10))  # Ensure limit is integer
-            
-            if user_data:
-                recommendations = ml_service.get_personalized_recommendations_with_data(user_id, user_data, limit)
-            else:
-                recommendations = ml_service.get_personalized_recommendations(user_id)
+        if request.method == 'POST' and user_data:
+            recommendations = ml_service.get_personalized_recommendations_with_data(user_id, user_data, limit)
         else:
-            # Handle GET request (existing behavior)
             recommendations = ml_service.get_personalized_recommendations(user_id)
             
         return jsonify({
@@ -564,6 +1393,32 @@ def get_recommendations(user_id):
         logger.error(f"Error in recommendations endpoint: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/precompute-recommendations', methods=['POST'])
+def precompute_recommendations():
+    """Start a background precomputation of top-N recommendations for all known users"""
+    data = request.get_json(silent=True) or {}
+    top_n = data.get('top_n')
+    started = ml_service.run_in_background(
+        ml_service._precompute_lock,
+        lambda: ml_service.precompute_recommendations(int(top_n) if top_n else None),
+        'recommendation precomputation'
+    )
+    if not started:
+        return jsonify({'status': 'error', 'message': 'Precomputation already running'}), 409
+    return jsonify({
+        'status': 'accepted',
+        'message': 'Precomputation started',
+        'precomputed': ml_service.precomputed.stats()
+    }), 202
+
+@app.cli.command('precompute-recommendations')
+def precompute_recommendations_command():
+    """Precompute top-N recommendations for all known users (flask --app app precompute-recommendations)"""
+    meta = ml_service.precompute_recommendations()
+    if meta is None:
+        raise SystemExit("Factor model is not trained; nothing to precompute")
+    print(json.dumps(meta))
+
 @app.route('/train', methods=['POST'])
 def train_model():
     """Train the ML model with new data"""
@@ -595,8 +1450,9 @@ def track_interaction():
         abbreviation_id = data.get('abbreviation_id')
         interaction_type = data.get('interaction_type')
         
-        # Store interaction data (in production, this would go to a database)
-        logger.info(f"Tracked interaction: User {user_id}, Abbr {abbreviation_id}, Type {interaction_type}")
+        # Feed streaming counters so realtime trending reacts immediately
+        ml_service.record_interaction(user_id, abbreviation_id, interaction_type)
+        log.info('interaction.tracked', user_id=user_id, abbreviation_id=abbreviation_id, type=interaction_type)
         
         return jsonify({'status': 'success', 'message': 'Interaction tracked'})
         
@@ -604,44 +1460,101 @@ def track_interaction():
         logger.error(f"Error tracking interaction: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/analytics/abbreviations/<int:abbreviation_id>', methods=['GET'])
+def get_abbreviation_analytics(abbreviation_id):
+    """Approximate interaction statistics for one abbreviation"""
+    return jsonify({
+        'status': 'success',
+        'abbreviation_id': abbreviation_id,
+        'interactions': ml_service.analytics.interaction_count(abbreviation_id),
+        'unique_users': ml_service.analytics.unique_users(abbreviation_id)
+    })
+
+@app.route('/analytics/heavy-hitters', methods=['GET'])
+def get_heavy_hitters():
+    """Most frequently interacted abbreviations according to the Count-Min sketch"""
+    limit = request.args.get('limit', 10, type=int)
+    return jsonify({
+        'status': 'success',
+        'heavy_hitters': [
+            {'abbreviation_id': abbr_id, 'interactions': count}
+            for abbr_id, count in ml_service.analytics.heavy_hitters(limit)
+        ],
+        'stats': ml_service.analytics.stats()
+    })
+
+@app.route('/analytics/snapshot', methods=['GET', 'POST'])
+def analytics_snapshot():
+    """Export the analytics sketches (GET) or merge a snapshot from another replica (POST)"""
+    try:
+        if request.method == 'GET':
+            return jsonify({'status': 'success', 'snapshot': ml_service.analytics.snapshot()})
+        
+        data = request.get_json() or {}
+        if not data.get('snapshot'):
+            return jsonify({'status': 'error', 'message': 'Snapshot parameter is required'}), 400
+        ml_service.analytics.merge_snapshot(data['snapshot'])
+        return jsonify({'status': 'success', 'stats': ml_service.analytics.stats()})
+        
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in analytics snapshot endpoint: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/recommendations/trending', methods=['GET'])
 def get_trending():
     """Get trending abbreviations based on real data"""
     try:
         limit = request.args.get('limit', 10, type=int)
+        mode = request.args.get('mode', 'default')
+        
+        # Realtime mode ranks by streaming interaction counters, falling back to catalog metrics
+        if mode == 'realtime':
+            window = request.args.get('window')
+            if window is not None and window not in ml_service.popularity.window_names:
+                return jsonify({
+                    'status': 'error',
+                    'message': f"Unknown window '{window}'"
+                }), 400
+            trending = ml_service.get_realtime_trending(limit, window)
+            if trending:
+                return jsonify({
+                    'status': 'success',
+                    'mode': 'realtime',
+                    'trending': trending
+                })
         
         # Use cached abbreviations
-        abbreviations = ml_service.get_cached_abbreviations()
+        catalog = ml_service.get_catalog()
         
-        if not abbreviations:
+        if not len(catalog):
             return jsonify({
                 'status': 'success',
                 'trending': []
             })
         
         # Calculate trending scores based on real metrics
-        trending_scores = []
-        current_time = datetime.now()
+        scores = ml_service.trending_scores(catalog, datetime.now())
         
-        for abbr in abbreviations:
-            score = calculate_trending_score(abbr, current_time)
-            trending_scores.append({
-                'id': abbr['id'],
-                'score': score,
-                'abbreviation': abbr['abbreviation'],
-                'meaning': abbr['meaning']
-            })
-        
-        # Sort by score and return top results
-        trending_scores.sort(key=lambda x: x['score'], reverse=True)
+        # Select the top results and only build result entries for those
+        trending = []
+        with ml_service.stage_seconds.time(stage='rank'):
+            for row in top_k(scores, limit):
+                trending.append({
+                    'id': int(catalog.ids[row]),
+                    'score': float(scores[row]),
+                    'abbreviation': catalog.abbreviations[row],
+                    'meaning': catalog.meanings[row]
+                })
         
         return jsonify({
             'status': 'success',
-            'trending': trending_scores[:limit]
+            'trending': trending
         })
         
     except Exception as e:
-        logger.error(f"Error in trending endpoint: {e}")
+        log.error('trending.failed', error=e)
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 def calculate_trending_score(abbreviation, current_time):
@@ -659,24 +1572,8 @@ def calculate_trending_score(abbreviation, current_time):
     comments_count = len(abbreviation.get('comments', []))
     
     # Recent activity bonus (higher weight for recent votes/comments)
-    try:
-        created_at = datetime.fromisoformat(abbreviation['created_at'].replace('Z', '+00:00'))
-        days_old = (current_time - created_at).days
-        
-        # Time decay factor - recent content gets boost but older content isn't penalized too much
-        if days_old < 1:
-            time_factor = 1.5  # 24h boost
-        elif days_old < 7:
-            time_factor = 1.2  # Weekly boost  
-        elif days_old < 30:
-            time_factor = 1.0  # Neutral
-        elif days_old < 90:
-            time_factor = 0.8  # Slight decay
-        else:
-            time_factor = 0.6  # Older content
-            
-    except:
-        time_factor = 1.0  # Default for parsing errors
+    age = days_old(parse_epoch(abbreviation.get('created_at')), current_time.timestamp())
+    time_factor = trending_time_factor(age)
     
     # Engagement score (votes worth more than comments but both matter)
     engagement_score = (votes_count * 2.0) + (comments_count * 1.0)
@@ -694,8 +1591,7 @@ def calculate_trending_score(abbreviation, current_time):
     
     # Category relevance (based on user activity patterns)
     category = abbreviation.get('category', '').lower()
-    high_activity_categories = ['tehnologija', 'technology', 'it', 'poslovanje', 'business']
-    if category in high_activity_categories:
+    if category in HIGH_ACTIVITY_CATEGORIES:
         score += 2.0
     
     # Department collaboration bonus (indicates organizational relevance)
@@ -711,6 +1607,82 @@ def calculate_trending_score(abbreviation, current_time):
     
     return round(max(normalized_score, 0.01), 3)  # Minimum score of 0.01, max 1.0
 
+def calculate_trending_scores(catalog, current_time):
+    """Vectorised calculate_trending_score over all catalog rows"""
+    time_factor = trending_time_factor(catalog.age_days(current_time.timestamp()))
+    
+    engagement_score = (catalog.votes * 2.0) + (catalog.comments * 1.0)
+    score = engagement_score * time_factor
+    
+    well_documented = (catalog.meaning_lengths > 10) & (catalog.description_lengths > 20)
+    score += np.where(well_documented, 3.0, np.where(catalog.meaning_lengths > 5, 1.0, 0.0))
+    
+    high_activity = [value for value in catalog.categories if str(value).lower() in HIGH_ACTIVITY_CATEGORIES]
+    score += 2.0 * catalog.category_mask(high_activity)
+    score += 1.0 * catalog.department_mask([value for value in catalog.departments if value])
+    
+    return np.round(np.clip(score / 10.0, 0.01, 1.0), 3)
+
+def trending_time_factor(age_days):
+    """Time decay factor - recent content gets boost but older content isn't penalized too much
+
+    Buckets an array (or scalar) of ages in days; unknown ages (NaN) are neutral.
+    """
+    if np.isscalar(age_days):
+        if np.isnan(age_days):
+            return 1.0
+        return next((factor for limit, factor in TRENDING_TIME_BUCKETS if age_days < limit), TRENDING_TIME_DEFAULT)
+    age_days = np.asarray(age_days, dtype=np.float64)
+    factor = np.select(
+        [age_days < limit for limit, _ in TRENDING_TIME_BUCKETS],
+        [factor for _, factor in TRENDING_TIME_BUCKETS],
+        TRENDING_TIME_DEFAULT
+    )
+    return np.where(np.isnan(age_days), 1.0, factor)
+
+def recency_bonus(age_days):
+    """Personalized-score bonus for abbreviations created in the last 30 days (0 for unknown ages)"""
+    if np.isscalar(age_days):
+        return 1.0 - (age_days / 30) if age_days < 30 else 0.0
+    age_days = np.asarray(age_days, dtype=np.float64)
+    recent = age_days < 30
+    return np.where(recent, 1.0 - np.where(recent, age_days, 0.0) / 30, 0.0)
+
+@app.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    """Prefix and typo-tolerant suggestions for a partially typed abbreviation or meaning"""
+    try:
+        query = request.args.get('q', '').strip()
+        limit = request.args.get('limit', 10, type=int)
+        fuzzy = request.args.get('fuzzy', 'true').lower() not in ('0', 'false', 'no')
+        
+        if not query:
+            return jsonify({
+                'status': 'error',
+                'message': 'Query parameter q is required'
+            }), 400
+        
+        catalog = ml_service.get_catalog()
+        suggestions = []
+        for row, field, match in catalog.autocomplete_index.search(query, max(0, min(limit, 50)), fuzzy=fuzzy):
+            suggestions.append({
+                'id': int(catalog.ids[row]),
+                'abbreviation': catalog.abbreviations[row],
+                'meaning': catalog.meanings[row],
+                'matched_field': field,
+                'match': match
+            })
+        
+        return jsonify({
+            'status': 'success',
+            'query': query,
+            'suggestions': suggestions
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in autocomplete endpoint: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/similar-abbreviations', methods=['POST'])
 def find_similar_abbreviations():
     """Find similar abbreviations based on text similarity using TF-IDF"""
@@ -726,75 +1698,264 @@ def find_similar_abbreviations():
             }), 400
         
         # Use cached abbreviations
-        abbreviations = ml_service.get_cached_abbreviations()
+        catalog = ml_service.get_catalog()
         
-        if not abbreviations:
+        if not len(catalog):
             return jsonify({
                 'status': 'success',
                 'query': query_text,
                 'similar_abbreviations': []
             })
         
-        # Prepare text corpus for TF-IDF
-        texts = []
-        abbr_data = []
-        
-        for abbr in abbreviations:
-            # Combine abbreviation, meaning, and description for better matching
-            combined_text = f"{abbr['abbreviation']} {abbr['meaning']} {abbr.get('description', '')}"
-            texts.append(combined_text.lower())
-            abbr_data.append(abbr)
+        # Identical queries against the same snapshot are served from the result cache,
+        normalized, limit = normalize_query(query_text), int(limit)
+        # and concurrent misses for the same query share one computation
+        key = (ml_service.similarity_mode, normalized, limit)
+        similar_abbreviations = ml_service.similarity_cache.get_or_compute(
+            catalog.version,
+            key,
+            lambda: ml_service.single_flight.do(
+                ('similar', catalog.version) + key,
+                lambda: ml_service.find_similar_abbreviations(catalog, normalized, limit)
+            )
+        )
         
-        # Add query text to corpus
-        texts.append(query_text.lower())
+        return jsonify({
+            'status': 'success',
+            'query': query_text,
+            'similar_abbreviations': similar_abbreviations
+        })
         
-        # Create TF-IDF vectors
-        vectorizer = TfidfVectorizer(
-            stop_words='english',
-            ngram_range=(1, 2),
-            max_features=1000
+    except Exception as e:
+        logger.error(f"Error finding similar abbreviations: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/similar-abbreviations/batch', methods=['POST'])
+def find_similar_abbreviations_batch():
+    """Similar abbreviations for many texts at once, streamed back as one JSON line per text"""
+    data = request.get_json() or {}
+    texts = data.get('texts')
+    try:
+        limit = int(data.get('limit', 5))
+    except (TypeError, ValueError):
+        limit = None
+    
+    if not isinstance(texts, list) or not texts or not all(isinstance(text, str) and text.strip() for text in texts):
+        return jsonify({
+            'status': 'error',
+            'message': 'Texts parameter must be a non-empty list of non-empty strings'
+        }), 400
+    if len(texts) > ml_service.batch_max_queries:
+        return jsonify({
+            'status': 'error',
+            'message': f"At most {ml_service.batch_max_queries} texts per request"
+        }), 400
+    if limit is None or not 1 <= limit <= ml_service.batch_max_limit:
+        return jsonify({
+            'status': 'error',
+            'message': f"Limit must be an integer between 1 and {ml_service.batch_max_limit}"
+        }), 400
+    
+    catalog = ml_service.get_catalog()
+    cache = ml_service.similarity_cache
+    keys = [(ml_service.similarity_mode, normalize_query(text), limit) for text in texts]
+    cached = [cache.lookup(catalog.version, key) for key in keys]
+    misses = [i for i, result in enumerate(cached) if result is None]
+    
+    def generate():
+        # Cache misses are scored together, in input order, and interleaved with the hits
+        if len(catalog):
+            computed = ml_service.find_similar_abbreviations_batch(catalog, [keys[i][1] for i in misses], limit)
+        else:
+            computed = iter([[] for _ in misses])
+        for i, (text, result) in enumerate(zip(texts, cached)):
+            if result is None:
+                started = time.thread_time()
+                try:
+                    result = next(computed)
+                except Exception as e:
+                    logger.error(f"Error in batch similarity for query {i}: {e}")
+                    yield json.dumps({'index': i, 'query': text, 'status': 'error', 'message': str(e)}) + '\n'
+                    return
+                cache.put(catalog.version, keys[i], result, time.thread_time() - started)
+            yield json.dumps({'index': i, 'query': text, 'similar_abbreviations': result}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/similar-abbreviations/cache', methods=['GET'])
+def similar_abbreviations_cache_stats():
+    """Hit ratio, size and CPU time saved by the similar-abbreviations result cache, plus coalesced computations"""
+    return jsonify({
+        'status': 'success',
+        'cache': ml_service.similarity_cache.stats(),
+        'coalescing': ml_service.single_flight.stats()
+    })
+
+@app.route('/admission', methods=['GET'])
+def admission_stats():
+    """Active requests, queue depth and rejections per admission class"""
+    return jsonify({
+        'status': 'success',
+        'admission': {name: limiter.stats() for name, limiter in ml_service.admission.items()}
+    })
+
+def profiling_denied():
+    """Error response unless profiling is enabled and the request carries the admin token"""
+    if not ml_service.profiler.enabled:
+        return jsonify({'status': 'error', 'message': 'Profiling is disabled'}), 404
+    supplied = request.headers.get(ADMIN_TOKEN_HEADER, '')
+    if not hmac.compare_digest(supplied.encode(), ml_service.profiler.token.encode()):
+        return jsonify({'status': 'error', 'message': 'Admin token required'}), 403
+    return None
+
+@app.route('/admin/profile', methods=['POST'])
+def start_profile():
+    """Start a sampled (collapsed stacks) or cProfile (pstats) capture for N seconds or the next N requests"""
+    denied = profiling_denied()
+    if denied is not None:
+        return denied
+    try:
+        data = request.get_json(silent=True) or {}
+        seconds = data.get('seconds')
+        requests_count = data.get('requests')
+        session = ml_service.profiler.start(
+            mode=data.get('mode', 'sample'),
+            seconds=float(seconds) if seconds is not None else None,
+            requests=int(requests_count) if requests_count is not None else None,
+            allocations=bool(data.get('allocations', False)),
+            interval=float(data.get('interval', 0.005)),
+            all_threads=bool(data.get('all_threads', False))
         )
-        
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    if session is None:
+        return jsonify({'status': 'error', 'message': 'A profile is already running'}), 409
+    logger.info(f"Profiling started ({session.mode}), writing to {session.directory}")
+    return jsonify({'status': 'success', 'profile': session.status()}), 202
+
+@app.route('/admin/profile', methods=['GET'])
+def profile_status():
+    """State of the running or last profile capture and the files it wrote"""
+    denied = profiling_denied()
+    if denied is not None:
+        return denied
+    return jsonify({'status': 'success', 'profiling': ml_service.profiler.status()})
+
+@app.route('/admin/profile/stop', methods=['POST'])
+def stop_profile():
+    """End the running capture early and write what it has collected"""
+    denied = profiling_denied()
+    if denied is not None:
+        return denied
+    session = ml_service.profiler.stop()
+    if session is None:
+        return jsonify({'status': 'error', 'message': 'No profile has been started'}), 404
+    return jsonify({'status': 'success', 'profile': session.status()})
+
+@app.route('/check-duplicate', methods=['POST'])
+def check_duplicate():
+    """Existing catalog entries that exactly or nearly duplicate a submitted abbreviation and meaning"""
+    try:
+        data = request.get_json() or {}
+        abbreviation = str(data.get('abbreviation') or '').strip()
+        meaning = str(data.get('meaning') or '').strip()
         try:
-            tfidf_matrix = vectorizer.fit_transform(texts)
-        except ValueError as e:
-            logger.error(f"TF-IDF vectorization failed: {e}")
-            return jsonify({
-                'status': 'success',
-                'query': query_text,
-                'similar_abbreviations': []
-            })
-        
-        # Calculate cosine similarity between query and all abbreviations
-        query_vector = tfidf_matrix[-1]  # Last item is our query
-        similarity_scores = cosine_similarity(query_vector, tfidf_matrix[:-1]).flatten()
+            limit = int(data.get('limit', 5))
+            threshold = float(data.get('threshold', DUPLICATE_THRESHOLD))
+        except (TypeError, ValueError):
+            limit = threshold = None
         
-        # Get top similar abbreviations
-        similar_indices = similarity_scores.argsort()[-limit:][::-1]
+        if not abbreviation or not meaning:
+            return jsonify({
+                'status': 'error',
+                'message': 'Abbreviation and meaning parameters are required'
+            }), 400
+        if limit is None or not 0 <= limit <= ml_service.duplicate_batch_max_limit or not 0.0 <= threshold <= 1.0:
+            return jsonify({
+                'status': 'error',
+                'message': f"Limit must be an integer between 0 and {ml_service.duplicate_batch_max_limit} "
+                           f"and threshold a number between 0 and 1"
+            }), 400
         
-        similar_abbreviations = []
-        for idx in similar_indices:
-            if similarity_scores[idx] > 0.1:  # Minimum similarity threshold
-                abbr = abbr_data[idx]
-                similar_abbreviations.append({
-                    'id': abbr['id'],
-                    'abbreviation': abbr['abbreviation'],
-                    'meaning': abbr['meaning'],
-                    'description': abbr.get('description', ''),
-                    'category': abbr.get('category', ''),
-                    'similarity_score': round(float(similarity_scores[idx]), 3)
-                })
+        # Prebuilt per snapshot: a key hash lookup, an LSH probe and a rerank of the few candidates
+        catalog = ml_service.get_catalog()
+        rows, similarity_scores, exact = catalog.duplicate_index.check(abbreviation, meaning, limit, threshold)
         
         return jsonify({
             'status': 'success',
-            'query': query_text,
-            'similar_abbreviations': similar_abbreviations
+            'abbreviation': abbreviation,
+            'meaning': meaning,
+            'exact_duplicate': bool(exact.any()),
+            'duplicates': ml_service.duplicate_entries(catalog, rows, similarity_scores, exact)
         })
         
     except Exception as e:
-        logger.error(f"Error finding similar abbreviations: {e}")
+        logger.error(f"Error checking duplicates: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/check-duplicate/batch', methods=['POST'])
+def check_duplicate_batch():
+    """Duplicate checks for every entry of an import file, streamed back as one JSON line per entry"""
+    data = request.get_json() or {}
+    items = data.get('items')
+    try:
+        limit = int(data.get('limit', 5))
+        threshold = float(data.get('threshold', DUPLICATE_THRESHOLD))
+    except (TypeError, ValueError):
+        limit = threshold = None
+    
+    if not isinstance(items, list) or not items or not all(
+        isinstance(item, dict) and all(isinstance(item.get(field), str) and item[field].strip()
+                                       for field in ('abbreviation', 'meaning'))
+        for item in items
+    ):
+        return jsonify({
+            'status': 'error',
+            'message': 'Items parameter must be a non-empty list of objects with abbreviation and meaning'
+        }), 400
+    if len(items) > ml_service.duplicate_batch_max_items:
+        return jsonify({
+            'status': 'error',
+            'message': f"At most {ml_service.duplicate_batch_max_items} items per request"
+        }), 400
+    if limit is None or not 0 <= limit <= ml_service.duplicate_batch_max_limit or not 0.0 <= threshold <= 1.0:
+        return jsonify({
+            'status': 'error',
+            'message': f"Limit must be an integer between 0 and {ml_service.duplicate_batch_max_limit} "
+                       f"and threshold a number between 0 and 1"
+        }), 400
+    
+    catalog = ml_service.get_catalog()
+    abbreviations = [item['abbreviation'].strip() for item in items]
+    meanings = [item['meaning'].strip() for item in items]
+    
+    def generate():
+        index = 0
+        try:
+            # Entries are also checked against each other, so an import can't add the same entry twice
+            earlier = earlier_duplicates(abbreviations, meanings, limit, threshold)
+            matches = catalog.duplicate_index.check_batch(abbreviations, meanings, limit, threshold)
+            for index, ((rows, similarity_scores, exact), (batch_rows, batch_scores, batch_exact)) in enumerate(
+                zip(matches, earlier)
+            ):
+                batch_duplicates = [
+                    {'index': row, 'similarity_score': round(score, 3), 'exact': is_exact}
+                    for row, score, is_exact in zip(batch_rows.tolist(), batch_scores.tolist(), batch_exact.tolist())
+                ]
+                yield json.dumps({
+                    'index': index,
+                    'abbreviation': abbreviations[index],
+                    'meaning': meanings[index],
+                    'exact_duplicate': bool(exact.any()),
+                    'duplicates': ml_service.duplicate_entries(catalog, rows, similarity_scores, exact),
+                    'batch_duplicates': batch_duplicates
+                }) + '\n'
+        except Exception as e:
+            logger.error(f"Error in batch duplicate check at item {index}: {e}")
+            yield json.dumps({'index': index, 'status': 'error', 'message': str(e)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/user-profile/<int:user_id>', methods=['GET'])
 def get_user_profile(user_id):
     """Get user profile for recommendations"""
@@ -845,19 +2006,19 @@ def get_batch_recommendations():
         # Process abbreviation similarities
         if abbreviation_ids:
             results['similar_abbreviations'] = {}
-            # Fetch abbreviations data
-            backend_url = os.getenv('BACKEND_URL', 'http://backend:8000')
-            
             for abbr_id in abbreviation_ids:
                 try:
-                    response = requests.get(f"{backend_url}/api/abbreviations/{abbr_id}")
+                    # Fetch abbreviation data
+                    response = ml_service.backend_get(f"/api/abbreviations/{abbr_id}")
                     if response.status_code == 200:
                         abbr_data = response.json()
                         query_text = f"{abbr_data['abbreviation']} {abbr_data['meaning']}"
                         
                         # Use the similar abbreviations logic
+                        budget = current_deadline().timeout()
                         similar_response = requests.post(f"http://localhost:5000/similar-abbreviations", 
-                                                       json={'text': query_text, 'limit': 5})
+                                                       json={'text': query_text, 'limit': 5}, timeout=budget,
+                                                       headers={DEADLINE_HEADER: f"{budget:.3f}"} if budget else {})
                         if similar_response.status_code == 200:
                             similar_data = similar_response.json()
                             results['similar_abbreviations'][str(abbr_id)] = similar_data.get('similar_abbreviations', [])
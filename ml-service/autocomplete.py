@@ -0,0 +1,215 @@
+import bisect
+
+import numpy as np
+
+from ranking import top_k
+from text_index import build_postings
+
+FIELD_ABBREVIATION, FIELD_MEANING, FIELD_WORD = 0, 1, 2
+FIELD_NAMES = ['abbreviation', 'meaning', 'meaning']
+# Abbreviation codes rank above full meanings, which rank above single meaning words
+FIELD_WEIGHTS = [3.0, 2.0, 1.0]
+EXACT_MATCH_BONUS = 1.0
+POPULARITY_WEIGHT = 0.5
+# Prefix ranges wider than this walk the entries in popularity order instead of scoring the whole range
+HEAVY_RANGE = 4096
+FUZZY_PREFIX = 12
+FUZZY_MAX_CANDIDATES = 32
+_KEY_END = '\U0010ffff'
+
+
+def normalize_query(text):
+    return ' '.join(text.lower().split())
+
+
+def bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def prefix_edit_distance(query, key, max_edits):
+    """Smallest edit distance between `query` and any prefix of `key` (max_edits + 1 if larger)
+
+    Insertions, deletions, substitutions and adjacent transpositions each cost one edit.
+    """
+    key = key[:len(query) + max_edits]
+    over = max_edits + 1
+    # Only cells within max_edits of the diagonal can stay under the bound
+    before, previous = None, [j if j <= max_edits else over for j in range(len(key) + 1)]
+    for i, query_char in enumerate(query, 1):
+        current = [over] * (len(key) + 1)
+        current[0] = row_min = i if i < over else over
+        for j in range(max(1, i - max_edits), min(len(key), i + max_edits) + 1):
+            key_char = key[j - 1]
+            cost = previous[j - 1] + (query_char != key_char)
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            if i > 1 and j > 1 and query_char == key[j - 2] and query[i - 2] == key_char and before[j - 2] + 1 < cost:
+                cost = before[j - 2] + 1
+            if cost < over:
+                current[j] = cost
+                if cost < row_min:
+                    row_min = cost
+        if row_min > max_edits:
+            return over
+        before, previous = previous, current
+    return min(previous)
+
+
+class SortedKeys:
+    """Lexicographically sorted (key, row) entries of one field with a popularity walk order"""
+
+    def __init__(self, entries, popularity):
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.rows = np.array([row for _, row in entries], dtype=np.int32)
+        self.key_lengths = np.fromiter(map(len, self.keys), dtype=np.int32, count=len(self.keys))
+        self.scores = popularity[self.rows] if len(self.rows) else np.empty(0)
+        self.by_score = np.argsort(-self.scores, kind='stable')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def key_range(self, prefix, exact=False):
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_right(self.keys, prefix, lo) if exact else bisect.bisect_left(self.keys, prefix + _KEY_END, lo)
+        return lo, hi
+
+    def best(self, prefix, wanted):
+        """Up to `wanted` (positions, scores incl. exact-match bonus) for keys starting with `prefix`"""
+        lo, hi = self.key_range(prefix)
+        if hi - lo <= HEAVY_RANGE:
+            positions = np.arange(lo, hi)
+        else:
+            # Only exact matches get a bonus, so the rest of the range comes out in walk order
+            exact_lo, exact_hi = self.key_range(prefix, exact=True)
+            picked = [exact_lo + top_k(self.scores[exact_lo:exact_hi], wanted)]
+            found = 0
+            for start in range(0, len(self.by_score), HEAVY_RANGE):
+                chunk = self.by_score[start:start + HEAVY_RANGE]
+                chunk = chunk[(chunk >= lo) & (chunk < hi)][:wanted - found]
+                picked.append(chunk)
+                found += len(chunk)
+                if found >= wanted:
+                    break
+            positions = np.unique(np.concatenate(picked))
+
+        scores = POPULARITY_WEIGHT * self.scores[positions] + EXACT_MATCH_BONUS * (self.key_lengths[positions] == len(prefix))
+        keep = top_k(scores, wanted)
+        return positions[keep], scores[keep]
+
+
+class AutocompleteIndex:
+    """Prefix and fuzzy suggestions over abbreviation codes, full meanings and meaning words
+
+    Each field keeps its entries in a sorted key list, so a prefix is a
+    contiguous range found with two binary searches. Entries are ranked by
+    field weight, popularity and an exact-match bonus; wide ranges (short
+    prefixes) walk the field in popularity order instead of scoring the whole
+    range. Fuzzy matching counts shared bigrams between the query and the
+    leading characters of each distinct code/word, then verifies the best
+    candidates with a bounded prefix edit distance.
+    """
+
+    def __init__(self, abbreviations, meanings, popularity=None):
+        entries = [[], [], []]
+        for row, (abbreviation, meaning) in enumerate(zip(abbreviations, meanings)):
+            abbreviation, meaning = normalize_query(abbreviation), normalize_query(meaning)
+            if abbreviation:
+                entries[FIELD_ABBREVIATION].append((abbreviation, row))
+            if meaning:
+                entries[FIELD_MEANING].append((meaning, row))
+                entries[FIELD_WORD].extend((word, row) for word in set(meaning.split()))
+
+        popularity = np.log1p(np.maximum(np.asarray(
+            popularity if popularity is not None else np.zeros(len(abbreviations)), dtype=np.float64
+        ), 0))
+        if len(popularity) and popularity.max() > 0:
+            popularity = popularity / popularity.max()
+        self.fields = [SortedKeys(field_entries, popularity) for field_entries in entries]
+
+        # Fuzzy candidates: distinct codes and words, posted under the bigrams of their leading characters
+        self.terms = sorted(set(self.fields[FIELD_ABBREVIATION].keys) | set(self.fields[FIELD_WORD].keys))
+        gram_ids = {}
+        gram_keys, gram_terms = [], []
+        for term_id, term in enumerate(self.terms):
+            for gram in bigrams('^' + term[:FUZZY_PREFIX]):
+                gram_keys.append(gram_ids.setdefault(gram, len(gram_ids)))
+                gram_terms.append(term_id)
+        self.gram_ids = gram_ids
+        self.gram_indptr, self.gram_terms = build_postings(gram_keys, gram_terms, len(gram_ids))
+
+    def __len__(self):
+        return sum(len(field) for field in self.fields)
+
+    def prefix_candidates(self, query, limit):
+        """Best (row, field) pairs whose key starts with `query`, best first (rows may repeat)"""
+        # A row can appear under several keys; over-select so de-duplication still fills the limit
+        wanted = limit * 4
+        rows, fields, scores = [], [], []
+        for field, keys in enumerate(self.fields):
+            positions, field_scores = keys.best(query, wanted)
+            rows.append(keys.rows[positions])
+            fields.append(np.full(len(positions), field, dtype=np.int8))
+            scores.append(FIELD_WEIGHTS[field] + field_scores)
+        rows, fields, scores = np.concatenate(rows), np.concatenate(fields), np.concatenate(scores)
+        best = top_k(scores, wanted)
+        return list(zip(rows[best].tolist(), fields[best].tolist()))
+
+    def fuzzy_terms(self, query, max_edits):
+        """Distinct codes/words within `max_edits` of a prefix of theirs, closest first"""
+        grams = bigrams('^' + query[:FUZZY_PREFIX])
+        postings = [
+            self.gram_terms[self.gram_indptr[slot]:self.gram_indptr[slot + 1]]
+            for slot in (self.gram_ids.get(gram) for gram in grams) if slot is not None
+        ]
+        if not postings:
+            return []
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.terms))
+        # A substitution or indel breaks at most two of the query's bigrams, a transposition three
+        needed = max(len(grams) - 3 * max_edits, 1)
+        candidates = top_k(shared, FUZZY_MAX_CANDIDATES, threshold=needed - 1)
+
+        matches = []
+        for term_id in candidates.tolist():
+            distance = prefix_edit_distance(query, self.terms[term_id], max_edits)
+            if 0 < distance <= max_edits:
+                matches.append((distance, term_id))
+        return [self.terms[term_id] for _, term_id in sorted(matches)]
+
+    def fuzzy_candidates(self, query, limit):
+        """(row, field) pairs whose code or meaning word is a close misspelling of the query"""
+        max_edits = 1 if len(query) < 8 else 2
+        for term in self.fuzzy_terms(query, max_edits):
+            for field in (FIELD_ABBREVIATION, FIELD_WORD):
+                keys = self.fields[field]
+                lo, hi = keys.key_range(term, exact=True)
+                for position in (lo + top_k(keys.scores[lo:hi], limit)).tolist():
+                    yield int(keys.rows[position]), field
+
+    def search(self, query, limit=10, fuzzy=True):
+        """Suggestions as (row, field name, match type) tuples, prefix matches before fuzzy ones"""
+        query = normalize_query(query)
+        if not query or limit <= 0:
+            return []
+
+        results, seen = [], set()
+        matches = [(self.prefix_candidates(query, limit), 'prefix')]
+        if fuzzy and len(query) >= 4:
+            matches.append((self.fuzzy_candidates(query, limit), 'fuzzy'))
+        for candidates, match in matches:
+            for row, field in candidates:
+                if row not in seen:
+                    seen.add(row)
+                    results.append((row, FIELD_NAMES[field], match))
+                    if len(results) >= limit:
+                        return results
+        return results
+
+    def stats(self):
+        return {
+            'entries': len(self),
+            'fuzzy_terms': len(self.terms),
+            'grams': len(self.gram_ids),
+        }
@@ -0,0 +1,56 @@
+"""Recall@10 and latency of the IVF index vs. exact search over LSA item vectors
+
+Run from ml-service/: python benchmarks/ann_recall.py [rows]
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ann import IVFIndex  # noqa: E402
+from catalog import Catalog  # noqa: E402
+from catalog_memory import synthetic_payload  # noqa: E402
+from ranking import top_k  # noqa: E402
+from similarity import LsaSimilarityIndex  # noqa: E402
+
+QUERIES = 200
+K = 10
+
+
+def main(rows=100_000):
+    catalog = Catalog.from_records(json.loads(synthetic_payload(rows))['data'])
+    started = time.perf_counter()
+    lsa = LsaSimilarityIndex(catalog.similarity_text, dimensions=128)
+    print(f"rows: {rows}, LSA fit {time.perf_counter() - started:.1f} s")
+
+    rng = np.random.RandomState(1)
+    # Queries: item texts with half of their words dropped, embedded the way requests are
+    queries = []
+    for row in rng.choice(rows, QUERIES, replace=False):
+        words = catalog.similarity_text[row].split()
+        queries.append(lsa.embed(' '.join(words[:max(1, len(words) // 2)])))
+
+    started = time.perf_counter()
+    exact = [set(top_k(lsa.vectors @ query, K).tolist()) for query in queries]
+    exact_ms = (time.perf_counter() - started) / QUERIES * 1000
+    print(f"exact:               {exact_ms:7.3f} ms/query, recall@{K} 1.000")
+
+    started = time.perf_counter()
+    ivf = IVFIndex().fit(lsa.vectors)
+    print(f"IVF build {time.perf_counter() - started:.1f} s: {ivf.stats()}")
+    for probes in (1, 2, 4, 8, 16, 32, 64, 128):
+        started = time.perf_counter()
+        found = [set(ivf.search(query, K, probes=probes)[0].tolist()) for query in queries]
+        ms = (time.perf_counter() - started) / QUERIES * 1000
+        recall = np.mean([len(a & b) / max(len(b), 1) for a, b in zip(found, exact)])
+        print(f"IVF probes={probes:3d}:     {ms:7.3f} ms/query, recall@{K} {recall:.3f}, "
+              f"speed-up x{exact_ms / ms:.1f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
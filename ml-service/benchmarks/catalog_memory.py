@@ -0,0 +1,63 @@
+"""Memory of the cached catalog per 100k rows: raw JSON list of dicts vs. columnar Catalog
+
+Run from ml-service/: python benchmarks/catalog_memory.py [rows]
+"""
+import json
+import os
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import Catalog  # noqa: E402
+
+CATEGORIES = ['Tehnologija', 'Poslovanje', 'Medicina', 'Pravo', 'Obrazovanje', 'Financije']
+DEPARTMENTS = ['IT', 'HR', 'Prodaja', 'Marketing', 'Pravna služba', None]
+
+
+def synthetic_payload(rows, seed=0):
+    rng = random.Random(seed)
+    now = datetime(2024, 6, 1)
+    records = []
+    for i in range(rows):
+        records.append({
+            'id': i + 1,
+            'abbreviation': ''.join(rng.choice('ABCDEFGHIJKLMNOPRSTUVZ') for _ in range(rng.randint(2, 5))),
+            'meaning': ' '.join(f"word{rng.randint(0, 5000)}" for _ in range(rng.randint(2, 5))),
+            'description': ' '.join(f"term{rng.randint(0, 20000)}" for _ in range(rng.randint(0, 20))),
+            'category': rng.choice(CATEGORIES),
+            'department': rng.choice(DEPARTMENTS),
+            'votes_count': rng.randint(0, 50),
+            'comments': [
+                {'id': j, 'content': f"comment {j}", 'user_id': rng.randint(1, 1000)}
+                for j in range(rng.randint(0, 4))
+            ],
+            'created_at': (now - timedelta(seconds=rng.randint(0, 3 * 365 * 86400))).isoformat() + 'Z',
+        })
+    return json.dumps({'data': records})
+
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main(rows=100_000):
+    payload = synthetic_payload(rows)
+    _, raw_bytes = measure(lambda: json.loads(payload)['data'])
+    # The raw list is dropped once the catalog is built, as in MLService.get_cached_abbreviations
+    catalog, columnar_bytes = measure(lambda: Catalog.from_records(json.loads(payload)['data']))
+    scale = 100_000 / rows
+    print(f"rows: {rows}")
+    print(f"list of dicts: {raw_bytes * scale / 1e6:.1f} MB per 100k rows")
+    print(f"columnar:      {columnar_bytes * scale / 1e6:.1f} MB per 100k rows "
+          f"(memory_usage() estimate {catalog.memory_usage()['total'] * scale / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,94 @@
+"""Latency and recall of /check-duplicate style lookups against a brute-force trigram cosine scan
+
+Meanings are drawn from a Zipf-distributed vocabulary of pronounceable words
+(the catalog_memory payload repeats "wordNNNN", so every row shares trigrams).
+Half of the queries are catalog rows with a typo, a plural or different
+casing; the other half are new phrases.
+
+Run from ml-service/: python benchmarks/duplicate_check.py [rows] [queries]
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import DUPLICATE_THRESHOLD, DuplicateIndex, duplicate_key  # noqa: E402
+from text_index import char_ngrams  # noqa: E402
+
+CONSONANTS, VOWELS = 'bcdfghklmnprstvz', 'aeiou'
+
+
+def vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(rng.randint(2, 5))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+def phrases(count, words, rng):
+    weights = 1.0 / np.arange(1, len(words) + 1)
+    picks = np.random.RandomState(rng.randint(0, 2 ** 31)).choice(
+        len(words), size=(count, 5), p=weights / weights.sum())
+    return [' '.join(words[i] for i in row[:rng.randint(2, 5)]).title() for row in picks]
+
+
+def perturb(text, rng):
+    kind = rng.randint(0, 2)
+    if kind == 0:
+        i = rng.randint(1, len(text) - 2)
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text + 's' if kind == 1 else text.upper()
+
+
+def brute_force(abbreviation, meaning, grams, k, threshold):
+    query = char_ngrams(' '.join(duplicate_key(abbreviation, meaning)))
+    scores = np.array([len(query & g) / np.sqrt(len(query) * len(g)) if g else 0.0 for g in grams])
+    best = np.argsort(-scores, kind='stable')[:k]
+    return set(best[scores[best] > threshold].tolist())
+
+
+def main(rows=100_000, queries=1000):
+    rng = random.Random(0)
+    words = vocabulary(20_000, rng)
+    abbreviations = [''.join(rng.choice('ABCDEFGHIJKLMNOPRSTUVZ') for _ in range(rng.randint(2, 5))) for _ in range(rows)]
+    meanings = phrases(rows, words, rng)
+
+    started = time.perf_counter()
+    index = DuplicateIndex(abbreviations, meanings)
+    print(f"build: {time.perf_counter() - started:.2f}s, {index.stats()['bytes'] / 1e6:.1f} MB")
+
+    sample = rng.sample(range(rows), queries // 2)
+    query_abbreviations = [abbreviations[row] for row in sample] + abbreviations[:queries - len(sample)]
+    query_meanings = [perturb(meanings[row], rng) for row in sample] + phrases(queries - len(sample), words, rng)
+
+    timings, results = [], []
+    for abbreviation, meaning in zip(query_abbreviations, query_meanings):
+        started = time.perf_counter()
+        results.append(index.check(abbreviation, meaning, k=None))
+        timings.append(time.perf_counter() - started)
+    timings = np.array(timings) * 1000
+    print(f"single check: median {np.median(timings):.3f} ms, p99 {np.percentile(timings, 99):.3f} ms")
+
+    started = time.perf_counter()
+    list(index.check_batch(query_abbreviations, query_meanings, k=None))
+    print(f"bulk check: {(time.perf_counter() - started) * 1000 / queries:.3f} ms per item")
+
+    sources = np.mean([row in result_rows for row, (result_rows, _, _) in zip(sample, results)])
+    print(f"perturbed rows finding their source: {sources:.3f}")
+    grams = [char_ngrams(' '.join(duplicate_key(a, m))) for a, m in zip(abbreviations, meanings)]
+    found = expected = 0
+    for (abbreviation, meaning), (result_rows, _, _) in zip(zip(query_abbreviations[:200], query_meanings[:200]), results):
+        truth = brute_force(abbreviation, meaning, grams, 5, DUPLICATE_THRESHOLD)
+        found += len(truth & set(result_rows[:5].tolist()))
+        expected += len(truth)
+    print(f"recall@5 vs a brute-force scan (200 perturbed queries): {found / max(expected, 1):.3f}")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
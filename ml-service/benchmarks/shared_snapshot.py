@@ -0,0 +1,80 @@
+"""Per-worker memory when workers attach to one shared snapshot vs. each building its own catalog
+
+Linux only (reads /proc/self/smaps_rollup).
+Run from ml-service/: python benchmarks/shared_snapshot.py [rows] [workers]
+"""
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.catalog_memory import synthetic_payload  # noqa: E402
+from catalog import Catalog  # noqa: E402
+from similarity import SparseSimilarityIndex  # noqa: E402
+from snapshot import CatalogSnapshotStore  # noqa: E402
+
+
+def private_bytes():
+    with open('/proc/self/smaps_rollup') as f:
+        fields = {parts[0]: int(parts[1]) for parts in map(str.split, f) if len(parts) == 3 and parts[2] == 'kB'}
+    return (fields['Private_Clean:'] + fields['Private_Dirty:']) * 1024
+
+
+def touch(catalog, index):
+    # Read every column and the whole TF-IDF matrix, as serving eventually does
+    for name in ('ids', 'votes', 'comments', 'created_epoch', 'category_codes', 'department_codes'):
+        getattr(catalog, name).sum()
+    sum(len(text) for text in catalog.meanings)
+    index.matrix.data.sum()
+    index.nearest('human resources', 10)
+
+
+def attached_worker(directory, results):
+    before = private_bytes()
+    started = time.perf_counter()
+    snapshot = CatalogSnapshotStore(directory).load()
+    attach_seconds = time.perf_counter() - started
+    touch(snapshot.catalog, snapshot.similarity_index)
+    results.put((private_bytes() - before, attach_seconds))
+
+
+def building_worker(payload, results):
+    before = private_bytes()
+    started = time.perf_counter()
+    catalog = Catalog.from_records(json.loads(payload)['data'])
+    index = SparseSimilarityIndex(catalog.similarity_text)
+    build_seconds = time.perf_counter() - started
+    touch(catalog, index)
+    results.put((private_bytes() - before, build_seconds))
+
+
+def run(target, args, workers):
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=target, args=args + (results,)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    measured = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return max(m[0] for m in measured), max(m[1] for m in measured)
+
+
+def main(rows=100_000, workers=4):
+    payload = synthetic_payload(rows)
+    with tempfile.TemporaryDirectory() as directory:
+        catalog = Catalog.from_records(json.loads(payload)['data'])
+        CatalogSnapshotStore(directory).write(catalog, SparseSimilarityIndex(catalog.similarity_text))
+        attached = run(attached_worker, (directory,), workers)
+    built = run(building_worker, (payload,), workers)
+
+    print(f"rows: {rows}, workers: {workers}")
+    print(f"own catalog per worker:  {built[0] / 1e6:.1f} MB private, {built[1]:.2f} s to build")
+    print(f"attached to snapshot:    {attached[0] / 1e6:.1f} MB private, {attached[1] * 1000:.1f} ms to attach")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,52 @@
+"""Throughput of 1,000 similarity queries: separate /similar-abbreviations calls vs. one batch request
+
+Run from ml-service/: python benchmarks/similarity_batch.py [rows] [queries] [mode]
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, ml_service  # noqa: E402
+from catalog import Catalog  # noqa: E402
+from catalog_memory import synthetic_payload  # noqa: E402
+
+
+def main(rows=100_000, queries=1000, mode='tfidf'):
+    catalog = Catalog.from_records(json.loads(synthetic_payload(rows))['data'])
+    ml_service.abbreviations_cache = catalog.records()
+    ml_service.cache_timestamp = datetime.now()
+    ml_service.similarity_mode = mode
+    ml_service.similarity_cache.max_bytes = 0  # measure scoring, not the result cache
+    texts = [' '.join(catalog.similarity_text[row].split()[:4]) for row in range(0, rows, rows // queries)][:queries]
+    ml_service.similarity_index(catalog)
+
+    with app.test_client() as client:
+        started = time.perf_counter()
+        singles = [
+            json.loads(client.post('/similar-abbreviations', json={'text': text, 'limit': 5}).data)
+            for text in texts
+        ]
+        single_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        response = client.post('/similar-abbreviations/batch', json={'texts': texts, 'limit': 5})
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        batch_seconds = time.perf_counter() - started
+
+    same = sum(
+        [r['id'] for r in line['similar_abbreviations']] == [r['id'] for r in single['similar_abbreviations']]
+        for line, single in zip(lines, singles)
+    )
+    print(f"rows: {rows}, queries: {len(texts)}, mode: {mode}")
+    print(f"separate calls: {single_seconds:6.2f} s ({len(texts) / single_seconds:7.0f} queries/s)")
+    print(f"batch request:  {batch_seconds:6.2f} s ({len(texts) / batch_seconds:7.0f} queries/s), "
+          f"x{single_seconds / batch_seconds:.1f}, identical results for {same}/{len(texts)}")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]), *sys.argv[3:4])
@@ -0,0 +1,68 @@
+"""Similarity query latency and memory: per-request TF-IDF fit vs. prebuilt sparse TF-IDF vs. LSA vectors
+
+Run from ml-service/: python benchmarks/similarity_modes.py [rows]
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from catalog import Catalog  # noqa: E402
+from catalog_memory import synthetic_payload  # noqa: E402
+from ranking import top_k  # noqa: E402
+from similarity import LsaSimilarityIndex, SparseSimilarityIndex, build_vectorizer  # noqa: E402
+
+QUERIES = 20
+
+
+def per_request_fit(texts, query):
+    """The pre-index path: refit TF-IDF over catalog + query for every request"""
+    matrix = build_vectorizer(1000).fit_transform(texts + [query])
+    return cosine_similarity(matrix[-1], matrix[:-1]).ravel()
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+
+def main(rows=100_000):
+    catalog = Catalog.from_records(json.loads(synthetic_payload(rows))['data'])
+    texts = catalog.similarity_text
+    queries = [texts[row] for row in range(0, rows, rows // QUERIES)][:QUERIES]
+
+    _, fit_ms = timed(lambda: per_request_fit(texts, queries[0]), 1)
+    print(f"rows: {rows}")
+    print(f"per-request fit:     {fit_ms:9.2f} ms/query")
+
+    reference = None
+    for name, build in [
+        ('sparse tfidf', lambda: SparseSimilarityIndex(texts)),
+        ('lsa-128 float32', lambda: LsaSimilarityIndex(texts, 128, np.float32)),
+        ('lsa-128 float16', lambda: LsaSimilarityIndex(texts, 128, np.float16)),
+        ('lsa-64 float32', lambda: LsaSimilarityIndex(texts, 64, np.float32)),
+    ]:
+        index, build_ms = timed(build, 1)
+        results, query_ms = timed(lambda: [index.scores(query) for query in queries], 3)
+        top = [set(top_k(scores, 10).tolist()) for scores in results]
+        self_hits = np.mean([row in hits for row, hits in zip(range(0, rows, rows // QUERIES), top)])
+        line = (f"{name + ':':20s} {query_ms / len(queries):9.2f} ms/query, "
+                f"{index.nbytes() / 1e6:6.1f} MB, build {build_ms / 1000:5.1f} s, self-recall@10 {self_hits:.2f}")
+        if reference is None:
+            reference = top
+        else:
+            overlap = np.mean([len(a & b) / 10 for a, b in zip(top, reference)])
+            line += f", top-10 overlap with sparse {overlap:.2f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
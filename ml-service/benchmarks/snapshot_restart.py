@@ -0,0 +1,50 @@
+"""Warm restart from a catalog snapshot vs. a cold rebuild from the backend payload
+
+Run from ml-service/: python benchmarks/snapshot_restart.py [rows]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.catalog_memory import synthetic_payload  # noqa: E402
+from catalog import Catalog  # noqa: E402
+from similarity import SparseSimilarityIndex  # noqa: E402
+from snapshot import CatalogSnapshotStore  # noqa: E402
+
+
+def timed(build):
+    started = time.perf_counter()
+    result = build()
+    return result, time.perf_counter() - started
+
+
+def main(rows=100_000):
+    payload = synthetic_payload(rows)
+
+    def cold():
+        catalog = Catalog.from_records(json.loads(payload)['data'])
+        return catalog, SparseSimilarityIndex(catalog.similarity_text)
+
+    (catalog, index), cold_seconds = timed(cold)
+    with tempfile.TemporaryDirectory() as directory:
+        store = CatalogSnapshotStore(directory)
+        _, write_seconds = timed(lambda: store.write(catalog, index))
+        snapshot, load_seconds = timed(store.load)
+        # First query touches the mapped pages the TF-IDF scan needs
+        _, first_query_seconds = timed(lambda: snapshot.similarity_index.nearest('human resources', 10))
+        _, records_seconds = timed(snapshot.catalog.records)
+
+    print(f"rows: {rows}")
+    print(f"cold (parse + catalog + TF-IDF): {cold_seconds:.2f} s")
+    print(f"snapshot write:                  {write_seconds:.2f} s")
+    print(f"snapshot load (mmap):            {load_seconds * 1000:.1f} ms")
+    print(f"first similarity query:          {first_query_seconds * 1000:.1f} ms")
+    print(f"records() for the legacy cache:  {records_seconds:.2f} s")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,188 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def estimate_size(value):
+    """Approximate deep size in bytes of a JSON-like result (dicts, lists, strings, numbers, arrays)"""
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) + (0 if value.base is None else value.nbytes)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+class ResultCache:
+    """Thread-safe LRU of computed results, capped by the estimated bytes it holds
+
+    Entries belong to one snapshot version (versions increase over time): the
+    first lookup or put for a newer version drops everything cached for the
+    previous one, while calls still holding an older snapshot just miss and
+    are not stored, so they can't wipe the current entries. Each entry remembers
+    the CPU time its computation took, so hits can report the CPU time saved.
+    """
+
+    def __init__(self, max_bytes, clock=time.thread_time):
+        self.max_bytes = int(max_bytes)
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.version = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.saved_cpu_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _set_version(self, version):
+        """Advance to `version` if it is newer; returns whether it is the current version"""
+        if self.version is None or version > self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.bytes = 0
+            self.version = version
+        return version == self.version
+
+    def lookup(self, version, key):
+        """Cached result for `key` under snapshot `version`, or None (counted as a miss)"""
+        with self.lock:
+            entry = self.entries.get(key) if self._set_version(version) else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.saved_cpu_seconds += entry[2]
+            return entry[0]
+
+    def get_or_compute(self, version, key, compute):
+        """Cached result for `key` under snapshot `version`, calling `compute()` on a miss"""
+        value = self.lookup(version, key)
+        if value is not None:
+            return value
+
+        # Compute outside the lock so slow misses don't serialise other lookups
+        started = self.clock()
+        value = compute()
+        cost = self.clock() - started
+        self.put(version, key, value, cost)
+        return value
+
+    def put(self, version, key, value, cost=0.0):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return False
+        with self.lock:
+            # Drop results computed against a snapshot that was replaced meanwhile
+            if not self._set_version(version):
+                return False
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self.entries[key] = (value, size, cost)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'version': self.version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'saved_cpu_seconds': round(self.saved_cpu_seconds, 4),
+            }
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key onto one in-progress computation
+
+    The first caller for a key runs it; callers arriving while it runs wait and
+    share its result (or its exception). Nothing is kept once it finishes, so
+    this only merges overlapping calls; caching stays with ResultCache and the
+    TTLs. Keys are tuples whose first element names the operation, which is
+    what the per-operation counters are grouped by.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.executed = {}
+        self.coalesced = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, compute, timeout=None):
+        """Result of `compute()`, shared with every concurrent call for the same key
+
+        A caller that joins a running computation waits at most `timeout`
+        seconds for it and then raises TimeoutError; the computation goes on
+        for the others.
+        """
+        operation = key[0]
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+                self.executed[operation] = self.executed.get(operation, 0) + 1
+            else:
+                self.coalesced[operation] = self.coalesced.get(operation, 0) + 1
+
+        if not leader:
+            if not flight.done.wait(timeout):
+                raise TimeoutError(f"gave up waiting for {operation}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        with self.lock:
+            return {
+                'in_flight': len(self.flights),
+                'executed': sum(self.executed.values()),
+                'coalesced': sum(self.coalesced.values()),
+                'coalesced_by_operation': dict(self.coalesced),
+            }
@@ -0,0 +1,352 @@
+import itertools
+import math
+import sys
+import time
+from collections.abc import Sequence
+from datetime import datetime, timezone
+
+import numpy as np
+
+from autocomplete import AutocompleteIndex
+from dedup import DuplicateIndex
+from similarity import build_similarity_index
+from text_index import TextIndex
+
+_versions = itertools.count(1)
+
+
+def parse_epoch(value):
+    """Seconds since the epoch for an ISO-8601 timestamp, NaN if missing or invalid"""
+    if not value:
+        return math.nan
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def days_old(created_epoch, now):
+    """Whole days between creation epochs and `now` (scalar or array; NaN stays NaN)"""
+    return np.floor((now - np.asarray(created_epoch, dtype=np.float64)) / 86400.0)
+
+
+class _Interner:
+    """Shares one object per distinct string within a build (unlike sys.intern, the table is dropped afterwards)"""
+
+    def __init__(self):
+        self.strings = {'': ''}
+
+    def __call__(self, value):
+        if not isinstance(value, str):
+            return ''
+        return self.strings.setdefault(value, value)
+
+
+class _Codes:
+    """Maps categorical values onto a small integer code space (None is -1)"""
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+
+    def code(self, value):
+        if value is None:
+            return -1
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class StringColumn(Sequence):
+    """Read-only list of strings kept as one UTF-8 byte buffer plus offsets, decoded on access
+
+    Both arrays can be memory-mapped, so a loaded column costs no Python
+    objects until its rows are read.
+    """
+
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values):
+        encoded = [value.encode('utf-8', 'surrogatepass') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('string column index out of range')
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]].tobytes().decode('utf-8', 'surrogatepass')
+
+    def __iter__(self):
+        data, offsets = self.buffer.tobytes(), self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield data[start:end].decode('utf-8', 'surrogatepass')
+
+    def nbytes(self):
+        return self.buffer.nbytes + self.offsets.nbytes
+
+
+class Catalog:
+    """Immutable columnar snapshot of the abbreviation catalog
+
+    Numeric attributes live in typed NumPy columns, categorical attributes
+    (category, department) as integer codes into a shared value list, and text
+    fields as interned strings. Nested `comments` arrays are reduced to counts
+    at build time. Each snapshot gets a process-wide increasing `version`.
+    Text fields may also be StringColumns, as when a snapshot is loaded from disk.
+    """
+
+    def __init__(self, ids, votes, comments, created_epoch, abbreviations, meanings, descriptions,
+                 category_codes, categories, department_codes, departments,
+                 meaning_lengths=None, description_lengths=None):
+        self.ids = ids
+        self.votes = votes
+        self.comments = comments
+        self.created_epoch = created_epoch
+        self.abbreviations = abbreviations
+        self.meanings = meanings
+        self.descriptions = descriptions
+        self.category_codes = category_codes
+        self.categories = categories
+        self.department_codes = department_codes
+        self.departments = departments
+        if meaning_lengths is None:
+            meaning_lengths = np.fromiter(map(len, meanings), dtype=np.int32, count=len(meanings))
+        if description_lengths is None:
+            description_lengths = np.fromiter(map(len, descriptions), dtype=np.int32, count=len(descriptions))
+        self.meaning_lengths = meaning_lengths
+        self.description_lengths = description_lengths
+        # id -> row index as a sorted id array searched with np.searchsorted
+        self.id_order = np.argsort(ids, kind='stable')
+        self.sorted_ids = ids[self.id_order]
+        self.version = next(_versions)
+        self.built_at = time.time()
+        self._search_text = None
+        self._similarity_text = None
+        self._search_index = None
+        self._autocomplete_index = None
+        self._duplicate_index = None
+        self._similarity_indexes = {}
+        # (scores, epoch they were computed at), kept by the trending endpoint
+        self.trending = None
+
+    @classmethod
+    def from_records(cls, records):
+        """Build the columns from the backend's list of abbreviation dicts"""
+        n = len(records)
+        ids = np.empty(n, dtype=np.int64)
+        votes = np.zeros(n, dtype=np.int32)
+        comments = np.zeros(n, dtype=np.int32)
+        created_epoch = np.full(n, np.nan, dtype=np.float64)
+        category_codes = np.full(n, -1, dtype=np.int32)
+        department_codes = np.full(n, -1, dtype=np.int32)
+        categories, departments = _Codes(), _Codes()
+        abbreviations, meanings, descriptions = [], [], []
+        intern = _Interner()
+
+        for row, record in enumerate(records):
+            ids[row] = record['id']
+            votes[row] = record.get('votes_count') or 0
+            if 'comments' in record:
+                comments[row] = len(record.get('comments') or [])
+            else:
+                comments[row] = record.get('comments_count') or 0
+            created_epoch[row] = parse_epoch(record.get('created_at'))
+            category_codes[row] = categories.code(record.get('category'))
+            department_codes[row] = departments.code(record.get('department'))
+            abbreviations.append(intern(record.get('abbreviation')))
+            meanings.append(intern(record.get('meaning')))
+            descriptions.append(intern(record.get('description')))
+
+        return cls(ids, votes, comments, created_epoch, abbreviations, meanings, descriptions,
+                   category_codes, categories.values, department_codes, departments.values)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def age_days(self, now):
+        """Whole days since creation for every row against a single `now` epoch"""
+        return days_old(self.created_epoch, now)
+
+    def rows_for(self, abbreviation_ids):
+        """Catalog rows for an array of ids (-1 where the id is not in the catalog)"""
+        abbreviation_ids = np.asarray(abbreviation_ids, dtype=np.int64)
+        if not len(self):
+            return np.full(len(abbreviation_ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.sorted_ids, abbreviation_ids), len(self) - 1)
+        return np.where(self.sorted_ids[positions] == abbreviation_ids, self.id_order[positions], -1)
+
+    def row_of(self, abbreviation_id):
+        """Catalog row of one id, or None"""
+        try:
+            row = int(self.rows_for([int(abbreviation_id)])[0])
+        except (TypeError, ValueError):
+            return None
+        return row if row >= 0 else None
+
+    def id_mask(self, abbreviation_ids):
+        """Boolean column marking rows whose id is in `abbreviation_ids`"""
+        mask = np.zeros(len(self), dtype=bool)
+        rows = self.rows_for(list(abbreviation_ids))
+        mask[rows[rows >= 0]] = True
+        return mask
+
+    def value_mask(self, codes, labels, values):
+        """Boolean column marking rows whose categorical value is one of `values`"""
+        lookup = {value: code for code, value in enumerate(labels)}
+        wanted = [lookup[value] if value is not None else -1 for value in values
+                  if value is None or value in lookup]
+        return np.isin(codes, wanted)
+
+    def category_mask(self, values):
+        return self.value_mask(self.category_codes, self.categories, values)
+
+    def department_mask(self, values):
+        return self.value_mask(self.department_codes, self.departments, values)
+
+    @property
+    def search_text(self):
+        """Lowercased "abbreviation meaning" per row, used for search-history matching"""
+        if self._search_text is None:
+            self._search_text = [f"{a} {m}".lower() for a, m in zip(self.abbreviations, self.meanings)]
+        return self._search_text
+
+    @property
+    def search_index(self):
+        """Inverted index over search_text, built on first use for this snapshot"""
+        if self._search_index is None:
+            self._search_index = TextIndex(self.search_text)
+        return self._search_index
+
+    @property
+    def autocomplete_index(self):
+        """Prefix / fuzzy suggestion index over codes and meanings, built on first use for this snapshot"""
+        if self._autocomplete_index is None:
+            self._autocomplete_index = AutocompleteIndex(self.abbreviations, self.meanings, self.votes)
+        return self._autocomplete_index
+
+    @property
+    def duplicate_index(self):
+        """Exact-key and MinHash LSH near-duplicate index over codes and meanings, built on first use for this snapshot"""
+        if self._duplicate_index is None:
+            self._duplicate_index = DuplicateIndex(self.abbreviations, self.meanings)
+        return self._duplicate_index
+
+    def build_indexes(self):
+        """Build the lazily created per-snapshot indexes ahead of the first request"""
+        return self.search_index, self.autocomplete_index, self.duplicate_index
+
+    def similarity_index(self, mode='tfidf', **options):
+        """TF-IDF, LSA or hashed TF-IDF similarity index over similarity_text, built on first use for this snapshot"""
+        index = self._similarity_indexes.get(mode)
+        if index is None:
+            index = self._similarity_indexes[mode] = build_similarity_index(
+                self.similarity_text, mode, ids=self.ids, **options
+            )
+        return index
+
+    def add_similarity_index(self, index):
+        """Adopt an index built elsewhere (e.g. loaded from a snapshot) for its mode"""
+        self._similarity_indexes[index.mode] = index
+
+    @property
+    def similarity_text(self):
+        """Lowercased "abbreviation meaning description" per row, used for TF-IDF"""
+        if self._similarity_text is None:
+            self._similarity_text = [
+                f"{a} {m} {d}".lower() for a, m, d in zip(self.abbreviations, self.meanings, self.descriptions)
+            ]
+        return self._similarity_text
+
+    def category(self, row):
+        code = self.category_codes[row]
+        return self.categories[code] if code >= 0 else None
+
+    def department(self, row):
+        code = self.department_codes[row]
+        return self.departments[code] if code >= 0 else None
+
+    def record(self, row):
+        """Lightweight dict view of one row in the backend's field names"""
+        epoch = self.created_epoch[row]
+        return {
+            'id': int(self.ids[row]),
+            'abbreviation': self.abbreviations[row],
+            'meaning': self.meanings[row],
+            'description': self.descriptions[row],
+            'category': self.category(row),
+            'department': self.department(row),
+            'votes_count': int(self.votes[row]),
+            'comments_count': int(self.comments[row]),
+            'created_at': None if np.isnan(epoch) else
+            datetime.fromtimestamp(epoch, timezone.utc).isoformat().replace('+00:00', 'Z'),
+        }
+
+    def records(self):
+        return CatalogRecords(self)
+
+    def memory_usage(self):
+        """Approximate bytes held by each column (strings counted once per distinct object)"""
+        def strings(values):
+            if isinstance(values, StringColumn):
+                return values.nbytes()
+            unique = {id(v): v for v in values}
+            return sys.getsizeof(values) + sum(sys.getsizeof(v) for v in unique.values())
+
+        usage = {
+            'ids': self.ids.nbytes,
+            'votes': self.votes.nbytes,
+            'comments': self.comments.nbytes,
+            'created_epoch': self.created_epoch.nbytes,
+            'text_lengths': self.meaning_lengths.nbytes + self.description_lengths.nbytes,
+            'category_codes': self.category_codes.nbytes + strings(self.categories),
+            'department_codes': self.department_codes.nbytes + strings(self.departments),
+            'abbreviations': strings(self.abbreviations),
+            'meanings': strings(self.meanings),
+            'descriptions': strings(self.descriptions),
+            'id_index': self.id_order.nbytes + self.sorted_ids.nbytes,
+        }
+        usage['total'] = sum(usage.values())
+        return usage
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'rows': len(self),
+            'age_seconds': round(time.time() - self.built_at, 1),
+            'memory_bytes': self.memory_usage()['total'],
+        }
+
+
+class CatalogRecords(Sequence):
+    """Read-only list-of-dicts view over a Catalog, materialising rows on access"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.catalog.record(row) for row in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('catalog row out of range')
+        return self.catalog.record(index)
+
+    def __eq__(self, other):
+        return list(self) == list(other) if isinstance(other, (list, CatalogRecords)) else NotImplemented
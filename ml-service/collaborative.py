@@ -0,0 +1,245 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+
+def prune_rows(matrix, keep):
+    """Keep only the `keep` largest entries of every CSR row"""
+    matrix = matrix.tocsr()
+    matrix.sum_duplicates()
+    row_nnz = np.diff(matrix.indptr)
+    over = np.flatnonzero(row_nnz > keep)
+    if not len(over):
+        return matrix
+
+    # Over-full rows are padded into one (rows x widest row) block and partitioned in a single call;
+    # if one very wide row would make the block much larger than the entries, rank them with one sort
+    lengths = row_nnz[over]
+    keep_mask = np.ones(matrix.nnz, dtype=bool)
+    if len(over) * int(lengths.max()) <= 4 * int(lengths.sum()):
+        positions = matrix.indptr[over][:, None] + np.arange(int(lengths.max()))
+        padded = np.arange(positions.shape[1]) >= lengths[:, None]
+        values = np.where(padded, -np.inf, matrix.data[np.where(padded, 0, positions)])
+        weakest = np.argpartition(-values, keep, axis=1)[:, keep:]
+        weakest_positions = np.take_along_axis(positions, weakest, axis=1)
+        keep_mask[weakest_positions[~np.take_along_axis(padded, weakest, axis=1)]] = False
+    else:
+        entries = np.concatenate([np.arange(matrix.indptr[row], matrix.indptr[row + 1]) for row in over])
+        rows = np.repeat(over, lengths)
+        order = np.lexsort((-matrix.data[entries], rows))
+        rank = np.empty(len(entries), dtype=np.int64)
+        rank[order] = np.arange(len(entries)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        keep_mask[entries[rank >= keep]] = False
+
+    rows = np.repeat(np.arange(matrix.shape[0]), row_nnz)[keep_mask]
+    return sparse.csr_matrix(
+        (matrix.data[keep_mask], (rows, matrix.indices[keep_mask])), shape=matrix.shape
+    )
+
+
+class ItemItemModel:
+    """Sparse item-item co-occurrence model built incrementally from the interaction log
+
+    Two items co-occur when the same user interacts with both within `window`
+    consecutive events. Raw co-occurrence counts are pruned to `max_raw_per_item`
+    entries per item so memory stays bounded regardless of log size; the
+    serving matrix holds cosine-normalised similarities pruned to `top_n` per item.
+
+    Updates only read events appended since the last one. Each user's last
+    `window` items are kept (`user_tails`) to pair new events with earlier
+    ones, and only rows touched by the new events are renormalised, so an
+    update costs time in proportion to the new events, not the log. Tails
+    are ordered by the user's latest event and dropped once that event has
+    left the log's ring buffer, so they are bounded by the log's capacity.
+    """
+
+    def __init__(self, top_n=20, max_raw_per_item=50, window=20):
+        self.top_n = top_n
+        self.max_raw_per_item = max_raw_per_item
+        self.window = window
+        self.item_index = {}
+        self.item_ids = np.empty(0, dtype=np.int64)
+        self.item_counts = np.zeros(0, dtype=np.float64)
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.similarity = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.user_tails = OrderedDict()
+        self.processed_seq = 0
+        self.built_at = None
+        self.last_build_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def pending(self, log):
+        return log.total - self.processed_seq
+
+    def _columns(self, ids):
+        """Map abbreviation ids to model columns, growing a copy of the index only if there are unseen ids"""
+        unseen = [abbr_id for abbr_id in np.unique(ids).tolist() if abbr_id not in self.item_index]
+        item_index = self.item_index
+        if unseen:
+            item_index = dict(item_index)
+            for abbr_id in unseen:
+                item_index[abbr_id] = len(item_index)
+        columns = np.array([item_index[abbr_id] for abbr_id in ids.tolist()], dtype=np.int64)
+        return item_index, columns
+
+    def update(self, log):
+        """Fold events appended to the log since the last update into the model"""
+        entries = log.entries(since=self.processed_seq)
+        if not len(entries['seq']):
+            return False
+        started = time.time()
+        item_index, new_columns = self._columns(entries['item_ids'])
+        n_items = len(item_index)
+
+        # Each affected user's previous events go in front of the new ones; they pair but are not recounted
+        new_users = entries['user_ids']
+        tails = [(user_id, self.user_tails.get(user_id, (0, ()))[1]) for user_id in np.unique(new_users).tolist()]
+        tail_users = np.array([user_id for user_id, tail in tails for _ in tail], dtype=np.int64)
+        tail_columns = np.array([column for _, tail in tails for column in tail], dtype=np.int64)
+        tail_seq = np.concatenate([np.arange(-len(tail), 0) for _, tail in tails] + [np.empty(0, dtype=np.int64)])
+        all_users = np.concatenate((tail_users, new_users))
+        all_columns = np.concatenate((tail_columns, new_columns))
+        all_new = np.concatenate((np.zeros(len(tail_users), dtype=bool), np.ones(len(new_users), dtype=bool)))
+
+        # Group by user in append order so neighbouring positions are a user's consecutive events
+        order = np.lexsort((np.concatenate((tail_seq, entries['seq'])), all_users))
+        users, columns, new = all_users[order], all_columns[order], all_new[order]
+
+        rows, cols = [], []
+        for offset in range(1, self.window + 1):
+            if offset >= len(users):
+                break
+            # Count each pair once: only when the later event of the pair is new
+            paired = (users[offset:] == users[:-offset]) & new[offset:]
+            earlier, later = columns[:-offset][paired], columns[offset:][paired]
+            distinct = earlier != later
+            rows.extend((earlier[distinct], later[distinct]))
+            cols.extend((later[distinct], earlier[distinct]))
+
+        item_counts = np.zeros(n_items, dtype=np.float64)
+        item_counts[:len(self.item_counts)] = self.item_counts
+        item_counts += np.bincount(new_columns, minlength=n_items)
+
+        counts = self.counts
+        if counts.shape != (n_items, n_items):
+            counts = counts.copy()
+            counts.resize((n_items, n_items))
+        if rows:
+            rows, cols = np.concatenate(rows), np.concatenate(cols)
+            delta = sparse.csr_matrix(
+                (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n_items, n_items)
+            )
+            counts = prune_rows(counts + delta, self.max_raw_per_item)
+
+        # Rows whose counts changed or that reference an item whose interaction count changed
+        changed = np.unique(new_columns)
+        touched = np.unique(np.repeat(np.arange(n_items), np.diff(counts.indptr))[np.isin(counts.indices, changed)])
+        similarity = self._renormalise(self.similarity, counts, item_counts, np.union1d(changed, touched))
+
+        # Each affected user's last `window` items (the end of their group in the sorted order),
+        # visited in the order of their latest event so the tails stay ordered by it
+        ends = np.append(np.flatnonzero(users[1:] != users[:-1]) + 1, len(users))
+        starts = np.maximum(np.append(0, ends[:-1]), ends - self.window)
+        last_seq = np.concatenate((tail_seq, entries['seq']))[order][ends - 1]
+        by_latest = np.argsort(last_seq)
+        column_list = columns.tolist()
+        touched_tails = [
+            (user_id, (seq, tuple(column_list[start:end])))
+            for user_id, seq, start, end in zip(
+                users[ends - 1][by_latest].tolist(), last_seq[by_latest].tolist(),
+                starts[by_latest].tolist(), ends[by_latest].tolist()
+            )
+        ]
+        # Users whose latest event has been overwritten in the ring buffer are no longer tracked
+        horizon = log.total - log.capacity
+
+        with self.lock:
+            self.item_index = item_index
+            if len(self.item_ids) != n_items:
+                self.item_ids = np.fromiter(item_index, dtype=np.int64, count=n_items)
+            self.counts = counts
+            self.item_counts = item_counts
+            self.similarity = similarity
+            for user_id, tail in touched_tails:
+                self.user_tails.pop(user_id, None)
+                self.user_tails[user_id] = tail
+            while self.user_tails and next(iter(self.user_tails.values()))[0] < horizon:
+                self.user_tails.popitem(last=False)
+            self.processed_seq = int(entries['seq'][-1]) + 1
+            self.built_at = time.time()
+        self.last_build_seconds = time.time() - started
+        return True
+
+    def load_state(self, item_ids, item_counts, counts, similarity):
+        """Adopt a previously built model (e.g. from a snapshot); new log events are folded in on top"""
+        item_ids = np.asarray(item_ids, dtype=np.int64)
+        with self.lock:
+            self.item_index = {abbr_id: col for col, abbr_id in enumerate(item_ids.tolist())}
+            self.item_ids = item_ids
+            self.item_counts = np.asarray(item_counts, dtype=np.float64)
+            self.counts = counts
+            self.similarity = similarity
+            self.user_tails = OrderedDict()
+            self.processed_seq = 0
+            self.built_at = time.time()
+
+    def _renormalise(self, similarity, counts, item_counts, rows):
+        """Similarity matrix with `rows` recomputed from the counts (cosine-normalised, top-N pruned)"""
+        n_items = counts.shape[0]
+        coo = (counts if len(rows) == n_items else counts[rows]).tocoo()
+        norms = np.sqrt(np.maximum(item_counts, 1.0))
+        values = coo.data / (norms[rows[coo.row]] * norms[coo.col])
+        fresh = prune_rows(sparse.csr_matrix(
+            (values.astype(np.float32), (rows[coo.row], coo.col)), shape=(n_items, n_items)
+        ), self.top_n)
+
+        if similarity.shape != (n_items, n_items):
+            similarity = similarity.copy()
+            similarity.resize((n_items, n_items))
+        keep = np.ones(n_items, dtype=bool)
+        keep[rows] = False
+        kept = sparse.diags(keep.astype(np.float32)) @ similarity
+        kept.eliminate_zeros()
+        return (kept + fresh).tocsr()
+
+    def score(self, weights):
+        """Sparse user vector times the similarity matrix; returns (item_ids, scores) or None"""
+        with self.lock:
+            similarity, item_index, item_ids = self.similarity, self.item_index, self.item_ids
+        columns = [(item_index[abbr_id], weight) for abbr_id, weight in weights.items() if abbr_id in item_index]
+        if not columns or similarity.nnz == 0:
+            return None
+        cols, values = zip(*columns)
+        user_vector = sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float32), (np.zeros(len(cols), dtype=np.int64), cols)),
+            shape=(1, similarity.shape[0])
+        )
+        scores = np.asarray((user_vector @ similarity).todense()).ravel()
+        return item_ids, scores
+
+    def neighbours(self, abbreviation_id, limit=10):
+        """Most similar items to one abbreviation as (id, similarity) pairs"""
+        col = self.item_index.get(abbreviation_id)
+        if col is None or col >= self.similarity.shape[0]:
+            return []
+        row = self.similarity.getrow(col)
+        order = np.argsort(-row.data)[:limit]
+        return [(int(self.item_ids[row.indices[i]]), float(row.data[i])) for i in order]
+
+    def stats(self):
+        memory = sum(
+            m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in (self.counts, self.similarity)
+        ) + self.item_counts.nbytes + self.item_ids.nbytes
+        return {
+            'items': len(self.item_ids),
+            'similarity_nnz': int(self.similarity.nnz),
+            'raw_nnz': int(self.counts.nnz),
+            'processed_interactions': self.processed_seq,
+            'memory_bytes': int(memory),
+        }
@@ -0,0 +1,25 @@
+import os
+import tempfile
+
+import pytest
+
+# Keep model artifacts written during tests out of the repository's models/ directory
+os.environ.setdefault('ARTIFACTS_DIR', tempfile.mkdtemp(prefix='ml-service-artifacts-'))
+
+
+class FakeClock:
+    """Clock for injecting into time-dependent code; tests move it by changing `now`"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def artifacts_dir(tmp_path, monkeypatch):
+    """Per-test artifacts directory, so snapshots saved by one test's MLService never warm-start another's"""
+    path = tmp_path / 'artifacts'
+    monkeypatch.setenv('ARTIFACTS_DIR', str(path))
+    return path
@@ -0,0 +1,69 @@
+import contextvars
+import math
+import time
+
+# Seconds the caller will wait for our response; we forward the remainder on backend calls
+DEADLINE_HEADER = 'X-Request-Timeout'
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of starting work the request's caller will no longer wait for"""
+
+
+class Deadline:
+    """Point on the monotonic clock by which a request's response is due
+
+    Relative budgets are exchanged over HTTP (DEADLINE_HEADER) so clock skew
+    between hosts does not matter; internally the deadline is absolute, so
+    every stage sees what is left after the stages before it.
+    """
+
+    def __init__(self, budget=None, clock=time.monotonic):
+        self.clock = clock
+        self.expires_at = math.inf if budget is None else clock() + budget
+
+    @classmethod
+    def from_header(cls, value, default=None, clock=time.monotonic):
+        """Deadline from a DEADLINE_HEADER value in seconds, or `default` seconds if missing or malformed"""
+        try:
+            budget = float(value)
+        except (TypeError, ValueError):
+            budget = default
+        if budget is not None and not math.isfinite(budget):
+            budget = default
+        return cls(budget, clock=clock)
+
+    def remaining(self):
+        """Seconds left (inf without a deadline, never negative)"""
+        return max(0.0, self.expires_at - self.clock())
+
+    def expired(self):
+        return self.clock() >= self.expires_at
+
+    def timeout(self, cap=None):
+        """Timeout for a blocking call: what is left, capped at `cap` seconds; raises if nothing is left"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("request deadline exceeded")
+        if cap is None:
+            return None if math.isinf(remaining) else remaining
+        return min(cap, remaining)
+
+
+NO_DEADLINE = Deadline()
+
+_current = contextvars.ContextVar('deadline', default=NO_DEADLINE)
+
+
+def current_deadline():
+    """Deadline of the request being handled (NO_DEADLINE in background work)"""
+    return _current.get()
+
+
+def set_deadline(deadline):
+    """Make `deadline` current; returns a token for reset_deadline"""
+    return _current.set(deadline)
+
+
+def reset_deadline(token):
+    _current.reset(token)
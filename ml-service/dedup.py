@@ -0,0 +1,277 @@
+from bisect import bisect_left
+
+import numpy as np
+
+from autocomplete import normalize_query
+from text_index import char_ngrams
+
+DUPLICATE_THRESHOLD = 0.6
+# 24 bands of 3 MinHash values: pairs with trigram Jaccard 0.43 (cosine ~0.6) become candidates
+# with probability ~0.86, pairs at Jaccard 0.6 with ~0.997
+LSH_BANDS = 24
+LSH_BAND_ROWS = 3
+# Candidates taken per (query, band) bucket, so one huge bucket of near-identical rows can't stall a query
+MAX_BUCKET = 256
+BLOCK_QUERIES = 1024
+TABLE_ELEMENTS = 16 * 1024 * 1024
+_PRIME = (1 << 31) - 1
+_HASH_CHUNK = 1 << 22
+# Band keys keep the band number in their top bits, so all bands share one sorted array
+_BAND_SHIFT = np.uint64(58)
+
+
+def duplicate_key(abbreviation, meaning):
+    """Normalized (abbreviation, meaning) pair shared by exact duplicates"""
+    return normalize_query(abbreviation or ''), normalize_query(meaning or '')
+
+
+def gram_postings(texts, vocabulary, extend=False):
+    """CSR (indptr, gram ids) of every text's distinct character trigrams
+
+    With `extend`, unseen trigrams are added to `vocabulary`; otherwise they
+    get ids past its end (consistent within the call), so they still count
+    towards MinHash signatures and set sizes without matching anything.
+    """
+    indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+    ids = []
+    unseen = {}
+    for row, text in enumerate(texts):
+        for gram in char_ngrams(text):
+            gram_id = vocabulary.get(gram)
+            if gram_id is None:
+                if extend:
+                    gram_id = vocabulary[gram] = len(vocabulary)
+                else:
+                    gram_id = unseen.setdefault(gram, len(vocabulary) + len(unseen))
+            ids.append(gram_id)
+        indptr[row + 1] = len(ids)
+    return indptr, np.asarray(ids, dtype=np.int64)
+
+
+def universal_hashes(gram_ids, multipliers, offsets):
+    """(a * id + b) mod (2^31 - 1) for every gram id (rows) and hash function (columns)"""
+    return ((gram_ids[:, None].astype(np.uint64) * multipliers + offsets) % _PRIME).astype(np.uint32)
+
+
+def minhash_signatures(indptr, gram_ids, hash_grams, n_hashes):
+    """MinHash signature per CSR row, hashing gram ids with `hash_grams` in chunks of at most _HASH_CHUNK values
+
+    Rows without grams keep the sentinel 2^31 - 1, which no hash reaches.
+    """
+    n_rows = len(indptr) - 1
+    signatures = np.full((n_rows, n_hashes), _PRIME, dtype=np.uint32)
+    budget = max(1, _HASH_CHUNK // n_hashes)
+    start = 0
+    while start < n_rows:
+        end = min(max(start + 1, int(np.searchsorted(indptr, indptr[start] + budget, side='right')) - 1), n_rows)
+        first, last = indptr[start], indptr[end]
+        if last > first:
+            # Empty rows start where the next row starts, so reducing from each non-empty start is exact
+            nonempty = start + np.flatnonzero(np.diff(indptr[start:end + 1]))
+            signatures[nonempty] = np.minimum.reduceat(hash_grams(gram_ids[first:last]), indptr[nonempty] - first, axis=0)
+        start = end
+    return signatures
+
+
+class DuplicateIndex:
+    """Exact-key and near-duplicate lookup over (abbreviation, meaning) pairs of one snapshot
+
+    Candidates come from two places: a sorted array of normalized-key hashes
+    (verified against the strings, so hash collisions never report a false
+    exact match) and MinHash LSH over the character trigrams of
+    "abbreviation meaning". Every (row, band) key sits in one sorted array
+    probed with a single np.searchsorted per block of queries. Candidates are
+    reranked by the cosine similarity of their trigram sets,
+    |A & B| / sqrt(|A| |B|), counted against the stored CSR gram lists.
+    """
+
+    def __init__(self, abbreviations, meanings, bands=LSH_BANDS, band_rows=LSH_BAND_ROWS, random_state=0):
+        self.abbreviations = abbreviations
+        self.meanings = meanings
+        self.size = len(abbreviations)
+        self.bands = bands
+        self.band_rows = band_rows
+        rng = np.random.RandomState(random_state)
+        self.multipliers = rng.randint(1, _PRIME, size=bands * band_rows).astype(np.uint64)
+        self.offsets = rng.randint(0, _PRIME, size=bands * band_rows).astype(np.uint64)
+        self.band_mixers = rng.randint(1, 2 ** 62, size=band_rows, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+
+        keys = [duplicate_key(a, m) for a, m in zip(abbreviations, meanings)]
+        key_hashes = np.fromiter((hash(key) for key in keys), dtype=np.int64, count=self.size)
+        self.key_order = np.argsort(key_hashes, kind='stable')
+        self.sorted_key_hashes = key_hashes[self.key_order]
+
+        self.vocabulary = {}
+        self.indptr, gram_ids = gram_postings([' '.join(key) for key in keys], self.vocabulary, extend=True)
+        self.gram_ids = gram_ids.astype(np.int32)
+        self.gram_counts = np.diff(self.indptr)
+        # Every known gram is hashed once here; queries only hash grams the catalog has never seen
+        self.gram_hashes = universal_hashes(np.arange(len(self.vocabulary)), self.multipliers, self.offsets)
+
+        indexed = np.flatnonzero(self.gram_counts)
+        band_keys = self._band_keys(
+            minhash_signatures(self.indptr, gram_ids, self._hash_grams, len(self.multipliers))[indexed]
+        ).ravel()
+        order = np.argsort(band_keys, kind='stable')
+        self.band_keys = band_keys[order]
+        self.band_members = np.repeat(indexed, bands)[order].astype(np.int32)
+
+    def __len__(self):
+        return self.size
+
+    def _hash_grams(self, gram_ids):
+        known = gram_ids < len(self.gram_hashes)
+        if known.all():
+            return self.gram_hashes[gram_ids]
+        hashes = np.empty((len(gram_ids), len(self.multipliers)), dtype=np.uint32)
+        hashes[known] = self.gram_hashes[gram_ids[known]]
+        hashes[~known] = universal_hashes(gram_ids[~known], self.multipliers, self.offsets)
+        return hashes
+
+    def _band_keys(self, signatures):
+        """(rows x bands) keys mixing each band's MinHash values, prefixed with the band number"""
+        bands = signatures.reshape(len(signatures), self.bands, self.band_rows).astype(np.uint64)
+        mixed = (bands * self.band_mixers).sum(axis=2, dtype=np.uint64) >> np.uint64(64 - int(_BAND_SHIFT))
+        return mixed | (np.arange(self.bands, dtype=np.uint64) << _BAND_SHIFT)
+
+    def _exact_rows(self, key, k=None):
+        """Rows whose normalized key equals `key`, in row order; at most `k` of them"""
+        key_hash = hash(key)
+        lo = np.searchsorted(self.sorted_key_hashes, key_hash, side='left')
+        hi = np.searchsorted(self.sorted_key_hashes, key_hash, side='right')
+        rows = []
+        # The stable sort keeps equal hashes in row order, so the first `k` verified rows are the ones reported
+        for row in self.key_order[lo:hi]:
+            if len(rows) == k:
+                break
+            if duplicate_key(self.abbreviations[row], self.meanings[row]) == key:
+                rows.append(int(row))
+        return rows
+
+    def _candidates(self, signatures, has_grams):
+        """Unique (query, row) pairs sharing at least one LSH band, sorted by query then row"""
+        query_keys = self._band_keys(signatures).ravel()
+        lo = np.searchsorted(self.band_keys, query_keys, side='left')
+        hi = np.searchsorted(self.band_keys, query_keys, side='right')
+        lengths = np.where(np.repeat(has_grams, self.bands), np.minimum(hi - lo, MAX_BUCKET), 0)
+        positions = np.repeat(lo - np.cumsum(lengths) + lengths, lengths) + np.arange(int(lengths.sum()))
+        width = max(self.size, 1)
+        pairs = np.repeat(np.arange(len(lengths)) // self.bands, lengths) * width + self.band_members[positions]
+        pairs.sort()
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))] if len(pairs) else pairs
+        return np.divmod(pairs, width)
+
+    def _cosines(self, pair_queries, pair_rows, query_indptr, query_grams):
+        """Trigram-set cosine of every (query, row) pair, via a (queries x grams) membership table"""
+        n_queries, n_grams = len(query_indptr) - 1, len(self.vocabulary)
+        query_counts = np.diff(query_indptr)
+        # Grams the catalog has never seen can't be shared, so they only count towards the set size
+        known = query_grams < n_grams
+        table = np.zeros(n_queries * n_grams, dtype=bool)
+        table[np.repeat(np.arange(n_queries), query_counts)[known] * n_grams + query_grams[known]] = True
+        starts = self.indptr[pair_rows]
+        lengths = self.gram_counts[pair_rows]
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(int(lengths.sum()))
+        shared = table[np.repeat(pair_queries, lengths) * n_grams + self.gram_ids[positions]]
+        counts = np.bincount(np.repeat(np.arange(len(pair_rows)), lengths), weights=shared, minlength=len(pair_rows))
+        return (counts / np.sqrt(np.maximum(query_counts[pair_queries] * lengths, 1))).astype(np.float32)
+
+    def check(self, abbreviation, meaning, k=5, threshold=DUPLICATE_THRESHOLD):
+        """(rows, scores, exact flags) of the catalog entries duplicating one submission, best first"""
+        return next(self.check_batch([abbreviation], [meaning], k, threshold))
+
+    def check_batch(self, abbreviations, meanings, k=5, threshold=DUPLICATE_THRESHOLD, block_size=BLOCK_QUERIES):
+        """Yields check() for every submission, hashing and reranking blocks of submissions at once
+
+        Exact duplicates score 1.0 and come first; near-duplicates need a
+        cosine strictly above `threshold`. `k=None` returns every match.
+        """
+        # Blocks are also capped so the rerank's membership table stays under TABLE_ELEMENTS
+        block_size = max(1, min(block_size, TABLE_ELEMENTS // max(len(self.vocabulary), 1)))
+        for start in range(0, len(abbreviations), block_size):
+            keys = [duplicate_key(a, m) for a, m in
+                    zip(abbreviations[start:start + block_size], meanings[start:start + block_size])]
+            indptr, gram_ids = gram_postings([' '.join(key) for key in keys], self.vocabulary)
+            signatures = minhash_signatures(indptr, gram_ids, self._hash_grams, len(self.multipliers))
+            pair_queries, pair_rows = self._candidates(signatures, np.diff(indptr) > 0)
+            pair_scores = self._cosines(pair_queries, pair_rows, indptr, gram_ids)
+            bounds = np.searchsorted(pair_queries, np.arange(len(keys) + 1))
+
+            for query, key in enumerate(keys):
+                exact = self._exact_rows(key, k)
+                rows = pair_rows[bounds[query]:bounds[query + 1]]
+                scores = pair_scores[bounds[query]:bounds[query + 1]]
+                near = scores > threshold
+                if exact:
+                    near &= ~np.isin(rows, exact)
+                rows = np.concatenate((np.asarray(exact, dtype=np.int64), rows[near]))
+                scores = np.concatenate((np.ones(len(exact), dtype=np.float32), scores[near]))
+                is_exact = np.arange(len(rows)) < len(exact)
+                # Exact matches first, then by score; ties keep row order
+                order = np.lexsort((rows, -scores, ~is_exact))[:k]
+                yield rows[order], scores[order], is_exact[order]
+
+    def nbytes(self):
+        return (self.key_order.nbytes + self.sorted_key_hashes.nbytes + self.indptr.nbytes + self.gram_ids.nbytes
+                + self.gram_counts.nbytes + self.gram_hashes.nbytes + self.band_keys.nbytes + self.band_members.nbytes)
+
+    def stats(self):
+        return {
+            'items': self.size,
+            'grams': len(self.vocabulary),
+            'bands': self.bands,
+            'band_rows': self.band_rows,
+            'bytes': self.nbytes(),
+        }
+
+
+def earlier_duplicates(abbreviations, meanings, limit, threshold=DUPLICATE_THRESHOLD):
+    """Yields (rows, scores, exact flags) of the earlier entries each entry of a batch duplicates, best first
+
+    Entries are grouped on duplicate_key once, so repeated entries cost a
+    dictionary lookup instead of being compared with each other, and only
+    the distinct keys are indexed and checked for near-duplicates. At most
+    `limit` rows are reported per entry: exact duplicates first, then by
+    score; ties keep row order.
+    """
+    keys = [duplicate_key(a, m) for a, m in zip(abbreviations, meanings)]
+    key_rows = {}
+    for row, key in enumerate(keys):
+        key_rows.setdefault(key, []).append(row)
+    # Distinct keys in order of first occurrence, so each one is checked just before it is first needed
+    distinct = list(key_rows)
+    first_rows = np.array([key_rows[key][0] for key in distinct], dtype=np.int64)
+    key_numbers = {key: number for number, key in enumerate(distinct)}
+    matches = DuplicateIndex(
+        [abbreviations[row] for row in first_rows.tolist()], [meanings[row] for row in first_rows.tolist()]
+    ).check_batch(
+        [abbreviations[row] for row in first_rows.tolist()], [meanings[row] for row in first_rows.tolist()],
+        None, threshold
+    )
+
+    near = []
+    for row, key in enumerate(keys):
+        same_key = key_rows[key]
+        if same_key[0] == row:
+            rows, scores, exact = next(matches)
+            near.append((rows[~exact], scores[~exact], first_rows[rows[~exact]]))
+        exact_rows = same_key[:min(bisect_left(same_key, row), limit)]
+
+        # Every earlier entry of a near key matches with that key's score; stop once a full score tier is in
+        needed, found, previous = limit - len(exact_rows), [], None
+        numbers, scores, firsts = near[key_numbers[key]]
+        # Only keys that already occurred have earlier entries, and each of those has at least one
+        earlier = firsts < row
+        for number, score in zip(numbers[earlier].tolist(), scores[earlier].tolist()):
+            if needed <= 0 or (len(found) >= needed and score != previous):
+                break
+            near_rows = key_rows[distinct[number]]
+            found.extend((near_row, score) for near_row in near_rows[:min(bisect_left(near_rows, row), needed)])
+            previous = score
+        found = sorted(found, key=lambda pair: (-pair[1], pair[0]))[:max(needed, 0)]
+
+        yield (
+            np.array(exact_rows + [near_row for near_row, _ in found], dtype=np.int64),
+            np.array([1.0] * len(exact_rows) + [score for _, score in found], dtype=np.float32),
+            np.arange(len(exact_rows) + len(found)) < len(exact_rows),
+        )
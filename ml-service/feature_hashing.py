@@ -0,0 +1,251 @@
+import threading
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from ranking import sparse_batch_top_k, top_k
+
+HASHING_FEATURES = 2 ** 18
+_INITIAL_CAPACITY = 1024
+
+
+def build_hashing_vectorizer(n_features=HASHING_FEATURES):
+    """Stateless bigram term counter: the same text maps to the same columns in every process"""
+    return HashingVectorizer(
+        n_features=n_features, ngram_range=(1, 2), stop_words='english', alternate_sign=False, norm=None
+    )
+
+
+def smooth_idf(document_frequency, n_documents):
+    """sklearn's smoothed IDF: log((1 + n) / (1 + df)) + 1"""
+    return np.log((1.0 + n_documents) / (1.0 + document_frequency)) + 1.0
+
+
+class _GrowableArray:
+    """Append-only NumPy buffer that doubles its capacity; `view()` slices stay valid after growth"""
+
+    def __init__(self, dtype):
+        self.array = np.empty(_INITIAL_CAPACITY, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        end = self.size + len(values)
+        if end > len(self.array):
+            grown = np.empty(max(end, 2 * len(self.array)), dtype=self.array.dtype)
+            grown[:self.size] = self.array[:self.size]
+            self.array = grown
+        self.array[self.size:end] = values
+        self.size = end
+
+    def view(self):
+        return self.array[:self.size]
+
+
+class HashingFeatureStore:
+    """Hashed term counts of every abbreviation seen, with incrementally maintained document frequencies
+
+    Each abbreviation id owns a slot holding its raw bigram term counts
+    (appended to flat nnz buffers) and contributes to `document_frequency`.
+    `sync` diffs a catalog snapshot against the slots: only new or changed
+    texts are vectorized, removed ones are retired by decrementing their
+    document frequencies, so an update costs O(changed rows) rather than a
+    refit. Because the vectorizer is stateless, replicas produce identical
+    vectors, and their frequency arrays can be added together.
+    """
+
+    def __init__(self, n_features=HASHING_FEATURES):
+        self.n_features = n_features
+        self.vectorizer = build_hashing_vectorizer(n_features)
+        self.document_frequency = np.zeros(n_features, dtype=np.int64)
+        self.n_documents = 0
+        self.slot_of = {}
+        self.slot_text = []
+        self.slot_start = _GrowableArray(np.int64)
+        self.slot_end = _GrowableArray(np.int64)
+        self.indices = _GrowableArray(np.int32)
+        self.counts = _GrowableArray(np.float32)
+        self.retired = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def _append(self, items, matrix):
+        """Append vectorized (id, text) rows as new slots; returns their slot numbers"""
+        first_slot, offset = len(self.slot_text), self.indices.size
+        self.indices.extend(matrix.indices)
+        self.counts.extend(matrix.data)
+        self.slot_start.extend(offset + matrix.indptr[:-1])
+        self.slot_end.extend(offset + matrix.indptr[1:])
+        # Each row's columns are distinct after sum_duplicates, so this counts documents per column;
+        # small batches scatter-add instead of allocating a full-width count array
+        if len(matrix.indices) * 64 < self.n_features:
+            np.add.at(self.document_frequency, matrix.indices, 1)
+        else:
+            self.document_frequency += np.bincount(matrix.indices, minlength=self.n_features)
+        self.n_documents += len(items)
+        slots = range(first_slot, first_slot + len(items))
+        for (abbreviation_id, text), slot in zip(items, slots):
+            self.slot_of[abbreviation_id] = slot
+            self.slot_text.append(text)
+        return list(slots)
+
+    def _retire(self, abbreviation_id):
+        slot = self.slot_of.pop(abbreviation_id)
+        columns = self.indices.array[self.slot_start.array[slot]:self.slot_end.array[slot]]
+        self.document_frequency[columns] -= 1
+        self.n_documents -= 1
+        self.slot_text[slot] = None
+        self.retired += 1
+
+    def add(self, abbreviation_id, text):
+        """Vectorize one abbreviation and add (or replace) it in O(text length); returns its slot"""
+        return self.sync_changes([(abbreviation_id, text)])[0]
+
+    def remove(self, abbreviation_id):
+        with self.lock:
+            if abbreviation_id in self.slot_of:
+                self._retire(abbreviation_id)
+
+    def sync_changes(self, items):
+        """Add or replace (id, text) pairs, vectorizing only texts that differ from the stored ones"""
+        with self.lock:
+            slots = [self.slot_of.get(abbreviation_id) for abbreviation_id, _ in items]
+            changed = [
+                i for i, ((_, text), slot) in enumerate(zip(items, slots))
+                if slot is None or self.slot_text[slot] != text
+            ]
+            if changed:
+                for i in changed:
+                    if slots[i] is not None:
+                        self._retire(items[i][0])
+                matrix = self.vectorizer.transform([items[i][1] for i in changed]).tocsr()
+                matrix.sum_duplicates()
+                for i, slot in zip(changed, self._append([items[i] for i in changed], matrix)):
+                    slots[i] = slot
+            return slots
+
+    def sync(self, ids, texts):
+        """Bring the store in line with a catalog snapshot; returns the slot of every catalog row"""
+        ids = [int(abbreviation_id) for abbreviation_id in ids]
+        slots = self.sync_changes(list(zip(ids, texts)))
+        with self.lock:
+            for abbreviation_id in set(self.slot_of) - set(ids):
+                self._retire(abbreviation_id)
+            if self.retired > max(len(self.slot_of), 1024):
+                slots = self._compact(ids)
+        return np.asarray(slots, dtype=np.int64)
+
+    def _compact(self, ids):
+        """Drop retired slots' counts from the buffers; returns the new slots of `ids`"""
+        live_ids = list(self.slot_of)
+        old_slots = np.array([self.slot_of[abbreviation_id] for abbreviation_id in live_ids], dtype=np.int64)
+        starts = self.slot_start.view()[old_slots]
+        lengths = self.slot_end.view()[old_slots] - starts
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(int(lengths.sum()))
+        indices, counts = self.indices.array[positions], self.counts.array[positions]
+        texts = [self.slot_text[slot] for slot in old_slots.tolist()]
+
+        self.slot_of, self.slot_text, self.retired = {}, [], 0
+        self.slot_start, self.slot_end = _GrowableArray(np.int64), _GrowableArray(np.int64)
+        self.indices, self.counts = _GrowableArray(np.int32), _GrowableArray(np.float32)
+        self.indices.extend(indices)
+        self.counts.extend(counts)
+        ends = np.cumsum(lengths)
+        self.slot_start.extend(ends - lengths)
+        self.slot_end.extend(ends)
+        for slot, (abbreviation_id, text) in enumerate(zip(live_ids, texts)):
+            self.slot_of[abbreviation_id] = slot
+            self.slot_text.append(text)
+        return [self.slot_of[abbreviation_id] for abbreviation_id in ids]
+
+    def merge_frequencies(self, document_frequency, n_documents):
+        """Document frequencies of all replicas' stores combined (for a shared IDF)"""
+        return self.document_frequency + np.asarray(document_frequency), self.n_documents + n_documents
+
+    def stats(self):
+        return {
+            'documents': self.n_documents,
+            'slots': len(self.slot_text),
+            'retired_slots': self.retired,
+            'features': self.n_features,
+            'nnz': self.indices.size,
+        }
+
+
+class HashingSimilarityIndex:
+    """Cosine similarity over hashed TF-IDF vectors for one catalog snapshot
+
+    Built from a HashingFeatureStore: the snapshot's rows are gathered from
+    the store's count buffers, weighted by the IDF at creation time,
+    L2-normalised and kept column-major, so a query only touches the columns
+    of its own terms. Later store updates never change an existing
+    snapshot's answers.
+    """
+
+    mode = 'hashing'
+
+    def __init__(self, store, slots):
+        slots = np.asarray(slots, dtype=np.int64)
+        with store.lock:
+            self.vectorizer = store.vectorizer
+            self.idf = smooth_idf(store.document_frequency, store.n_documents).astype(np.float32)
+            starts = store.slot_start.view()[slots]
+            lengths = store.slot_end.view()[slots] - starts
+            # Gather every row's nnz range at once (same trick as the text index postings)
+            positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(int(lengths.sum()))
+            indices = store.indices.array[positions]
+            weights = store.counts.array[positions] * self.idf[indices]
+
+        self.size = len(slots)
+        row_of_nnz = np.repeat(np.arange(self.size), lengths)
+        norms = np.sqrt(np.bincount(row_of_nnz, weights=weights * weights, minlength=self.size))
+        weights /= np.maximum(norms, 1e-12)[row_of_nnz]
+        indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        self.matrix = sparse.csr_matrix((weights, indices, indptr), shape=(self.size, len(self.idf))).tocsc()
+
+    def __len__(self):
+        return self.size
+
+    def scores(self, text):
+        """Cosine similarity of `text` to every catalog row"""
+        query = self.vectorizer.transform([text.lower()])
+        query.sum_duplicates()
+        weights = query.data * self.idf[query.indices]
+        norm = np.linalg.norm(weights)
+        if not norm:
+            return np.zeros(self.size, dtype=np.float32)
+        return np.asarray(self.matrix[:, query.indices] @ (weights / norm), dtype=np.float32).ravel()
+
+    def query_matrix(self, texts):
+        """L2-normalised hashed TF-IDF rows for a list of query texts"""
+        queries = self.vectorizer.transform([text.lower() for text in texts]).tocsr()
+        queries.sum_duplicates()
+        queries.data = queries.data * self.idf[queries.indices]
+        norms = np.sqrt(np.asarray(queries.multiply(queries).sum(axis=1)).ravel())
+        queries.data /= np.repeat(np.maximum(norms, 1e-12), np.diff(queries.indptr))
+        return queries
+
+    def nearest(self, text, k, threshold=None):
+        """(rows, scores) of the k items most similar to `text`, best first"""
+        scores = self.scores(text)
+        rows = top_k(scores, k, threshold=threshold)
+        return rows, scores[rows]
+
+    def nearest_batch(self, texts, k, threshold=None, block_size=None):
+        """Yields nearest(text, k, threshold) for every text, scoring blocks of queries with one sparse product"""
+        yield from sparse_batch_top_k(self.query_matrix(texts), self.matrix, k, threshold, block_size)
+
+    def nbytes(self):
+        return self.idf.nbytes + self.matrix.data.nbytes + self.matrix.indices.nbytes + self.matrix.indptr.nbytes
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'items': self.size,
+            'features': len(self.idf),
+            'nnz': int(self.matrix.nnz),
+            'bytes': self.nbytes(),
+        }
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import numpy as np
+
+from popularity import INTERACTION_WEIGHTS
+
+
+class InteractionLog:
+    """Fixed-capacity ring buffer of tracked (user, abbreviation, weight, timestamp) events
+
+    Memory is allocated once: 28 bytes per slot, i.e. ~28 MB for the default
+    capacity of one million interactions. Once full, the oldest events are
+    overwritten. `total` is a monotonically increasing sequence number so that
+    consumers can process only what was appended since their last pass.
+    """
+
+    def __init__(self, capacity=1_000_000):
+        self.capacity = capacity
+        self.user_ids = np.zeros(capacity, dtype=np.int64)
+        self.item_ids = np.zeros(capacity, dtype=np.int64)
+        self.weights = np.zeros(capacity, dtype=np.float32)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, user_id, abbreviation_id, interaction_type='view', timestamp=None):
+        """Append one event; returns False if the ids are not integers"""
+        try:
+            user_id, abbreviation_id = int(user_id), int(abbreviation_id)
+        except (TypeError, ValueError):
+            return False
+        with self.lock:
+            slot = self.total % self.capacity
+            self.user_ids[slot] = user_id
+            self.item_ids[slot] = abbreviation_id
+            self.weights[slot] = INTERACTION_WEIGHTS.get(interaction_type, 1.0)
+            self.timestamps[slot] = time.time() if timestamp is None else timestamp
+            self.total += 1
+        return True
+
+    def entries(self, since=0):
+        """Copy of the buffered events with sequence number >= `since`, in append order, plus those numbers"""
+        with self.lock:
+            start = max(self.total - len(self), since)
+            order = np.arange(start, self.total) % self.capacity
+            return {
+                'seq': np.arange(start, self.total, dtype=np.int64),
+                'user_ids': self.user_ids[order],
+                'item_ids': self.item_ids[order],
+                'weights': self.weights[order],
+                'timestamps': self.timestamps[order],
+            }
+
+    @property
+    def nbytes(self):
+        return int(self.user_ids.nbytes + self.item_ids.nbytes + self.weights.nbytes + self.timestamps.nbytes)
+
+
+def interaction_weights(user_data):
+    """Per-abbreviation interaction weights for a user as sent by the backend"""
+    weights = {}
+    for interaction in user_data.get('interactions', []) or []:
+        abbr_id = interaction.get('abbreviation_id')
+        if abbr_id is None:
+            continue
+        interaction_type = interaction.get('type') or interaction.get('interaction_type') or 'view'
+        weights[abbr_id] = weights.get(abbr_id, 0.0) + INTERACTION_WEIGHTS.get(interaction_type, 1.0)
+    for abbr_id in user_data.get('viewed_abbreviations', []) or []:
+        weights.setdefault(abbr_id, INTERACTION_WEIGHTS['view'])
+    for abbr_id in user_data.get('voted_abbreviations', []) or []:
+        weights[abbr_id] = max(weights.get(abbr_id, 0.0), INTERACTION_WEIGHTS['vote'])
+    return weights
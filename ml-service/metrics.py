@@ -0,0 +1,163 @@
+import bisect
+import math
+import threading
+import time
+
+# Request and stage latencies span sub-millisecond cache hits to multi-second backend fetches
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    if value is None:
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for key, value in sorted(values.items()):
+            yield self.name, format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination, observed in O(log buckets)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), then sum
+                series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, **labels):
+        """Context manager observing the wall time of its block"""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self.lock:
+            series = {key: list(values) for key, values in self.series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), values):
+                cumulative += count
+                yield (f"{self.name}_bucket", format_labels(self.labelnames, key, [('le', format_value(bound))]),
+                       cumulative)
+            yield f"{self.name}_sum", format_labels(self.labelnames, key), values[-1]
+            yield f"{self.name}_count", format_labels(self.labelnames, key), cumulative
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Collected:
+    """Metric whose samples are read from the service's own state when scraped
+
+    `collect()` returns {label values tuple: value}; nothing is recorded on
+    the request path.
+    """
+
+    def __init__(self, name, documentation, kind, collect, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.collect = collect
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        for key, value in sorted(self.collect().items(), key=lambda item: tuple(map(str, item[0]))):
+            yield self.name, format_labels(self.labelnames, key), value
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self, namespace='ml'):
+        self.namespace = namespace
+        self.metrics = []
+        self.errors = 0
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(f"{self.namespace}_{name}", documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(f"{self.namespace}_{name}", documentation, labelnames, buckets))
+
+    def collected(self, name, documentation, collect, kind='gauge', labelnames=()):
+        return self._add(Collected(f"{self.namespace}_{name}", documentation, kind, collect, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                # One broken collector must not take the whole scrape down
+                self.errors += 1
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {format_value(value)}" for name, labels, value in samples)
+        return '\n'.join(lines) + '\n'
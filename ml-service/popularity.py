@@ -0,0 +1,116 @@
+import threading
+import time
+
+import numpy as np
+
+# Decay windows: each counter decays exponentially with a time constant equal to the window length
+WINDOWS = (
+    ('1h', 3600.0),
+    ('24h', 86400.0),
+    ('7d', 604800.0),
+)
+
+# Relative weight of each interaction type when feeding the counters
+INTERACTION_WEIGHTS = {
+    'view': 1.0,
+    'click': 1.0,
+    'search': 0.5,
+    'comment': 2.0,
+    'share': 2.0,
+    'vote': 3.0,
+}
+
+# Default blend of per-hour rates used by the realtime trending mode
+TRENDING_WINDOW_WEIGHTS = {
+    '1h': 0.5,
+    '24h': 0.3,
+    '7d': 0.2,
+}
+
+
+class DecayedCounters:
+    """Exponentially decayed per-abbreviation interaction counters indexed by catalog row"""
+
+    # Rebase stored values once the growth factor of the shortest window reaches e^REBASE_EXPONENT
+    REBASE_EXPONENT = 50.0
+
+    def __init__(self, windows=WINDOWS, clock=time.time):
+        self.window_names = [name for name, _ in windows]
+        self.taus = np.array([seconds for _, seconds in windows], dtype=np.float64)
+        self.clock = clock
+        self.ids = np.empty(0, dtype=np.int64)
+        self.row_index = {}
+        # Forward-decayed values: value * exp((t - landmark) / tau), so updates touch a single cell
+        self.values = np.zeros((len(self.taus), 0), dtype=np.float64)
+        self.landmark = clock()
+        self.tracked = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def reindex(self, ids):
+        """Re-align counters to a new catalog order, carrying over counts for surviving ids"""
+        ids = np.asarray(ids, dtype=np.int64)
+        with self.lock:
+            if len(ids) == len(self.ids) and np.array_equal(ids, self.ids):
+                return
+            values = np.zeros((len(self.taus), len(ids)), dtype=np.float64)
+            old_rows = np.array([self.row_index.get(int(i), -1) for i in ids], dtype=np.int64)
+            kept = old_rows >= 0
+            if kept.any():
+                values[:, kept] = self.values[:, old_rows[kept]]
+            self.ids = ids
+            self.row_index = {int(abbr_id): row for row, abbr_id in enumerate(ids)}
+            self.values = values
+
+    def track(self, abbreviation_id, interaction_type='view', timestamp=None):
+        """Record one interaction; returns False if the abbreviation is not in the catalog"""
+        weight = INTERACTION_WEIGHTS.get(interaction_type, 1.0)
+        now = self.clock() if timestamp is None else float(timestamp)
+        with self.lock:
+            try:
+                row = self.row_index.get(int(abbreviation_id))
+            except (TypeError, ValueError):
+                row = None
+            if row is None:
+                self.dropped += 1
+                return False
+            if (now - self.landmark) / self.taus.min() > self.REBASE_EXPONENT:
+                self._rebase(now)
+            self.values[:, row] += weight * np.exp((now - self.landmark) / self.taus)
+            self.tracked += 1
+            return True
+
+    def _rebase(self, now):
+        """Fold the accumulated growth factor into the stored values and move the landmark"""
+        self.values *= np.exp(-(now - self.landmark) / self.taus)[:, None]
+        self.landmark = now
+
+    def snapshot(self, now=None):
+        """Decayed counts as a (windows x rows) array evaluated at `now`"""
+        now = self.clock() if now is None else now
+        with self.lock:
+            decay = np.exp(-(now - self.landmark) / self.taus)
+            return self.values * decay[:, None]
+
+    def scores(self, now=None, window=None, weights=None):
+        """Per-row trending score: a blend of per-hour rates, or a single window's decayed count"""
+        counts = self.snapshot(now)
+        if window is not None:
+            return counts[self.window_names.index(window)]
+        weights = weights or TRENDING_WINDOW_WEIGHTS
+        per_hour = counts / (self.taus[:, None] / 3600.0)
+        blend = np.array([weights.get(name, 0.0) for name in self.window_names], dtype=np.float64)
+        return blend @ per_hour
+
+    def stats(self):
+        """Counter bookkeeping for diagnostics"""
+        return {
+            'rows': len(self.ids),
+            'windows': self.window_names,
+            'tracked': self.tracked,
+            'dropped': self.dropped,
+            'memory_bytes': int(self.values.nbytes + self.ids.nbytes),
+        }
@@ -0,0 +1,181 @@
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+from ranking import top_k_rows
+
+
+def precompute_top_n(model, top_n=50, chunk_size=1024, seen=None, workers=None):
+    """Ranked item lists for every user of a trained factor model
+
+    Users are scored in chunks with one dense matrix product each, previously
+    seen items are masked out, and the top-N are selected with a row-wise partition.
+    Chunks run on a thread pool sized to the CPU count (NumPy releases the GIL
+    in BLAS and selection kernels). Returns (user_ids, item_ids, scores) where
+    rows are padded with -1 / -inf when fewer than N items are available.
+    """
+    n_users, n_items = len(model.user_ids), len(model.item_ids)
+    top_n = min(top_n, n_items)
+    item_dtype = np.int32 if n_items and model.item_ids.max() < 2 ** 31 else np.int64
+    items = np.full((n_users, top_n), -1, dtype=item_dtype)
+    scores = np.full((n_users, top_n), -np.inf, dtype=np.float32)
+    item_factors_t = np.ascontiguousarray(model.item_factors.T)
+
+    def run_chunk(start):
+        end = min(start + chunk_size, n_users)
+        chunk_scores = model.user_factors[start:end] @ item_factors_t
+        if seen is not None:
+            block = seen[start:end].tocoo()
+            chunk_scores[block.row, block.col] = -np.inf
+        top, top_scores = top_k_rows(chunk_scores, top_n)
+        items[start:end] = np.where(np.isfinite(top_scores), model.item_ids[top], -1)
+        scores[start:end] = top_scores
+
+    if n_users and top_n:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            list(pool.map(run_chunk, range(0, n_users, chunk_size)))
+    return model.user_ids.copy(), items, scores
+
+
+def seen_matrix(model, user_ids, item_ids):
+    """Sparse user x item mask (in model index space) of interactions to exclude"""
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    item_ids = np.asarray(item_ids, dtype=np.int64)
+    shape = (len(model.user_ids), len(model.item_ids))
+    if not len(user_ids) or not all(shape):
+        return sparse.csr_matrix(shape, dtype=np.int8)
+    rows = np.minimum(np.searchsorted(model.user_ids, user_ids), shape[0] - 1)
+    cols = np.minimum(np.searchsorted(model.item_ids, item_ids), shape[1] - 1)
+    known = (model.user_ids[rows] == user_ids) & (model.item_ids[cols] == item_ids)
+    return sparse.csr_matrix(
+        (np.ones(int(known.sum()), dtype=np.int8), (rows[known], cols[known])), shape=shape
+    )
+
+
+class PrecomputedStore:
+    """On-disk store of per-user top-N lists, memory-mapped for lookups
+
+    Each run is written to its own versioned directory (sorted user ids plus
+    fixed-width item and score matrices) and published by atomically replacing
+    the CURRENT pointer, so readers never observe a half-written run. Lookups
+    re-read the pointer at most every `check_interval` seconds and switch to
+    runs published by other processes (the CLI, other workers).
+    """
+
+    def __init__(self, directory, max_age=86400, keep_versions=2, check_interval=5.0):
+        self.directory = directory
+        self.max_age = max_age
+        self.keep_versions = keep_versions
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.user_ids = None
+        self.items = None
+        self.scores = None
+        self.meta = {}
+        self.version = None
+        self.checked_at = time.monotonic()
+        self._sequence = itertools.count()
+
+    def write(self, user_ids, items, scores, **meta):
+        """Persist a run and make it current"""
+        order = np.argsort(user_ids, kind='stable')
+        version = time.strftime('%Y%m%d%H%M%S') + f"-{os.getpid()}-{next(self._sequence):06d}"
+        path = os.path.join(self.directory, version)
+        # Written aside and renamed into place, so a version readers have mapped is never overwritten
+        tmp_path = f"{path}.tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        np.save(os.path.join(tmp_path, 'user_ids.npy'), np.asarray(user_ids)[order])
+        np.save(os.path.join(tmp_path, 'items.npy'), np.asarray(items)[order])
+        np.save(os.path.join(tmp_path, 'scores.npy'), np.asarray(scores)[order])
+        meta = dict(meta, generated_at=time.time(), users=int(len(user_ids)), top_n=int(np.shape(items)[1]))
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+
+        pointer = os.path.join(self.directory, 'CURRENT')
+        with open(f"{pointer}.tmp", 'w') as f:
+            f.write(version)
+        os.replace(f"{pointer}.tmp", pointer)
+        self._cleanup(keep=version)
+        self.load()
+        return meta
+
+    def _cleanup(self, keep):
+        versions = sorted(
+            name for name in os.listdir(self.directory)
+            if os.path.isdir(os.path.join(self.directory, name)) and not name.endswith('.tmp')
+        )
+        for name in versions[:-self.keep_versions]:
+            if name != keep:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def load(self):
+        """Memory-map the current run; returns False if none has been written"""
+        pointer = os.path.join(self.directory, 'CURRENT')
+        if not os.path.exists(pointer):
+            return False
+        with open(pointer) as f:
+            version = f.read().strip()
+        path = os.path.join(self.directory, version)
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        user_ids = np.load(os.path.join(path, 'user_ids.npy'), mmap_mode='r')
+        items = np.load(os.path.join(path, 'items.npy'), mmap_mode='r')
+        scores = np.load(os.path.join(path, 'scores.npy'), mmap_mode='r')
+        with self.lock:
+            self.user_ids, self.items, self.scores, self.meta = user_ids, items, scores, meta
+            self.version = version
+        return True
+
+    def refresh(self):
+        """Reload if another process published a different run since the last check (throttled)"""
+        now = time.monotonic()
+        if now - self.checked_at < self.check_interval:
+            return False
+        self.checked_at = now
+        try:
+            with open(os.path.join(self.directory, 'CURRENT')) as f:
+                version = f.read().strip()
+            return version != self.version and self.load()
+        except (OSError, ValueError):
+            # Missing pointer or a run removed mid-read; keep serving what is loaded
+            return False
+
+    @property
+    def age(self):
+        generated_at = self.meta.get('generated_at')
+        return None if generated_at is None else time.time() - generated_at
+
+    def is_fresh(self):
+        age = self.age
+        return age is not None and age <= self.max_age
+
+    def lookup(self, user_id):
+        """(item_ids, scores) for a user from a fresh run, or None"""
+        self.refresh()
+        with self.lock:
+            user_ids, items, scores = self.user_ids, self.items, self.scores
+        if user_ids is None or not len(user_ids) or not self.is_fresh():
+            return None
+        row = int(np.searchsorted(user_ids, user_id))
+        if row >= len(user_ids) or user_ids[row] != user_id:
+            return None
+        valid = items[row] >= 0
+        return np.asarray(items[row][valid]), np.asarray(scores[row][valid])
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'users': self.meta.get('users', 0),
+            'top_n': self.meta.get('top_n'),
+            'generated_at': self.meta.get('generated_at'),
+            'age_seconds': None if self.age is None else round(self.age, 1),
+            'fresh': self.is_fresh(),
+        }
@@ -0,0 +1,260 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+PROFILE_MODES = ('sample', 'cprofile')
+MAX_SECONDS = 600
+MAX_REQUESTS = 100_000
+# Shorter sampling intervals would keep the sampler thread spinning against the requests it profiles
+MIN_INTERVAL = 0.001
+
+
+def frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame):
+    """Root-first, ';'-joined stack of a frame, as flamegraph tools expect"""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class ProfilingSession:
+    """One capture: a sampled CPU profile or per-request cProfile, plus optional allocation statistics
+
+    'sample' mode wakes every `interval` seconds and records the stack of each
+    thread currently handling a request (or every thread with `all_threads`),
+    written as collapsed stacks for flamegraph.pl / speedscope. 'cprofile'
+    mode runs a deterministic profiler around each request and writes the
+    merged pstats dump. The capture ends after `seconds` or after `requests`
+    requests have finished, whichever comes first.
+    """
+
+    def __init__(self, directory, mode='sample', seconds=None, requests=None, allocations=False,
+                 interval=0.005, all_threads=False):
+        self.directory = directory
+        self.mode = mode
+        self.seconds = seconds
+        self.requests = requests
+        self.allocations = allocations
+        self.interval = interval
+        self.all_threads = all_threads
+        self.name = time.strftime('profile-%Y%m%d-%H%M%S')
+        self.started_at = None
+        self.finished_at = None
+        self.completed_requests = 0
+        self.samples = Counter()
+        self.profiles = []
+        self.request_threads = set()
+        self.files = []
+        self.error = None
+        self.lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._finished = threading.Event()
+        self._thread = None
+        self._tracing = False
+
+    @property
+    def running(self):
+        return self.started_at is not None and not self._finished.is_set()
+
+    def start(self):
+        self.started_at = time.time()
+        if self.allocations and not tracemalloc.is_tracing():
+            # Left alone if something else (e.g. PYTHONTRACEMALLOC) is already tracing
+            tracemalloc.start()
+            self._tracing = True
+        if self.mode == 'sample' or self.seconds:
+            self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        # Samples (in sample mode) until stopped or out of time, then writes the results
+        ends_at = time.monotonic() + self.seconds if self.seconds else None
+        own = threading.get_ident()
+        while not self._stopped.is_set():
+            if ends_at is not None and time.monotonic() >= ends_at:
+                break
+            if self.mode == 'sample':
+                frames = sys._current_frames()
+                with self.lock:
+                    threads = set(frames) if self.all_threads else set(self.request_threads)
+                for ident in threads:
+                    frame = frames.get(ident)
+                    if frame is not None and ident != own:
+                        self.samples[collapse(frame)] += 1
+            self._stopped.wait(self.interval if self.mode == 'sample' else 0.05)
+        self._write()
+
+    def request_started(self):
+        """Called on the request's thread; returns the token request_finished needs"""
+        ident = threading.get_ident()
+        with self.lock:
+            self.request_threads.add(ident)
+        if self.mode != 'cprofile':
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler already owns this interpreter (Python 3.12+ allows only one)
+            return None
+        return profile
+
+    def request_finished(self, profile):
+        if profile is not None:
+            profile.disable()
+        with self.lock:
+            self.request_threads.discard(threading.get_ident())
+            if profile is not None:
+                self.profiles.append(profile)
+            self.completed_requests += 1
+            done = self.requests is not None and self.completed_requests >= self.requests
+        if done:
+            self.stop()
+
+    def stop(self):
+        """End the capture now and write its files (idempotent)"""
+        self._stopped.set()
+        if self._thread is not None:
+            if self._thread is not threading.current_thread():
+                self._thread.join()
+        else:
+            self._write()
+
+    def _write(self):
+        with self.lock:
+            if self._finished.is_set():
+                return
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                base = os.path.join(self.directory, self.name)
+                if self.samples:
+                    with open(f"{base}.collapsed", 'w') as f:
+                        for stack, count in self.samples.most_common():
+                            f.write(f"{stack} {count}\n")
+                    self.files.append(f"{base}.collapsed")
+                if self.profiles:
+                    stats = pstats.Stats(self.profiles[0])
+                    for profile in self.profiles[1:]:
+                        stats.add(profile)
+                    stats.dump_stats(f"{base}.pstats")
+                    self.files.append(f"{base}.pstats")
+                if self.allocations and tracemalloc.is_tracing():
+                    self._write_allocations(f"{base}.allocations.txt")
+                    self.files.append(f"{base}.allocations.txt")
+            except OSError as e:
+                self.error = str(e)
+            finally:
+                if self._tracing:
+                    tracemalloc.stop()
+                self.finished_at = time.time()
+                self._finished.set()
+
+    def _write_allocations(self, path, limit=50):
+        current, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        )).statistics('lineno')
+        with open(path, 'w') as f:
+            f.write(f"# traced current={current} peak={peak} bytes; top {limit} allocation sites by size\n")
+            for stat in statistics[:limit]:
+                frame = stat.traceback[0]
+                f.write(f"{stat.size}\t{stat.count}\t{frame.filename}:{frame.lineno}\n")
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    def status(self):
+        return {
+            'name': self.name,
+            'mode': self.mode,
+            'running': self.running,
+            'seconds': self.seconds,
+            'requests': self.requests,
+            'allocations': self.allocations,
+            'completed_requests': self.completed_requests,
+            'samples': sum(self.samples.values()),
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'files': list(self.files),
+            'error': self.error,
+        }
+
+
+class Profiler:
+    """On-demand profiling for the service: at most one capture at a time, off (and free) by default
+
+    Request hooks only look at `session`, which is None unless a capture is
+    running, so nothing is measured or recorded while profiling is off.
+    """
+
+    def __init__(self, directory, token=None):
+        self.directory = directory
+        self.token = token
+        self.session = None
+        self.last = None
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.token)
+
+    def start(self, mode='sample', seconds=None, requests=None, allocations=False, interval=0.005,
+              all_threads=False):
+        """Start a capture; returns the session, or None if one is already running"""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"mode must be one of {', '.join(PROFILE_MODES)}")
+        if seconds is None and requests is None:
+            raise ValueError("seconds or requests is required")
+        if seconds is not None and not 0 < seconds <= MAX_SECONDS:
+            raise ValueError(f"seconds must be between 0 and {MAX_SECONDS}")
+        if requests is not None and not 0 < requests <= MAX_REQUESTS:
+            raise ValueError(f"requests must be between 1 and {MAX_REQUESTS}")
+        if not interval >= MIN_INTERVAL:
+            raise ValueError(f"interval must be at least {MIN_INTERVAL} seconds")
+        with self.lock:
+            if self.session is not None and self.session.running:
+                return None
+            session = ProfilingSession(
+                self.directory, mode, seconds, requests, allocations, interval, all_threads
+            )
+            session.start()
+            self.session = self.last = session
+        return session
+
+    def stop(self):
+        session = self.session
+        if session is None:
+            return None
+        session.stop()
+        return session
+
+    def request_started(self):
+        session = self.session
+        if session is None:
+            return None
+        if not session.running:
+            self.session = None
+            return None
+        return session, session.request_started()
+
+    def request_finished(self, token):
+        session, profile = token
+        session.request_finished(profile)
+
+    def status(self):
+        return {
+            'enabled': self.enabled,
+            'running': self.session is not None and self.session.running,
+            'session': self.last.status() if self.last is not None else None,
+        }
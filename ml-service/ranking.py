@@ -0,0 +1,71 @@
+import numpy as np
+
+_EMPTY = np.empty(0, dtype=np.int64)
+# Batch queries are scored in blocks of at most this many (query x item) scores
+BATCH_BLOCK_ELEMENTS = 8 * 1024 * 1024
+
+
+def top_k(scores, k, mask=None, threshold=None):
+    """Indices of the k highest scores, best first, in O(n + k log k)
+
+    `mask` marks eligible positions (exclusions are False) and `threshold`
+    keeps only scores strictly above it; NaN and -inf are never selected.
+    Ties are broken by position, matching a stable descending sort.
+    """
+    scores = np.asarray(scores)
+    eligible = np.isfinite(scores)
+    if mask is not None:
+        eligible &= np.asarray(mask, dtype=bool)
+    if threshold is not None:
+        eligible &= scores > threshold
+    candidates = np.flatnonzero(eligible)
+    if k <= 0 or not len(candidates):
+        return _EMPTY
+    candidate_scores = scores[candidates]
+
+    if k < len(candidates):
+        # Partition around the k-th largest value, then keep ties in positional order
+        kth = np.partition(candidate_scores, len(candidates) - k)[len(candidates) - k]
+        above = candidate_scores > kth
+        ties = np.flatnonzero(candidate_scores == kth)[:k - int(above.sum())]
+        keep = np.sort(np.concatenate((np.flatnonzero(above), ties)))
+        candidates, candidate_scores = candidates[keep], candidate_scores[keep]
+
+    return candidates[np.argsort(-candidate_scores, kind='stable')]
+
+
+def top_k_rows(scores, k):
+    """Row-wise top-k of a 2-D score matrix: (indices, values), best first; -inf pads short rows"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64), np.empty((scores.shape[0], 0), dtype=scores.dtype)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-values, axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def top_k_sparse_rows(matrix, k, threshold=None):
+    """Per-row top-k of a sparse score matrix: yields (column indices, values), best first
+
+    Only stored entries are candidates; ties are broken by column like top_k.
+    """
+    matrix = matrix.tocsr()
+    matrix.sort_indices()
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        columns, values = matrix.indices[start:end], matrix.data[start:end]
+        best = top_k(values, k, threshold=threshold)
+        yield columns[best].astype(np.int64), values[best]
+
+
+def sparse_batch_top_k(queries, items, k, threshold=None, block_size=None):
+    """Per-query (item rows, scores) of sparse query x feature rows against sparse item x feature rows
+
+    Query blocks are scored against all items with one sparse matrix product
+    each, sized so a block holds at most BATCH_BLOCK_ELEMENTS scores.
+    """
+    items_t = items.T.tocsr()
+    block_size = block_size or max(1, BATCH_BLOCK_ELEMENTS // max(items.shape[0], 1))
+    for start in range(0, queries.shape[0], block_size):
+        yield from top_k_sparse_rows(queries[start:start + block_size] @ items_t, k, threshold)
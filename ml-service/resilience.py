@@ -0,0 +1,236 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} circuit is open, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    """Raised when a concurrency limiter sheds a call; `status` is the HTTP status to answer with"""
+
+    def __init__(self, name, status, retry_after):
+        reason = 'queue is full' if status == 429 else 'timed out waiting for a slot'
+        super().__init__(f"{name} {reason}")
+        self.name = name
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker around calls to one dependency
+
+    Outcomes of the last `window` calls are kept; once at least `min_calls`
+    of them are recorded and the failure rate reaches `failure_rate`, the
+    circuit opens and calls fail fast with CircuitOpenError. After
+    `reset_timeout` seconds it turns half-open and lets `half_open_calls`
+    probes through: one failure re-opens it, that many successes close it
+    with a fresh window.
+    """
+
+    def __init__(self, name, failure_rate=0.5, window=20, min_calls=5, reset_timeout=30.0,
+                 half_open_calls=1, clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self.outcomes = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = None
+        self.probes = 0
+        self.probe_successes = 0
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go ahead now; a half-open circuit admits only its probes"""
+        with self.lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self.probes = 0
+                self.probe_successes = 0
+            if self.state == HALF_OPEN:
+                if self.probes >= self.half_open_calls:
+                    self.rejected += 1
+                    return False
+                self.probes += 1
+            self.calls += 1
+            return True
+
+    def retry_after(self):
+        """Seconds until an open circuit lets a probe through (0 when calls are allowed)"""
+        with self.lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self.clock() - self.opened_at))
+
+    def record_success(self):
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.probe_successes += 1
+                if self.probe_successes >= self.half_open_calls:
+                    self.state = CLOSED
+                    self.outcomes.clear()
+                return
+            self.outcomes.append(False)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self.outcomes.append(True)
+            if (self.state == CLOSED and len(self.outcomes) >= self.min_calls
+                    and sum(self.outcomes) >= self.failure_rate * len(self.outcomes)):
+                self._open()
+
+    def cancel(self):
+        """Forget an allowed call whose outcome says nothing about the dependency (e.g. the caller gave up)"""
+        with self.lock:
+            if self.state == HALF_OPEN and self.probes > self.probe_successes:
+                self.probes -= 1
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.opened += 1
+
+    def call(self, target, *args, is_failure=None, ignore=(), **kwargs):
+        """Call `target` through the breaker; exceptions (and results `is_failure` flags) count as failures
+
+        Exceptions of the `ignore` types are re-raised without being counted.
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+        try:
+            result = target(*args, **kwargs)
+        except ignore:
+            self.cancel()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        if is_failure is not None and is_failure(result):
+            self.record_failure()
+        else:
+            self.record_success()
+        return result
+
+    def stats(self):
+        with self.lock:
+            outcomes = list(self.outcomes)
+            return {
+                'state': self.state,
+                'failure_rate': round(sum(outcomes) / len(outcomes), 3) if outcomes else 0.0,
+                'calls': self.calls,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'opened': self.opened,
+            }
+
+
+class ConcurrencyLimiter:
+    """Bounded concurrency with a bounded, priority-ordered wait queue
+
+    At most `max_concurrent` calls hold a slot; up to `max_queue` more wait
+    for one, lowest `priority` first and in arrival order within a priority.
+    A call that finds the queue full is shed at once (429), one that waits
+    longer than its timeout gives up (503). Both carry a Retry-After
+    estimate from the recent mean time a slot is held.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue=0, queue_timeout=1.0, clock=time.monotonic):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.clock = clock
+        self.active = 0
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = {429: 0, 503: 0}
+        self.mean_hold = 0.0
+        self.condition = threading.Condition()
+
+    def retry_after(self):
+        """Seconds until a slot is likely free for a newcomer, at least 1"""
+        backlog = (len(self.waiting) + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(backlog * self.mean_hold))
+
+    def acquire(self, priority=0, timeout=None):
+        """Take a slot, waiting at most `timeout` (default queue_timeout) seconds; returns the acquire time"""
+        timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        with self.condition:
+            if self.active < self.max_concurrent and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return self.clock()
+            if len(self.waiting) >= self.max_queue:
+                self.rejected[429] += 1
+                raise Overloaded(self.name, 429, self.retry_after())
+
+            entry = (priority, next(self.sequence))
+            heapq.heappush(self.waiting, entry)
+            self.queued += 1
+            expires_at = self.clock() + timeout
+            while not (self.active < self.max_concurrent and self.waiting[0] == entry):
+                remaining = expires_at - self.clock()
+                if remaining <= 0:
+                    self.waiting.remove(entry)
+                    heapq.heapify(self.waiting)
+                    # The head may have changed; let the next waiter re-check
+                    self.condition.notify_all()
+                    self.rejected[503] += 1
+                    raise Overloaded(self.name, 503, self.retry_after())
+                self.condition.wait(remaining)
+            heapq.heappop(self.waiting)
+            self.active += 1
+            self.admitted += 1
+            self.condition.notify_all()
+            return self.clock()
+
+    def release(self, acquired_at=None):
+        with self.condition:
+            self.active -= 1
+            if acquired_at is not None:
+                # Exponentially weighted mean of slot hold times, for Retry-After
+                self.mean_hold += 0.1 * ((self.clock() - acquired_at) - self.mean_hold)
+            self.condition.notify_all()
+
+    def stats(self):
+        with self.condition:
+            return {
+                'active': self.active,
+                'queue_depth': len(self.waiting),
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rejected_queue_full': self.rejected[429],
+                'rejected_timeout': self.rejected[503],
+                'mean_hold_seconds': round(self.mean_hold, 4),
+            }
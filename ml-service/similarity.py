@@ -0,0 +1,334 @@
+import hashlib
+import os
+import pickle
+import shutil
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from ann import IVFIndex
+from feature_hashing import HashingFeatureStore, HashingSimilarityIndex
+from ranking import BATCH_BLOCK_ELEMENTS, sparse_batch_top_k, top_k, top_k_rows
+
+SIMILARITY_MODES = ('tfidf', 'lsa', 'hashing')
+TFIDF_MAX_FEATURES = 1000
+LSA_MAX_FEATURES = 50000
+LSA_DIMENSIONS = 128
+# float16 vectors are scored in blocks upcast to float32 (NumPy has no half-precision BLAS)
+HALF_BLOCK_ROWS = 16384
+# Catalogs with at least this many items answer LSA nearest-neighbour queries through an IVF index
+ANN_MIN_ITEMS = 50000
+ANN_PROBES = 32
+
+
+def build_vectorizer(max_features):
+    return TfidfVectorizer(stop_words='english', ngram_range=(1, 2), max_features=max_features)
+
+
+class SparseSimilarityIndex:
+    """Bigram TF-IDF item matrix fitted once per catalog snapshot
+
+    Queries are transformed with the snapshot's vectorizer instead of refitting
+    it on every request; rows are L2-normalised, so a sparse product is the cosine.
+    """
+
+    mode = 'tfidf'
+
+    def __init__(self, texts, max_features=TFIDF_MAX_FEATURES):
+        self.size = len(texts)
+        self.vectorizer = build_vectorizer(max_features)
+        try:
+            self.matrix = self.vectorizer.fit_transform(texts).tocsr()
+        except ValueError:
+            # Empty vocabulary (e.g. only stop words): nothing can be similar
+            self.matrix = None
+
+    @classmethod
+    def from_matrix(cls, vectorizer, matrix, size):
+        """Index over an already fitted vectorizer and item matrix (e.g. memory-mapped from a snapshot)"""
+        index = cls.__new__(cls)
+        index.size = size
+        index.vectorizer = vectorizer
+        index.matrix = matrix
+        return index
+
+    def __len__(self):
+        return self.size
+
+    def scores(self, text):
+        """Cosine similarity of `text` to every item, as a float array aligned with the catalog rows"""
+        if self.matrix is None:
+            return np.zeros(self.size, dtype=np.float32)
+        query = self.vectorizer.transform([text.lower()])
+        return np.asarray((self.matrix @ query.T).todense(), dtype=np.float32).ravel()
+
+    def nearest(self, text, k, threshold=None):
+        """(rows, scores) of the k items most similar to `text`, best first"""
+        scores = self.scores(text)
+        rows = top_k(scores, k, threshold=threshold)
+        return rows, scores[rows]
+
+    def nearest_batch(self, texts, k, threshold=None, block_size=None):
+        """Yields nearest(text, k, threshold) for every text, scoring blocks of queries with one sparse product"""
+        if self.matrix is None:
+            for _ in texts:
+                yield top_k(np.zeros(0), k), np.zeros(0, dtype=np.float32)
+            return
+        queries = self.vectorizer.transform([text.lower() for text in texts])
+        yield from sparse_batch_top_k(queries, self.matrix, k, threshold, block_size)
+
+    def nbytes(self):
+        if self.matrix is None:
+            return 0
+        return self.matrix.data.nbytes + self.matrix.indices.nbytes + self.matrix.indptr.nbytes
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'items': self.size,
+            'features': 0 if self.matrix is None else self.matrix.shape[1],
+            'nnz': 0 if self.matrix is None else int(self.matrix.nnz),
+            'bytes': self.nbytes(),
+        }
+
+
+class LsaSimilarityIndex:
+    """Dense latent semantic vectors: TruncatedSVD of the catalog TF-IDF matrix
+
+    Item vectors are L2-normalised and stored row-major in one contiguous
+    float32 (or float16) array, so scoring a query is a single matrix-vector
+    product. A query is projected by its TF-IDF weights on the SVD components.
+    Vocabularies no larger than the requested dimensions keep the exact
+    TF-IDF vectors (identity components) instead of fitting an SVD.
+    Large catalogs can add an IVF index (`build_ann`) so nearest-neighbour
+    queries scan only a few clusters instead of every vector.
+    """
+
+    mode = 'lsa'
+
+    def __init__(self, texts, dimensions=LSA_DIMENSIONS, dtype=np.float32,
+                 max_features=LSA_MAX_FEATURES, random_state=0):
+        self.size = len(texts)
+        self.dtype = np.dtype(dtype)
+        self.ann = None
+        self.vectorizer = build_vectorizer(max_features)
+        try:
+            tfidf = self.vectorizer.fit_transform(texts).tocsr()
+        except ValueError:
+            self.components = np.zeros((0, 0), dtype=np.float32)
+            self.vectors = np.zeros((self.size, 0), dtype=self.dtype)
+            self.explained_variance = 0.0
+            return
+
+        if tfidf.shape[1] <= dimensions:
+            self.components = np.eye(tfidf.shape[1], dtype=np.float32)
+            vectors = tfidf.toarray()
+            self.explained_variance = 1.0
+        else:
+            svd = TruncatedSVD(n_components=dimensions, algorithm='randomized', random_state=random_state)
+            vectors = svd.fit_transform(tfidf)
+            self.components = np.ascontiguousarray(svd.components_, dtype=np.float32)
+            self.explained_variance = float(svd.explained_variance_ratio_.sum())
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        self.vectors = np.ascontiguousarray(vectors, dtype=self.dtype)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def dimensions(self):
+        return self.vectors.shape[1]
+
+    def embed(self, text):
+        """L2-normalised float32 vector of a query text (zeros if it shares no vocabulary)"""
+        if not self.dimensions:
+            return np.zeros(0, dtype=np.float32)
+        query = self.vectorizer.transform([text.lower()])
+        vector = self.components[:, query.indices] @ query.data.astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def __getstate__(self):
+        # The IVF lists are persisted separately (ann.npz) and re-attached on load
+        return dict(self.__dict__, ann=None)
+
+    def build_ann(self, probes=ANN_PROBES, n_lists=None):
+        self.ann = IVFIndex(n_lists=n_lists, probes=probes).fit(self.vectors)
+        return self.ann
+
+    def scores(self, text):
+        """Cosine similarity of `text` to every item, as a float32 array aligned with the catalog rows"""
+        return self.vector_scores(self.embed(text))
+
+    def nearest(self, text, k, threshold=None):
+        """(rows, scores) of the k items most similar to `text`, best first (approximate with an IVF index)"""
+        vector = self.embed(text)
+        if self.ann is not None:
+            return self.ann.search(vector, k, threshold=threshold)
+        scores = self.vector_scores(vector)
+        rows = top_k(scores, k, threshold=threshold)
+        return rows, scores[rows]
+
+    def nearest_batch(self, texts, k, threshold=None, block_size=None):
+        """Yields nearest(text, k, threshold) for every text, scoring blocks of queries with one matrix product"""
+        if not self.dimensions:
+            for text in texts:
+                yield self.nearest(text, k, threshold)
+            return
+        queries = self.vectorizer.transform([text.lower() for text in texts])
+        embedded = np.asarray(queries @ self.components.T, dtype=np.float32)
+        norms = np.linalg.norm(embedded, axis=1, keepdims=True)
+        np.divide(embedded, norms, out=embedded, where=norms > 0)
+        if self.ann is not None:
+            yield from self.ann.search_batch(embedded, k, threshold=threshold)
+            return
+
+        items_t = self.vectors.T.astype(np.float32, copy=False)
+        block_size = block_size or max(1, BATCH_BLOCK_ELEMENTS // max(self.size, 1))
+        for start in range(0, len(embedded), block_size):
+            scores = embedded[start:start + block_size] @ items_t
+            rows, values = top_k_rows(scores, k)
+            for query_rows, query_scores in zip(rows, values):
+                keep = np.isfinite(query_scores)
+                if threshold is not None:
+                    keep &= query_scores > threshold
+                yield query_rows[keep], query_scores[keep]
+
+    def vector_scores(self, vector):
+        if not vector.any():
+            return np.zeros(self.size, dtype=np.float32)
+        if self.dtype == np.float32:
+            return self.vectors @ vector
+        scores = np.empty(self.size, dtype=np.float32)
+        for start in range(0, self.size, HALF_BLOCK_ROWS):
+            block = self.vectors[start:start + HALF_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ vector
+        return scores
+
+    def nbytes(self):
+        return self.vectors.nbytes + self.components.nbytes + (self.ann.nbytes() if self.ann is not None else 0)
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'items': self.size,
+            'dimensions': self.dimensions,
+            'dtype': self.dtype.name,
+            'explained_variance': round(self.explained_variance, 4),
+            'bytes': self.nbytes(),
+            'ann': self.ann.stats() if self.ann is not None else None,
+        }
+
+
+class SimilarityIndexStore:
+    """Fitted similarity indexes persisted under the artifacts directory
+
+    Indexes are keyed by a fingerprint of the catalog texts and the index
+    settings, so a restarted worker whose catalog has not changed loads the
+    previous fit instead of repeating it. Each key is written to its own
+    directory (pickled index plus `ann.npz` IVF lists) and renamed into place
+    once complete. Persistence is best effort: unreadable or unwritable
+    entries are counted in `errors` and the index is simply (re)built.
+    """
+
+    def __init__(self, directory, keep_versions=2):
+        self.directory = directory
+        self.keep_versions = keep_versions
+        self.loads = 0
+        self.saves = 0
+        self.errors = 0
+
+    def key(self, texts, mode, **options):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr(sorted(options.items())).encode())
+        for text in texts:
+            digest.update(text.encode())
+            digest.update(b'\x1e')
+        return f"{mode}-{digest.hexdigest()}"
+
+    def load(self, key):
+        path = os.path.join(self.directory, key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            with open(os.path.join(path, 'index.pkl'), 'rb') as f:
+                index = pickle.load(f)
+            ann_path = os.path.join(path, 'ann.npz')
+            if os.path.exists(ann_path):
+                index.ann = IVFIndex.load(ann_path, index.vectors)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            self.errors += 1
+            return None
+        self.loads += 1
+        return index
+
+    def save(self, key, index):
+        path = os.path.join(self.directory, key)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        try:
+            os.makedirs(tmp_path, exist_ok=True)
+            with open(os.path.join(tmp_path, 'index.pkl'), 'wb') as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            if getattr(index, 'ann', None) is not None:
+                index.ann.save(os.path.join(tmp_path, 'ann.npz'))
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp_path, path)
+        except OSError:
+            self.errors += 1
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return False
+        self.saves += 1
+        self._cleanup(keep=key)
+        return True
+
+    def _cleanup(self, keep):
+        entries = [
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if '.tmp-' not in name and os.path.isdir(os.path.join(self.directory, name))
+        ]
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:-self.keep_versions]:
+            if os.path.basename(path) != keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self):
+        return {'loads': self.loads, 'saves': self.saves, 'errors': self.errors}
+
+
+def build_similarity_index(texts, mode='tfidf', dimensions=LSA_DIMENSIONS, dtype=np.float32,
+                           ann_min_items=ANN_MIN_ITEMS, ann_probes=ANN_PROBES, store=None,
+                           ids=None, hashing_store=None):
+    """Similarity index for one snapshot's texts in the configured mode, loaded from `store` when saved there
+
+    The hashing mode is not persisted: it syncs the snapshot's (ids, texts) into
+    `hashing_store`, which only vectorizes rows that are new or changed.
+    """
+    if mode not in SIMILARITY_MODES:
+        raise ValueError(f"Unknown similarity mode '{mode}', expected one of {SIMILARITY_MODES}")
+    if mode == 'hashing':
+        hashing_store = hashing_store if hashing_store is not None else HashingFeatureStore()
+        slots = hashing_store.sync(range(len(texts)) if ids is None else ids, texts)
+        return HashingSimilarityIndex(hashing_store, slots)
+    key = None
+    if store is not None:
+        options = {'dimensions': dimensions, 'dtype': np.dtype(dtype).name} if mode == 'lsa' else {}
+        if mode == 'lsa' and ann_min_items is not None and len(texts) >= ann_min_items:
+            options['ann_probes'] = ann_probes
+        key = store.key(texts, mode, **options)
+        index = store.load(key)
+        if index is not None:
+            return index
+
+    if mode == 'lsa':
+        index = LsaSimilarityIndex(texts, dimensions=dimensions, dtype=dtype)
+        if ann_min_items is not None and len(texts) >= ann_min_items:
+            index.build_ann(probes=ann_probes)
+    else:
+        index = SparseSimilarityIndex(texts)
+
+    if store is not None:
+        store.save(key, index)
+    return index
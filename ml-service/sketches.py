@@ -0,0 +1,273 @@
+import base64
+import hashlib
+import io
+import math
+import threading
+
+import numpy as np
+
+# Mersenne prime used by the pairwise-independent Count-Min row hashes
+_PRIME = (1 << 61) - 1
+_MASK64 = (1 << 64) - 1
+
+
+def stable_hash64(value):
+    """64-bit hash that is identical across processes and replicas (unlike hash())"""
+    digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class CountMinSketch:
+    """Count-Min sketch: overestimates frequencies by at most epsilon * N with probability 1 - delta"""
+
+    def __init__(self, epsilon=0.001, delta=0.01, seed=42):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.seed = seed
+        self.width = int(math.ceil(math.e / epsilon))
+        self.depth = int(math.ceil(math.log(1.0 / delta)))
+        rng = np.random.default_rng(seed)
+        self.hash_a = [int(a) for a in rng.integers(1, _PRIME, size=self.depth, dtype=np.int64)]
+        self.hash_b = [int(b) for b in rng.integers(0, _PRIME, size=self.depth, dtype=np.int64)]
+        self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+        self.total = 0
+
+    def _columns(self, key):
+        x = stable_hash64(key) % _PRIME
+        return [((a * x + b) % _PRIME) % self.width for a, b in zip(self.hash_a, self.hash_b)]
+
+    def add(self, key, count=1):
+        """Increment the count for `key`; returns the updated estimate"""
+        columns = self._columns(key)
+        rows = np.arange(self.depth)
+        self.table[rows, columns] += count
+        self.total += count
+        return int(self.table[rows, columns].min())
+
+    def estimate(self, key):
+        """Estimated count for `key` (never an underestimate)"""
+        return int(self.table[np.arange(self.depth), self._columns(key)].min())
+
+    def is_compatible(self, other):
+        return (self.width, self.depth, self.seed) == (other.width, other.depth, other.seed)
+
+    def merge(self, other):
+        """Add another sketch built with the same parameters into this one"""
+        if not self.is_compatible(other):
+            raise ValueError("Cannot merge Count-Min sketches with different parameters")
+        self.table += other.table
+        self.total += other.total
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with relative standard error of about 1.04 / sqrt(2^precision)"""
+
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 18:
+            raise ValueError("HyperLogLog precision must be between 4 and 18")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+        self._cached_estimate = 0
+
+    @staticmethod
+    def precision_for_error(error_rate):
+        """Smallest precision whose standard error does not exceed `error_rate`"""
+        return min(18, max(4, int(math.ceil(math.log2((1.04 / error_rate) ** 2)))))
+
+    def add(self, value):
+        """Add a value; returns True if a register changed"""
+        h = stable_hash64(value)
+        index = h >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        rank = remaining_bits - (h & ((1 << remaining_bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            self._cached_estimate = None
+            return True
+        return False
+
+    def count(self):
+        """Estimated number of distinct values added"""
+        if self._cached_estimate is None:
+            self._cached_estimate = self._estimate()
+        return self._cached_estimate
+
+    def _estimate(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        raw = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int32)).sum()
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            raw = m * math.log(m / zeros)
+        return int(round(raw))
+
+    def merge(self, other):
+        """Union with another HyperLogLog of the same precision"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        self._cached_estimate = None
+
+    @classmethod
+    def from_registers(cls, registers):
+        hll = cls(int(math.log2(len(registers))))
+        hll.registers[:] = registers
+        hll._cached_estimate = None
+        return hll
+
+
+class InteractionAnalytics:
+    """Fixed-memory streaming analytics over tracked interactions
+
+    Interaction frequency per abbreviation is kept in a Count-Min sketch, distinct
+    users globally, per abbreviation and per category in HyperLogLogs. Memory is
+    bounded by the sketch sizes plus `max_keys` keyed HyperLogLogs per dimension.
+    Snapshots from several replicas can be merged.
+    """
+
+    def __init__(self, epsilon=0.001, delta=0.01, user_error=0.01, key_error=0.065,
+                 max_keys=20000, heavy_hitter_capacity=100, seed=42):
+        self.frequency = CountMinSketch(epsilon, delta, seed)
+        self.users = HyperLogLog(HyperLogLog.precision_for_error(user_error))
+        self.key_precision = HyperLogLog.precision_for_error(key_error)
+        self.max_keys = max_keys
+        self.abbreviation_users = {}
+        self.category_users = {}
+        self.untracked_keys = 0
+        self.heavy_hitter_capacity = heavy_hitter_capacity
+        self.heavy_hitters_candidates = {}
+        self.lock = threading.Lock()
+
+    def _keyed_hll(self, table, key):
+        hll = table.get(key)
+        if hll is None:
+            if len(table) >= self.max_keys:
+                self.untracked_keys += 1
+                return None
+            hll = table[key] = HyperLogLog(self.key_precision)
+        return hll
+
+    def _update_heavy_hitters(self, key, estimate):
+        candidates = self.heavy_hitters_candidates
+        if key in candidates or len(candidates) < self.heavy_hitter_capacity:
+            candidates[key] = estimate
+            return
+        weakest = min(candidates, key=candidates.get)
+        if estimate > candidates[weakest]:
+            del candidates[weakest]
+            candidates[key] = estimate
+
+    def record(self, user_id, abbreviation_id, category=None):
+        """Feed one interaction into all sketches"""
+        with self.lock:
+            estimate = self.frequency.add(abbreviation_id)
+            self._update_heavy_hitters(abbreviation_id, estimate)
+            if user_id is None:
+                return
+            self.users.add(user_id)
+            hll = self._keyed_hll(self.abbreviation_users, abbreviation_id)
+            if hll is not None:
+                hll.add(user_id)
+            if category:
+                hll = self._keyed_hll(self.category_users, category.lower())
+                if hll is not None:
+                    hll.add(user_id)
+
+    def interaction_count(self, abbreviation_id):
+        """Approximate number of interactions with an abbreviation"""
+        return self.frequency.estimate(abbreviation_id)
+
+    def unique_users(self, abbreviation_id=None):
+        """Approximate distinct users overall or for one abbreviation"""
+        if abbreviation_id is None:
+            return self.users.count()
+        hll = self.abbreviation_users.get(abbreviation_id)
+        return hll.count() if hll is not None else 0
+
+    def unique_users_by_category(self, category):
+        hll = self.category_users.get(category.lower())
+        return hll.count() if hll is not None else 0
+
+    def heavy_hitters(self, limit=10):
+        """Most frequently interacted abbreviations as (id, estimated count) pairs"""
+        with self.lock:
+            ranked = sorted(((key, self.frequency.estimate(key)) for key in self.heavy_hitters_candidates),
+                            key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+    def stats(self):
+        """Sketch configuration and memory footprint"""
+        keyed_bytes = (len(self.abbreviation_users) + len(self.category_users)) * (1 << self.key_precision)
+        return {
+            'total_interactions': int(self.frequency.total),
+            'unique_users': self.users.count(),
+            'count_min': {
+                'epsilon': self.frequency.epsilon,
+                'delta': self.frequency.delta,
+                'width': self.frequency.width,
+                'depth': self.frequency.depth,
+            },
+            'user_hll_precision': self.users.precision,
+            'key_hll_precision': self.key_precision,
+            'tracked_abbreviations': len(self.abbreviation_users),
+            'tracked_categories': len(self.category_users),
+            'untracked_keys': self.untracked_keys,
+            'memory_bytes': int(self.frequency.nbytes + self.users.m + keyed_bytes),
+        }
+
+    def snapshot(self):
+        """Serialize all sketches to a compact base64 payload that other replicas can merge"""
+        with self.lock:
+            arrays = {
+                'cms_table': self.frequency.table,
+                'cms_params': np.array([self.frequency.width, self.frequency.depth,
+                                        self.frequency.seed, self.frequency.total], dtype=np.int64),
+                'users': self.users.registers,
+                'abbr_keys': np.array(list(self.abbreviation_users), dtype=np.int64),
+                'abbr_registers': self._stack(self.abbreviation_users.values()),
+                'category_keys': np.array(list(self.category_users), dtype=np.str_),
+                'category_registers': self._stack(self.category_users.values()),
+                'heavy_keys': np.array(list(self.heavy_hitters_candidates), dtype=np.int64),
+            }
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+    def _stack(self, hlls):
+        registers = [hll.registers for hll in hlls]
+        if not registers:
+            return np.zeros((0, 1 << self.key_precision), dtype=np.uint8)
+        return np.vstack(registers)
+
+    def merge_snapshot(self, payload):
+        """Merge a snapshot produced by `snapshot()` on another replica"""
+        with np.load(io.BytesIO(base64.b64decode(payload))) as arrays:
+            width, depth, seed, total = (int(v) for v in arrays['cms_params'])
+            if (width, depth, seed) != (self.frequency.width, self.frequency.depth, self.frequency.seed):
+                raise ValueError("Snapshot was built with different Count-Min parameters")
+            users = HyperLogLog.from_registers(arrays['users'])
+            abbr_registers = arrays['abbr_registers']
+            category_registers = arrays['category_registers']
+            if abbr_registers.shape[1] != 1 << self.key_precision:
+                raise ValueError("Snapshot was built with a different keyed HyperLogLog precision")
+
+            with self.lock:
+                self.frequency.table += arrays['cms_table']
+                self.frequency.total += total
+                self.users.merge(users)
+                for key, registers in zip(arrays['abbr_keys'].tolist(), abbr_registers):
+                    hll = self._keyed_hll(self.abbreviation_users, key)
+                    if hll is not None:
+                        hll.merge(HyperLogLog.from_registers(registers))
+                for key, registers in zip(arrays['category_keys'].tolist(), category_registers):
+                    hll = self._keyed_hll(self.category_users, key)
+                    if hll is not None:
+                        hll.merge(HyperLogLog.from_registers(registers))
+                for key in set(self.heavy_hitters_candidates) | set(arrays['heavy_keys'].tolist()):
+                    self._update_heavy_hitters(key, self.frequency.estimate(key))
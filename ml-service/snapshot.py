@@ -0,0 +1,285 @@
+import itertools
+import json
+import mmap
+import os
+import pickle
+import shutil
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # no advisory file locks (Windows): every process refreshes on its own
+    fcntl = None
+
+import numpy as np
+from scipy import sparse
+
+from catalog import Catalog, StringColumn
+from similarity import SparseSimilarityIndex
+
+NUMERIC_COLUMNS = (
+    'ids', 'votes', 'comments', 'created_epoch', 'category_codes', 'department_codes',
+    'meaning_lengths', 'description_lengths',
+)
+TEXT_COLUMNS = ('abbreviations', 'meanings', 'descriptions')
+
+
+def save_csr(directory, name, matrix):
+    for part in ('data', 'indices', 'indptr'):
+        np.save(os.path.join(directory, f"{name}.{part}.npy"), getattr(matrix, part))
+
+
+def load_csr(directory, name, shape, mmap_mode):
+    parts = [np.load(os.path.join(directory, f"{name}.{part}.npy"), mmap_mode=mmap_mode)
+             for part in ('data', 'indices', 'indptr')]
+    return sparse.csr_matrix(tuple(parts), shape=tuple(shape), copy=False)
+
+
+class CatalogSnapshot:
+    """One loaded snapshot: the catalog plus whichever derived state was saved with it"""
+
+    def __init__(self, version, meta, catalog, similarity_index=None, item_state=None):
+        self.version = version
+        self.meta = meta
+        self.catalog = catalog
+        self.similarity_index = similarity_index
+        self.item_state = item_state
+
+
+class CatalogSnapshotStore:
+    """Versioned on-disk snapshots of the catalog and its derived indexes, memory-mapped on load
+
+    A snapshot directory holds the catalog columns as .npy files (text fields
+    as UTF-8 buffers plus offsets), the fitted TF-IDF vectorizer and item
+    matrix, the item-item neighbour table and the trending scores. Each write
+    goes to its own directory, renamed into place once complete, and is
+    published by atomically replacing the CURRENT pointer. Loading maps the
+    arrays instead of reading them, so a restart costs roughly the time to
+    open the files. Persistence is best effort: failures are counted in
+    `errors` and the service falls back to fetching from the backend.
+
+    The directory is also how worker processes on one host share a catalog.
+    One process holds the refresh lease (an flock on REFRESH.lock) and
+    publishes snapshots; every publish bumps an 8-byte generation counter in
+    GENERATION, which each process keeps memory-mapped. The others compare
+    that counter on each request and attach to the new version when it
+    changes, so all workers read the same page-cache pages instead of each
+    holding its own copy.
+    """
+
+    def __init__(self, directory, keep_versions=2, mmap_mode='r'):
+        self.directory = directory
+        self.keep_versions = keep_versions
+        self.mmap_mode = mmap_mode
+        self.current = None
+        self.written_at = None
+        self.loads = 0
+        self.saves = 0
+        self.errors = 0
+        self.last_load_seconds = None
+        self.generation = 0
+        self.lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._lease = None
+        self._generation_map = None
+
+    def write(self, catalog, similarity_index=None, item_model=None):
+        """Persist a snapshot and make it current; returns its version, or None if writing failed"""
+        version = time.strftime('%Y%m%d%H%M%S') + f"-{os.getpid()}-{next(self._sequence):06d}"
+        path = os.path.join(self.directory, version)
+        tmp_path = f"{path}.tmp"
+        meta = {
+            'version': version,
+            'rows': len(catalog),
+            'built_at': catalog.built_at,
+            'written_at': time.time(),
+            'categories': list(catalog.categories),
+            'departments': list(catalog.departments),
+        }
+        try:
+            os.makedirs(tmp_path, exist_ok=True)
+            for name in NUMERIC_COLUMNS:
+                np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(catalog, name))
+            for name in TEXT_COLUMNS:
+                column = getattr(catalog, name)
+                if not isinstance(column, StringColumn):
+                    column = StringColumn.from_strings(column)
+                np.save(os.path.join(tmp_path, f"{name}.buffer.npy"), column.buffer)
+                np.save(os.path.join(tmp_path, f"{name}.offsets.npy"), column.offsets)
+
+            if catalog.trending is not None:
+                np.save(os.path.join(tmp_path, 'trending_scores.npy'), catalog.trending[0])
+                meta['trending_at'] = catalog.trending[1]
+            # Only the sparse TF-IDF index is stored here; LSA indexes have their own store
+            # and hashed features are rebuilt incrementally
+            if isinstance(similarity_index, SparseSimilarityIndex):
+                with open(os.path.join(tmp_path, 'vectorizer.pkl'), 'wb') as f:
+                    pickle.dump(similarity_index.vectorizer, f, protocol=pickle.HIGHEST_PROTOCOL)
+                if similarity_index.matrix is not None:
+                    save_csr(tmp_path, 'tfidf', similarity_index.matrix)
+                    meta['tfidf_shape'] = list(similarity_index.matrix.shape)
+            if item_model is not None and len(item_model):
+                with item_model.lock:
+                    item_ids, item_counts = item_model.item_ids, item_model.item_counts
+                    counts, similarity = item_model.counts, item_model.similarity
+                np.save(os.path.join(tmp_path, 'item_ids.npy'), item_ids)
+                np.save(os.path.join(tmp_path, 'item_counts.npy'), item_counts)
+                save_csr(tmp_path, 'item_counts', counts)
+                save_csr(tmp_path, 'item_similarity', similarity)
+                meta['items'] = len(item_ids)
+
+            with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, path)
+
+            pointer = os.path.join(self.directory, 'CURRENT')
+            with open(f"{pointer}.tmp", 'w') as f:
+                f.write(version)
+            os.replace(f"{pointer}.tmp", pointer)
+            generation = self._bump_generation()
+        except OSError:
+            self.errors += 1
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return None
+        with self.lock:
+            self.current = version
+            self.written_at = meta['written_at']
+            self.generation = generation
+            self.saves += 1
+        self._cleanup(keep=version)
+        return version
+
+    def _cleanup(self, keep):
+        versions = sorted(
+            name for name in os.listdir(self.directory)
+            if os.path.isdir(os.path.join(self.directory, name)) and not name.endswith('.tmp')
+        )
+        for name in versions[:-self.keep_versions]:
+            if name != keep:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def load(self):
+        """Memory-map the current snapshot; returns a CatalogSnapshot, or None if there is none (or it is unreadable)"""
+        pointer = os.path.join(self.directory, 'CURRENT')
+        if not os.path.exists(pointer):
+            return None
+        started = time.perf_counter()
+        # Read the counter before the pointer: a publish in between only causes one extra reload
+        generation = self.published()
+        try:
+            with open(pointer) as f:
+                version = f.read().strip()
+            path = os.path.join(self.directory, version)
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+
+            def array(name):
+                return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=self.mmap_mode)
+
+            columns = {name: array(name) for name in NUMERIC_COLUMNS}
+            texts = {name: StringColumn(array(f"{name}.buffer"), array(f"{name}.offsets")) for name in TEXT_COLUMNS}
+            catalog = Catalog(
+                columns['ids'], columns['votes'], columns['comments'], columns['created_epoch'],
+                texts['abbreviations'], texts['meanings'], texts['descriptions'],
+                columns['category_codes'], meta['categories'], columns['department_codes'], meta['departments'],
+                meaning_lengths=columns['meaning_lengths'], description_lengths=columns['description_lengths']
+            )
+            if 'trending_at' in meta:
+                catalog.trending = (array('trending_scores'), meta['trending_at'])
+
+            similarity_index = None
+            if os.path.exists(os.path.join(path, 'vectorizer.pkl')):
+                with open(os.path.join(path, 'vectorizer.pkl'), 'rb') as f:
+                    vectorizer = pickle.load(f)
+                matrix = load_csr(path, 'tfidf', meta['tfidf_shape'], self.mmap_mode) if 'tfidf_shape' in meta else None
+                similarity_index = SparseSimilarityIndex.from_matrix(vectorizer, matrix, len(catalog))
+
+            item_state = None
+            if 'items' in meta:
+                n_items = meta['items']
+                item_state = (
+                    array('item_ids'), array('item_counts'),
+                    load_csr(path, 'item_counts', (n_items, n_items), self.mmap_mode),
+                    load_csr(path, 'item_similarity', (n_items, n_items), self.mmap_mode),
+                )
+        except (OSError, ValueError, KeyError, EOFError, pickle.UnpicklingError):
+            # Remember the generation anyway so a broken publish is not retried on every request
+            self.generation = generation
+            self.errors += 1
+            return None
+        with self.lock:
+            self.current = version
+            self.written_at = meta.get('written_at')
+            self.generation = generation
+            self.loads += 1
+            self.last_load_seconds = time.perf_counter() - started
+        return CatalogSnapshot(version, meta, catalog, similarity_index, item_state)
+
+    def _bump_generation(self):
+        fd = os.open(os.path.join(self.directory, 'GENERATION'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.read(fd, 8)
+            generation = (struct.unpack('<Q', raw)[0] if len(raw) == 8 else 0) + 1
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, struct.pack('<Q', generation))
+        finally:
+            os.close(fd)
+        return generation
+
+    def published(self):
+        """Generation of the newest snapshot published on this host (0 before the first one)"""
+        if self._generation_map is None:
+            try:
+                with open(os.path.join(self.directory, 'GENERATION'), 'rb') as f:
+                    self._generation_map = mmap.mmap(f.fileno(), 8, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return 0
+        return struct.unpack_from('<Q', self._generation_map)[0]
+
+    def age(self):
+        """Seconds since the snapshot this store last loaded or wrote was published (None without one)"""
+        return None if self.written_at is None else time.time() - self.written_at
+
+    def changed(self):
+        """Whether another process has published a snapshot newer than the one this store last loaded or wrote"""
+        return self.published() > self.generation
+
+    def acquire_refresh(self):
+        """Try to become this host's refresher; the lease is held until release_refresh() or process exit"""
+        if self._lease is not None or fcntl is None:
+            return True
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd = os.open(os.path.join(self.directory, 'REFRESH.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError:
+            # Without a shared directory there is nothing to coordinate through
+            self.errors += 1
+            return True
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lease = fd
+        return True
+
+    def release_refresh(self):
+        if self._lease is not None:
+            os.close(self._lease)
+            self._lease = None
+
+    def stats(self):
+        return {
+            'current': self.current,
+            'age_seconds': None if self.written_at is None else round(self.age(), 1),
+            'generation': self.generation,
+            'refresher': self._lease is not None,
+            'loads': self.loads,
+            'saves': self.saves,
+            'errors': self.errors,
+            'last_load_seconds': None if self.last_load_seconds is None else round(self.last_load_seconds, 4),
+        }
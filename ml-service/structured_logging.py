@@ -0,0 +1,180 @@
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from datetime import datetime
+
+# Ties a request's log lines together; taken from the caller when present and echoed on the response
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+_request_id = contextvars.ContextVar('request_id', default='-')
+
+
+def request_id_from_header(value):
+    """The caller's request id if it is short and printable, else a fresh one"""
+    if value and len(value) <= 64 and value.isprintable() and ' ' not in value:
+        return value
+    return os.urandom(8).hex()
+
+
+def current_request_id():
+    """Id of the request being handled ('-' in background work)"""
+    return _request_id.get()
+
+
+def set_request_id(request_id):
+    """Make `request_id` current; returns a token for reset_request_id"""
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+def parse_sample_rates(value):
+    """{'event': rate} from 'event=rate,event=rate' (e.g. LOG_SAMPLE_RATES); malformed entries are skipped"""
+    rates = {}
+    for item in (value or '').split(','):
+        event, _, rate = item.partition('=')
+        try:
+            rates[event.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+def format_field(value):
+    text = str(value)
+    if not text or any(c in text for c in ' ="\n'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+class KeyValueFormatter(logging.Formatter):
+    """One `key=value` line per record: time, level, logger, request id, event and its fields
+
+    Records from plain logger calls carry their message as `msg=`.
+    """
+
+    def format(self, record):
+        parts = [
+            datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            record.levelname,
+            record.name,
+            f"request_id={getattr(record, 'request_id', '-')}",
+        ]
+        fields = getattr(record, 'fields', None)
+        if fields is None:
+            parts.append(f"msg={format_field(record.getMessage())}")
+        else:
+            parts.append(f"event={record.msg}")
+            parts.extend(f"{key}={format_field(value)}" for key, value in fields.items())
+        line = ' '.join(parts)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line = f"{line}\n{record.exc_text}"
+        return line
+
+
+class AsyncHandler(logging.handlers.QueueHandler):
+    """Queues records for a background listener instead of formatting and writing on the caller's thread
+
+    The request id is captured here, on the caller's thread. Formatting is
+    left to the listener, and a full queue drops the record (counted)
+    rather than blocking the request.
+    """
+
+    def __init__(self, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        self.listener = None
+
+    def prepare(self, record):
+        record.request_id = current_request_id()
+        if record.exc_info:
+            # Tracebacks are rendered now; the frames they reference may be gone when the listener gets to them
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # logging.shutdown() closes handlers at exit; the listener writes what is still queued first
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+        super().close()
+
+
+class StructuredLogger:
+    """Key-value logging with per-event sampling; nothing is formatted on the caller's thread
+
+    `log.info('event.name', key=value, ...)` returns after a level check if
+    the level is disabled, and after a random draw if the event's sample
+    rate (default 1.0) leaves it out.
+    """
+
+    def __init__(self, logger, sample_rates=None):
+        self.logger = logger
+        self.sample_rates = dict(sample_rates or {})
+        self.sampled_out = {}
+        self.lock = threading.Lock()
+
+    def log(self, level, event, fields, exc_info=None):
+        if not self.logger.isEnabledFor(level):
+            return
+        rate = self.sample_rates.get(event, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            with self.lock:
+                self.sampled_out[event] = self.sampled_out.get(event, 0) + 1
+            return
+        if rate < 1.0:
+            fields['sample_rate'] = rate
+        self.logger.log(level, event, exc_info=exc_info, extra={'fields': fields})
+
+    def debug(self, event, **fields):
+        self.log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self.log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self.log(logging.WARNING, event, fields)
+
+    def error(self, event, exc_info=None, **fields):
+        self.log(logging.ERROR, event, fields, exc_info)
+
+    def stats(self):
+        with self.lock:
+            return {'sample_rates': dict(self.sample_rates), 'sampled_out': dict(self.sampled_out)}
+
+
+def configure_logging(level='INFO', maxsize=10000, stream=None):
+    """Route the root logger through an AsyncHandler to a key-value stream handler on a listener thread
+
+    Returns the AsyncHandler; closing it (logging does at exit) flushes and stops the listener.
+    Calling it again returns the handler already installed.
+    """
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, AsyncHandler):
+            return handler
+    output = logging.StreamHandler(stream)
+    output.setFormatter(KeyValueFormatter())
+    handler = AsyncHandler(maxsize)
+    listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    listener.start()
+    handler.listener = listener
+    root.addHandler(handler)
+    root.setLevel(level)
+    return handler
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from ann import IVFIndex, spherical_kmeans
+from ranking import top_k
+
+
+def clustered_vectors(rows=2000, dimensions=16, clusters=20, seed=0):
+    rng = np.random.RandomState(seed)
+    centers = rng.normal(size=(clusters, dimensions))
+    vectors = centers[rng.randint(clusters, size=rows)] + 0.3 * rng.normal(size=(rows, dimensions))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+class TestIVFIndex:
+    """Tests for the inverted-file nearest-neighbour index"""
+
+    def test_probing_every_list_is_exact(self):
+        vectors = clustered_vectors()
+        index = IVFIndex(n_lists=30).fit(vectors)
+
+        for query in vectors[:20]:
+            rows, scores = index.search(query, 10, probes=30)
+            expected = top_k(vectors @ query, 10)
+            assert sorted(rows.tolist()) == sorted(expected.tolist())
+            assert np.all(np.diff(scores) <= 0)
+
+    def test_few_probes_keep_high_recall(self):
+        vectors = clustered_vectors()
+        index = IVFIndex(n_lists=40, probes=4).fit(vectors)
+
+        recall = np.mean([
+            len(set(index.search(query, 10)[0].tolist()) & set(top_k(vectors @ query, 10).tolist())) / 10
+            for query in vectors[::100]
+        ])
+        assert recall >= 0.9
+
+    def test_lists_partition_all_rows(self):
+        index = IVFIndex(n_lists=25).fit(clustered_vectors(500))
+
+        assert sorted(index.rows.tolist()) == list(range(500))
+        assert index.offsets[-1] == 500
+        assert index.stats()['lists'] == 25
+
+    def test_threshold_and_empty_queries(self):
+        vectors = clustered_vectors(200)
+        index = IVFIndex(n_lists=10).fit(vectors)
+
+        rows, scores = index.search(vectors[0], 50, probes=10, threshold=0.9)
+        assert len(rows) and np.all(scores > 0.9)
+        assert len(index.search(np.zeros(16, dtype=np.float32), 5)[0]) == 0
+        assert len(IVFIndex().fit(np.zeros((0, 16), dtype=np.float32)).search(vectors[0], 5)[0]) == 0
+
+    def test_batch_search_matches_single_queries(self):
+        vectors = clustered_vectors()
+        index = IVFIndex(n_lists=40, probes=3).fit(vectors)
+        queries = np.vstack([vectors[:30], np.zeros((1, 16), dtype=np.float32)])
+
+        results = list(index.search_batch(queries, 5, threshold=0.2))
+        assert len(results) == 31
+        for query, (rows, scores) in zip(queries, results):
+            expected_rows, expected_scores = index.search(query, 5, threshold=0.2)
+            assert sorted(rows.tolist()) == sorted(expected_rows.tolist())
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+    def test_save_and_load(self, tmp_path):
+        vectors = clustered_vectors(300)
+        index = IVFIndex(n_lists=12, probes=3).fit(vectors, key='snapshot-1')
+        path = str(tmp_path / 'ann.npz')
+        index.save(path)
+
+        loaded = IVFIndex.load(path, vectors)
+        assert loaded.key == 'snapshot-1' and loaded.probes == 3
+        rows, _ = loaded.search(vectors[5], 5)
+        assert rows.tolist() == index.search(vectors[5], 5)[0].tolist()
+        with pytest.raises(ValueError):
+            IVFIndex.load(path, vectors[:10])
+
+
+def test_spherical_kmeans_returns_unit_centroids():
+    centroids = spherical_kmeans(clustered_vectors(500), 8)
+
+    assert centroids.shape == (8, 16)
+    np.testing.assert_allclose(np.linalg.norm(centroids, axis=1), 1.0, rtol=1e-5)
@@ -0,0 +1,108 @@
+import random
+
+from autocomplete import AutocompleteIndex, normalize_query, prefix_edit_distance
+
+
+ABBREVIATIONS = ['API', 'APR', 'URL', 'HR', 'RAD', 'AP']
+MEANINGS = [
+    'Application Programming Interface',
+    'Annual Percentage Rate',
+    'Uniform Resource Locator',
+    'Human Resources',
+    'Rapid Application Development',
+    'Associated Press',
+]
+VOTES = [50, 2, 30, 10, 5, 0]
+
+
+def brute_force_distance(query, key):
+    """Full optimal-string-alignment DP, minimised over every prefix of `key`"""
+    rows = [[j for j in range(len(key) + 1)]]
+    for i in range(1, len(query) + 1):
+        row = [i] + [0] * len(key)
+        for j in range(1, len(key) + 1):
+            row[j] = min(rows[i - 1][j] + 1, row[j - 1] + 1, rows[i - 1][j - 1] + (query[i - 1] != key[j - 1]))
+            if i > 1 and j > 1 and query[i - 1] == key[j - 2] and query[i - 2] == key[j - 1]:
+                row[j] = min(row[j], rows[i - 2][j - 2] + 1)
+        rows.append(row)
+    return min(rows[-1])
+
+
+class TestAutocompleteIndex:
+    """Tests for the sorted-key prefix and fuzzy suggestion index"""
+
+    def index(self):
+        return AutocompleteIndex(ABBREVIATIONS, MEANINGS, VOTES)
+
+    def test_prefix_ranks_codes_then_popularity(self):
+        results = self.index().search('ap')
+
+        assert [row for row, _, _ in results[:3]] == [5, 0, 1]  # exact code 'AP' first, then by votes
+        assert results[0] == (5, 'abbreviation', 'prefix')
+        assert all(match == 'prefix' for _, _, match in results)
+
+    def test_prefix_matches_meanings_and_words(self):
+        index = self.index()
+
+        assert index.search('human res')[0] == (3, 'meaning', 'prefix')
+        assert [row for row, _, _ in index.search('resource')] == [2, 3]
+        assert [row for row, _, _ in index.search('applic')] == [0, 4]
+
+    def test_fuzzy_matches_typos(self):
+        index = self.index()
+
+        assert index.search('unifrom') == [(2, 'meaning', 'fuzzy')]
+        assert index.search('locatro')[0][0] == 2
+        assert index.search('unifrom', fuzzy=False) == []
+        assert index.search('xyzw') == []
+
+    def test_rows_are_deduplicated_and_limited(self):
+        index = self.index()
+        results = index.search('a', limit=3)
+
+        assert len(results) == 3
+        assert len({row for row, _, _ in results}) == 3
+        assert index.search('  ') == []
+        assert index.search('api', limit=0) == []
+
+    def test_matches_brute_force_prefix_scan(self):
+        rng = random.Random(1)
+        words = ['data', 'database', 'date', 'delta', 'design', 'dev', 'device']
+        meanings = [' '.join(rng.choice(words) for _ in range(3)) for _ in range(200)]
+        index = AutocompleteIndex([f'D{row}' for row in range(200)], meanings, [rng.randint(0, 50) for _ in range(200)])
+
+        for prefix in ['d', 'da', 'dat', 'de', 'dev', 'devi', 'd1', 'd19']:
+            expected = {
+                row for row, meaning in enumerate(meanings)
+                if f'd{row}'.startswith(prefix) or meaning.startswith(prefix) or any(w.startswith(prefix) for w in meaning.split())
+            }
+            found = {row for row, _, _ in index.search(prefix, limit=1000, fuzzy=False)}
+            assert found == expected, prefix
+
+    def test_stats(self):
+        stats = self.index().stats()
+
+        assert stats['entries'] > len(ABBREVIATIONS)
+        assert stats['fuzzy_terms'] > 0
+
+
+class TestPrefixEditDistance:
+    """Tests for the banded prefix edit distance"""
+
+    def test_examples(self):
+        assert prefix_edit_distance('resour', 'resources', 1) == 0
+        assert prefix_edit_distance('reosur', 'resources', 1) == 1  # transposition
+        assert prefix_edit_distance('rsour', 'resources', 1) == 1
+        assert prefix_edit_distance('xyz', 'resources', 1) == 2
+
+    def test_matches_full_dp(self):
+        rng = random.Random(7)
+        for _ in range(2000):
+            query = ''.join(rng.choice('abc') for _ in range(rng.randint(1, 6)))
+            key = ''.join(rng.choice('abc') for _ in range(rng.randint(1, 8)))
+            max_edits = rng.randint(1, 2)
+            expected = min(brute_force_distance(query, key), max_edits + 1)
+            assert prefix_edit_distance(query, key, max_edits) == expected, (query, key)
+
+    def test_normalize_query(self):
+        assert normalize_query('  Human   RES ') == 'human res'
@@ -0,0 +1,162 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from conftest import FakeClock
+from caching import ResultCache, SingleFlight, estimate_size
+
+
+class TestResultCache:
+    """Tests for the byte-capped, snapshot-versioned LRU result cache"""
+
+    def test_hits_skip_computation_and_count_saved_cpu(self):
+        clock = FakeClock()
+        cache = ResultCache(10_000, clock=clock)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            clock.now += 0.25
+            return [{'id': 1}]
+
+        assert cache.get_or_compute(1, ('api', 5), compute) == [{'id': 1}]
+        assert cache.get_or_compute(1, ('api', 5), compute) == [{'id': 1}]
+        assert len(calls) == 1
+
+        stats = cache.stats()
+        assert stats['hits'] == 1 and stats['misses'] == 1
+        assert stats['hit_ratio'] == 0.5
+        assert stats['saved_cpu_seconds'] == 0.25
+
+    def test_new_version_invalidates(self):
+        cache = ResultCache(10_000)
+        cache.get_or_compute(1, 'api', lambda: ['old'])
+
+        assert cache.get_or_compute(2, 'api', lambda: ['new']) == ['new']
+        assert len(cache) == 1
+        assert cache.stats()['invalidations'] == 1
+        # Results computed against a replaced snapshot are not stored
+        assert cache.put(1, 'late', ['stale']) is False
+
+    def test_older_versions_miss_without_wiping(self):
+        cache = ResultCache(10_000)
+        cache.get_or_compute(2, 'api', lambda: ['current'])
+
+        # A request still holding the previous snapshot computes its own result but leaves the cache alone
+        assert cache.get_or_compute(1, 'api', lambda: ['old']) == ['old']
+        assert cache.get_or_compute(2, 'api', lambda: ['unused']) == ['current']
+        assert cache.stats()['version'] == 2 and cache.stats()['invalidations'] == 0
+
+        assert cache.put(3, 'web', ['newer']) is True
+        assert list(cache.entries) == ['web'] and cache.stats()['invalidations'] == 1
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        value = ['x' * 100]
+        cache = ResultCache(estimate_size(value) * 2)
+        cache.get_or_compute(1, 'a', lambda: ['x' * 100])
+        cache.get_or_compute(1, 'b', lambda: ['y' * 100])
+        cache.get_or_compute(1, 'a', lambda: ['unused'])  # refresh 'a'
+        cache.get_or_compute(1, 'c', lambda: ['z' * 100])
+
+        assert list(cache.entries) == ['a', 'c']
+        assert cache.bytes <= cache.max_bytes
+        assert cache.stats()['evictions'] == 1
+
+    def test_oversized_results_are_not_cached(self):
+        cache = ResultCache(100)
+
+        assert cache.get_or_compute(1, 'big', lambda: ['x' * 1000]) == ['x' * 1000]
+        assert len(cache) == 0 and cache.bytes == 0
+
+
+def test_estimate_size_counts_nested_values():
+    flat = estimate_size([])
+    nested = estimate_size([{'meaning': 'Application Programming Interface', 'score': 0.5}])
+
+    assert nested > flat + len('Application Programming Interface')
+    assert estimate_size(np.zeros(1000)) >= 8000
+    assert estimate_size(np.zeros(1000)[:500]) >= 4000
+
+
+class TestSingleFlight:
+    """Tests for coalescing concurrent identical computations"""
+
+    def run_concurrently(self, flight, key, compute, callers=8):
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(flight.do(key, compute))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+
+    def test_concurrent_callers_share_one_computation(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return ['shared']
+
+        threads, results, _ = self.run_concurrently(flight, ('similar', 'api'), compute)
+        while flight.stats()['executed'] + flight.stats()['coalesced'] < 8:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results) and len(results) == 8
+        assert flight.stats() == {
+            'in_flight': 0, 'executed': 1, 'coalesced': 7, 'coalesced_by_operation': {'similar': 7}
+        }
+
+    def test_errors_are_shared_and_nothing_is_kept(self):
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def compute():
+            release.wait(5)
+            raise ConnectionError("backend down")
+
+        threads, results, errors = self.run_concurrently(flight, ('user-data', 1), compute, callers=3)
+        while flight.stats()['coalesced'] < 2:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert not results and len(errors) == 3
+        assert all(isinstance(error, ConnectionError) for error in errors)
+        assert flight.do(('user-data', 1), lambda: 'retried') == 'retried'
+        with pytest.raises(KeyError):
+            flight.do(('user-data', 2), lambda: {}['missing'])
+        assert flight.stats()['executed'] == 3
+
+    def test_waiters_give_up_after_their_timeout(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        started = threading.Event()
+
+        def compute():
+            started.set()
+            release.wait(5)
+            return 'late'
+
+        leader = threading.Thread(target=lambda: flight.do(('catalog',), compute))
+        leader.start()
+        started.wait(5)
+        with pytest.raises(TimeoutError):
+            flight.do(('catalog',), compute, timeout=0.01)
+        release.set()
+        leader.join()
+        assert flight.stats()['in_flight'] == 0
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from catalog import Catalog, CatalogRecords, parse_epoch
+
+
+def sample_records():
+    now = datetime.now()
+    return [
+        {
+            'id': 10, 'abbreviation': 'API', 'meaning': 'Application Programming Interface',
+            'description': 'A set of protocols for building software applications',
+            'category': 'Technology', 'department': 'IT', 'votes_count': 12,
+            'comments': [{'id': 1}, {'id': 2}], 'created_at': now.isoformat()
+        },
+        {
+            'id': 20, 'abbreviation': 'HR', 'meaning': 'Human Resources', 'description': None,
+            'category': 'Business', 'department': None, 'votes_count': None,
+            'comments_count': 4, 'created_at': (now - timedelta(days=45)).isoformat()
+        },
+        {
+            'id': 30, 'abbreviation': 'ROI', 'meaning': 'Return on Investment',
+            'category': 'Business', 'department': 'Finance', 'created_at': 'invalid-date'
+        },
+    ]
+
+
+class TestCatalog:
+    """Tests for the columnar abbreviation catalog"""
+
+    def test_columns_are_typed(self):
+        catalog = Catalog.from_records(sample_records())
+
+        assert catalog.ids.dtype == np.int64
+        assert catalog.votes.tolist() == [12, 0, 0]
+        assert catalog.comments.tolist() == [2, 4, 0]
+        assert catalog.descriptions[1] == ''
+        assert np.isnan(catalog.created_epoch[2])
+        assert catalog.categories == ['Technology', 'Business']
+        assert catalog.category_codes.tolist() == [0, 1, 1]
+        assert catalog.department_codes.tolist() == [0, -1, 1]
+
+    def test_id_lookup(self):
+        catalog = Catalog.from_records(sample_records())
+
+        assert catalog.row_of(20) == 1
+        assert catalog.row_of(99) is None
+        assert catalog.rows_for([30, 99, 10]).tolist() == [2, -1, 0]
+        assert catalog.id_mask({20, 99}).tolist() == [False, True, False]
+
+    def test_categorical_masks(self):
+        catalog = Catalog.from_records(sample_records())
+
+        assert catalog.category_mask(['Business', 'Unknown']).tolist() == [False, True, True]
+        assert catalog.department_mask([None]).tolist() == [False, True, False]
+        assert catalog.department_mask(['IT']).tolist() == [True, False, False]
+
+    def test_strings_are_interned(self):
+        records = [{'id': i, 'abbreviation': 'API', 'meaning': ''.join(['Applic', 'ation'])} for i in range(3)]
+        catalog = Catalog.from_records(records)
+
+        assert catalog.meanings[0] is catalog.meanings[2]
+
+    def test_records_view(self):
+        catalog = Catalog.from_records(sample_records())
+        records = catalog.records()
+
+        assert isinstance(records, CatalogRecords)
+        assert len(records) == 3
+        assert records[0]['abbreviation'] == 'API'
+        assert records[-1]['id'] == 30
+        assert records[1]['comments_count'] == 4
+        assert [r['id'] for r in records[1:]] == [20, 30]
+        assert not Catalog.from_records([]).records()
+
+    def test_versions_increase_per_snapshot(self):
+        first = Catalog.from_records(sample_records())
+        second = Catalog.from_records(sample_records())
+
+        assert second.version > first.version
+
+    def test_memory_usage(self):
+        catalog = Catalog.from_records(sample_records())
+        usage = catalog.memory_usage()
+
+        assert usage['total'] == sum(v for k, v in usage.items() if k != 'total')
+        assert catalog.stats()['rows'] == 3
+
+    def test_parse_epoch(self):
+        assert parse_epoch('1970-01-01T00:01:00Z') == 60.0
+        assert np.isnan(parse_epoch(None))
+        assert np.isnan(parse_epoch('not a date'))
+
+
+class TestColumnarScoring:
+    """The vectorised scorers must agree with the per-dict reference implementations"""
+
+    def scoring_records(self):
+        now = datetime.now()
+        return [
+            {
+                'id': i, 'abbreviation': f"AB{i}", 'meaning': meaning, 'description': description,
+                'category': category, 'department': department, 'votes_count': votes,
+                'comments': [{}] * comments, 'created_at': (now - timedelta(days=age)).isoformat()
+            }
+            for i, (meaning, description, category, department, votes, comments, age) in enumerate([
+                ('Application Programming Interface', 'Protocols for building software', 'Technology', 'IT', 12, 2, 0),
+                ('Human Resources', '', 'Business', '', 0, 4, 3),
+                ('Return on Investment', 'Profitability ratio of an investment', 'Finance', 'Finance', 30, 0, 45),
+                ('Key', '', 'Other', 'IT', 1, 1, 400),
+            ])
+        ]
+
+    def test_trending_scores_match_scalar(self):
+        from app import calculate_trending_score, calculate_trending_scores
+
+        records = self.scoring_records()
+        current_time = datetime.now()
+
+        scores = calculate_trending_scores(Catalog.from_records(records), current_time)
+        expected = [calculate_trending_score(record, current_time) for record in records]
+        np.testing.assert_allclose(scores, expected, atol=1e-3)
+
+    def test_abbreviation_scores_match_scalar(self):
+        from app import ml_service
+
+        records = self.scoring_records()
+        features = {
+            'department': 'IT',
+            'search_history': ['api', 'investment'],
+            'common_categories': ['Business'],
+        }
+
+        scores = ml_service.calculate_abbreviation_scores(Catalog.from_records(records), features)
+        expected = [ml_service.calculate_abbreviation_score(record, features) for record in records]
+        np.testing.assert_allclose(scores, expected, atol=1e-3)
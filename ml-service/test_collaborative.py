@@ -0,0 +1,138 @@
+import numpy as np
+from scipy import sparse
+
+from collaborative import ItemItemModel, prune_rows
+from interactions import InteractionLog, interaction_weights
+
+
+def build_log(events, capacity=100):
+    log = InteractionLog(capacity=capacity)
+    for ts, (user_id, abbr_id) in enumerate(events):
+        log.append(user_id, abbr_id, 'view', timestamp=ts)
+    return log
+
+
+class TestInteractionLog:
+    """Tests for the fixed-capacity interaction ring buffer"""
+
+    def test_append_and_entries_in_order(self):
+        log = build_log([(1, 10), (2, 20), (1, 30)])
+        entries = log.entries()
+        assert entries['item_ids'].tolist() == [10, 20, 30]
+        assert entries['seq'].tolist() == [0, 1, 2]
+
+    def test_ring_buffer_overwrites_oldest(self):
+        log = build_log([(1, i) for i in range(7)], capacity=4)
+        entries = log.entries()
+        assert len(log) == 4
+        assert entries['item_ids'].tolist() == [3, 4, 5, 6]
+        assert entries['seq'].tolist() == [3, 4, 5, 6]
+        assert log.entries(since=5)['item_ids'].tolist() == [5, 6]
+        assert log.entries(since=0)['seq'].tolist() == [3, 4, 5, 6]
+
+    def test_rejects_invalid_ids(self):
+        log = InteractionLog(capacity=4)
+        assert log.append(None, 1) is False
+        assert log.append('abc', 1) is False
+        assert log.total == 0
+
+    def test_interaction_weights_from_user_data(self):
+        weights = interaction_weights({
+            'interactions': [{'type': 'comment', 'abbreviation_id': 1}],
+            'viewed_abbreviations': [1, 2],
+            'voted_abbreviations': [3],
+        })
+        assert weights == {1: 2.0, 2: 1.0, 3: 3.0}
+
+
+class TestItemItemModel:
+    """Tests for the incremental item-item co-occurrence model"""
+
+    def test_prune_rows_keeps_largest(self):
+        matrix = sparse.csr_matrix(np.array([[0, 3, 1, 2], [1, 0, 0, 0]], dtype=np.float32))
+        pruned = prune_rows(matrix, 2).toarray()
+        assert pruned[0].tolist() == [0, 3, 0, 2]
+        assert pruned[1].tolist() == [1, 0, 0, 0]
+
+        # One very wide row among narrow ones takes the sort path instead of the padded block
+        dense = np.zeros((11, 100), dtype=np.float32)
+        dense[0] = np.arange(1, 101)
+        dense[1:, :3] = [3, 1, 2]
+        pruned = prune_rows(sparse.csr_matrix(dense), 2).toarray()
+        assert np.flatnonzero(pruned[0]).tolist() == [98, 99]
+        assert all(row.tolist()[:3] == [3, 0, 2] and not row[3:].any() for row in pruned[1:])
+
+    def test_cooccurring_items_are_neighbours(self):
+        log = build_log([(1, 10), (1, 20), (2, 10), (2, 20), (3, 10), (3, 30)])
+        model = ItemItemModel()
+        assert model.update(log) is True
+
+        neighbours = dict(model.neighbours(10))
+        assert neighbours[20] > neighbours[30] > 0
+
+    def test_incremental_update_matches_full_rebuild(self):
+        events = [(1, 10), (1, 20), (2, 20), (2, 30), (1, 30), (3, 10), (3, 30)]
+        full = ItemItemModel()
+        full.update(build_log(events))
+
+        log = build_log(events[:3])
+        incremental = ItemItemModel()
+        incremental.update(log)
+        for ts, (user_id, abbr_id) in enumerate(events[3:], start=3):
+            log.append(user_id, abbr_id, 'view', timestamp=ts)
+        incremental.update(log)
+
+        assert incremental.update(log) is False
+        for abbr_id in (10, 20, 30):
+            assert dict(incremental.neighbours(abbr_id)) == dict(full.neighbours(abbr_id))
+
+    def test_many_small_updates_match_full_rebuild(self):
+        rng = np.random.default_rng(0)
+        events = list(zip(rng.integers(0, 15, 400).tolist(), rng.integers(0, 40, 400).tolist()))
+        full = ItemItemModel(top_n=100, max_raw_per_item=100, window=5)
+        full.update(build_log(events, capacity=1000))
+
+        log = InteractionLog(capacity=1000)
+        incremental = ItemItemModel(top_n=100, max_raw_per_item=100, window=5)
+        for ts, (user_id, abbr_id) in enumerate(events):
+            log.append(user_id, abbr_id, 'view', timestamp=ts)
+            if ts % 37 == 0:
+                incremental.update(log)
+        incremental.update(log)
+
+        assert max(len(tail) for _, tail in incremental.user_tails.values()) == 5
+        for abbr_id in range(40):
+            expected = dict(full.neighbours(abbr_id, 100))
+            actual = dict(incremental.neighbours(abbr_id, 100))
+            assert actual.keys() == expected.keys()
+            np.testing.assert_allclose([actual[k] for k in expected], list(expected.values()), rtol=1e-6)
+
+    def test_user_tails_are_bounded_by_the_log(self):
+        log = InteractionLog(capacity=50)
+        model = ItemItemModel(window=3)
+        for batch in range(20):
+            for user_id in range(batch * 25, batch * 25 + 25):
+                log.append(user_id, user_id % 7, 'view', timestamp=user_id)
+            model.update(log)
+
+        # Only users with an event still in the ring buffer are tracked, oldest first
+        assert list(model.user_tails) == list(range(450, 500))
+        assert [seq for seq, _ in model.user_tails.values()] == list(range(450, 500))
+
+    def test_top_n_bounds_neighbours(self):
+        events = [(1, abbr_id) for abbr_id in range(10)]
+        model = ItemItemModel(top_n=3, max_raw_per_item=5)
+        model.update(build_log(events))
+        row_nnz = np.diff(model.similarity.indptr)
+        assert row_nnz.max() <= 3
+        assert np.diff(model.counts.indptr).max() <= 5
+
+    def test_score_user_vector(self):
+        model = ItemItemModel()
+        model.update(build_log([(1, 10), (1, 20), (2, 10), (2, 20), (3, 30), (3, 40)]))
+
+        item_ids, scores = model.score({10: 1.0})
+        by_id = dict(zip(item_ids.tolist(), scores.tolist()))
+        assert by_id[20] > 0
+        assert by_id[40] == 0
+        assert model.score({999: 1.0}) is None
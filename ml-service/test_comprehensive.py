@@ -98,6 +98,89 @@ class TestMLServiceComprehensive:
         result = ml_service.get_cached_abbreviations()
         assert result == [{'id': 1, 'abbreviation': 'CACHED'}]
 
+    @patch('requests.get')
+    def test_warm_start_from_snapshot(self, mock_get):
+        """Test serving the last catalog snapshot when the backend is unreachable"""
+        mock_get.side_effect = Exception("Network error")
+        
+        from catalog import Catalog
+        from snapshot import CatalogSnapshotStore
+        records = [
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'},
+            {'id': 2, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator'}
+        ]
+        CatalogSnapshotStore(os.path.join(os.environ['ARTIFACTS_DIR'], 'snapshot')).write(Catalog.from_records(records))
+        
+        from app import MLService
+        ml_service = MLService()
+        
+        assert ml_service.snapshots.stats()['loads'] == 1
+        assert [r['abbreviation'] for r in ml_service.get_cached_abbreviations()] == ['API', 'URL']
+        assert len(ml_service.get_catalog()) == 2
+
+    @patch('requests.get')
+    def test_followers_attach_to_published_snapshots(self, mock_get):
+        """Test a worker without the refresh lease never fetches and picks up the refresher's snapshots"""
+        from catalog import Catalog
+        from snapshot import CatalogSnapshotStore
+        refresher = CatalogSnapshotStore(os.path.join(os.environ['ARTIFACTS_DIR'], 'snapshot'))
+        assert refresher.acquire_refresh()
+        refresher.write(Catalog.from_records([{'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'}]))
+        
+        from app import MLService
+        ml_service = MLService()
+        ml_service.cache_timestamp = datetime.now() - timedelta(hours=1)
+        
+        assert [r['abbreviation'] for r in ml_service.get_cached_abbreviations()] == ['API']
+        mock_get.assert_not_called()
+        
+        refresher.write(Catalog.from_records([
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'},
+            {'id': 2, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator'}
+        ]))
+        assert len(ml_service.get_cached_abbreviations()) == 2
+        assert len(ml_service.get_catalog()) == 2
+        mock_get.assert_not_called()
+        
+        # A refresher that stops publishing for two TTLs no longer holds the others back
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {'data': [{'id': 3, 'abbreviation': 'CPU', 'meaning': 'Central Processing Unit'}]}
+        ml_service.snapshots.written_at -= 2 * ml_service.cache_ttl
+        ml_service.cache_timestamp = datetime.now() - timedelta(hours=1)
+        assert [r['abbreviation'] for r in ml_service.get_cached_abbreviations()] == ['CPU']
+        mock_get.assert_called_once()
+        refresher.release_refresh()
+
+    @patch('requests.get')
+    def test_catalog_fetched_during_a_build_is_still_published(self, mock_get):
+        """Test a catalog fetched while the previous one is being indexed is published after it, not dropped"""
+        import threading
+        import time
+        from catalog import Catalog
+        from app import MLService
+        ml_service = MLService()
+        building = threading.Event()
+        release = threading.Event()
+        published = []
+        
+        def save_snapshot(catalog):
+            building.set()
+            release.wait(5)
+            published.append(len(catalog))
+        
+        with patch.object(ml_service, 'save_snapshot', side_effect=save_snapshot):
+            assert ml_service.publish_catalog(Catalog.from_records([{'id': 1, 'abbreviation': 'A', 'meaning': 'a'}]))
+            assert building.wait(5)
+            two = [{'id': 1, 'abbreviation': 'A', 'meaning': 'a'}, {'id': 2, 'abbreviation': 'B', 'meaning': 'b'}]
+            assert not ml_service.publish_catalog(Catalog.from_records(two))
+            release.set()
+            for _ in range(500):
+                if not ml_service._publishing:
+                    break
+                time.sleep(0.01)
+        
+        assert published == [1, 2]
+
     @patch('os.path.exists')
     @patch('builtins.open')
     @patch('pickle.load')
@@ -263,6 +346,62 @@ class TestMLServiceComprehensive:
         result = ml_service.get_fallback_recommendations(1)
         assert result == []
 
+    @patch('requests.get')
+    def test_backend_outage_fails_fast_to_local_fallback(self, mock_get):
+        """Test the circuit breaker stops calling a failing backend and fallbacks come from the cached catalog"""
+        mock_get.side_effect = Exception("Connection timed out")
+        
+        from app import MLService
+        ml_service = MLService()
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface', 'votes_count': 1},
+            {'id': 2, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator', 'votes_count': 9}
+        ]
+        
+        for _ in range(5):
+            result = ml_service.get_personalized_recommendations(1)
+            assert [r['id'] for r in result] == [2, 1]
+        assert mock_get.call_count == 5
+        assert ml_service.backend_breaker.stats()['state'] == 'open'
+        
+        assert [r['id'] for r in ml_service.get_personalized_recommendations(1)] == [2, 1]
+        assert mock_get.call_count == 5
+        assert ml_service.backend_breaker.stats()['rejected'] == 1
+
+    @patch('requests.get')
+    def test_concurrent_recommendations_for_one_user_are_coalesced(self, mock_get):
+        """Test concurrent requests for the same user share one user-data fetch and scoring pass"""
+        import threading
+        import time
+        
+        def slow_user_data(*args, **kwargs):
+            time.sleep(0.2)
+            response = Mock()
+            response.status_code = 200
+            response.json.return_value = {'department': 'IT', 'interactions': []}
+            return response
+        mock_get.side_effect = slow_user_data
+        
+        from app import MLService
+        ml_service = MLService()
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [{'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'}]
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(ml_service.get_personalized_recommendations(7)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len(results) == 5 and all(result == results[0] for result in results)
+        assert mock_get.call_count == 1
+        assert ml_service.single_flight.stats()['coalesced_by_operation'] == {'recommendations': 4}
+
     def test_extract_user_features(self):
         """Test user feature extraction"""
         from app import MLService
@@ -767,6 +906,33 @@ class TestFlaskEndpoints:
         assert isinstance(score, float)
         assert score >= 0.01
 
+    def test_calculate_trending_score_utc_timestamp(self):
+        """Test that UTC ('Z') timestamps from the backend are time-decayed too"""
+        from datetime import timezone
+        from app import calculate_trending_score
+
+        now = datetime.now()
+        created_at = (datetime.now(timezone.utc) - timedelta(days=200)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        abbreviation = {
+            'votes_count': 5,
+            'comments': [],
+            'meaning': 'Tiny',
+            'description': '',
+            'category': 'other',
+            'created_at': created_at
+        }
+
+        # 5 votes * 2.0 * 0.6 (older content) = 6.0 -> 0.6
+        assert calculate_trending_score(abbreviation, now) == 0.6
+
+    def test_trending_time_factor_buckets(self):
+        """Test vectorised time-decay bucketing"""
+        from app import trending_time_factor, recency_bonus
+
+        ages = np.array([0, 3, 10, 60, 400, np.nan])
+        assert trending_time_factor(ages).tolist() == [1.5, 1.2, 1.0, 0.8, 0.6, 1.0]
+        np.testing.assert_allclose(recency_bonus(ages), [1.0, 0.9, 2 / 3, 0.0, 0.0, 0.0])
+
 
 class TestFlaskIntegration:
     """Integration tests for Flask endpoints"""
@@ -1022,3 +1188,451 @@ class TestFlaskIntegration:
             data = json.loads(response.data)
             assert data['status'] == 'success'
             assert 'results' in data
+
+    def test_get_trending_realtime_mode(self):
+        """Test realtime trending reacts to tracked interactions"""
+        from app import app, ml_service
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'},
+            {'id': 2, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator'}
+        ]
+        
+        with app.test_client() as client:
+            client.post('/track-interaction',
+                        json={'user_id': 1, 'abbreviation_id': 2, 'interaction_type': 'vote'})
+            response = client.get('/recommendations/trending?mode=realtime&limit=5')
+            assert response.status_code == 200
+            data = json.loads(response.data)
+            assert data['mode'] == 'realtime'
+            assert data['trending'][0]['id'] == 2
+            assert set(data['trending'][0]['activity']) == {'1h', '24h', '7d'}
+            
+            response = client.get('/recommendations/trending?mode=realtime&window=2h')
+            assert response.status_code == 400
+
+    def test_analytics_endpoints(self):
+        """Test interaction analytics read and merge endpoints"""
+        from app import app, ml_service
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface', 'category': 'IT'}
+        ]
+        
+        with app.test_client() as client:
+            client.post('/track-interaction',
+                        json={'user_id': 42, 'abbreviation_id': 1, 'interaction_type': 'view'})
+            data = json.loads(client.get('/analytics/abbreviations/1').data)
+            assert data['interactions'] >= 1
+            assert data['unique_users'] >= 1
+            
+            data = json.loads(client.get('/analytics/heavy-hitters').data)
+            assert 1 in [item['abbreviation_id'] for item in data['heavy_hitters']]
+            
+            snapshot = json.loads(client.get('/analytics/snapshot').data)['snapshot']
+            response = client.post('/analytics/snapshot', json={'snapshot': snapshot})
+            assert response.status_code == 200
+            response = client.post('/analytics/snapshot', json={})
+            assert response.status_code == 400
+
+    def test_generate_recommendations_blends_collaborative_scores(self):
+        """Test item-item CF lifts abbreviations co-used with the user's history"""
+        from app import MLService
+        ml_service = MLService()
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'},
+            {'id': 2, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator'},
+            {'id': 3, 'abbreviation': 'CRM', 'meaning': 'Customer Relationship Management'}
+        ]
+        for user_id in range(5):
+            ml_service.interaction_log.append(user_id, 1, 'view')
+            ml_service.interaction_log.append(user_id, 3, 'view')
+        ml_service.item_similarity.update(ml_service.interaction_log)
+        
+        features = {'department': 'IT', 'common_categories': [], 'search_history': []}
+        result = ml_service.generate_recommendations(features, {'viewed_abbreviations': [1]}, 5)
+        
+        assert [r['id'] for r in result] == [3, 2]
+
+    def test_personalized_recommendations_served_from_factors(self):
+        """Test users with rich history are served from the ALS factor model"""
+        from app import MLService
+        ml_service = MLService()
+        ml_service.factor_min_interactions = 1
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [
+            {'id': abbr_id, 'abbreviation': f'A{abbr_id}', 'meaning': f'Meaning {abbr_id}'}
+            for abbr_id in range(1, 7)
+        ]
+        for user_id in range(1, 11):
+            for abbr_id in (1, 2, 3) if user_id <= 5 else (4, 5, 6):
+                if user_id == 1 and abbr_id == 3:
+                    continue
+                ml_service.interaction_log.append(user_id, abbr_id, 'vote')
+        
+        with patch.object(ml_service.factor_model.__class__, 'save'):
+            assert ml_service.train_factor_model() is True
+        ml_service.factor_model.min_user_interactions = 2
+        
+        user_data = {'viewed_abbreviations': [1, 2], 'interactions': []}
+        result = ml_service.get_personalized_recommendations_with_data(1, user_data, 2)
+        assert result[0]['id'] == 3
+        assert all(r['id'] not in (1, 2) for r in result)
+
+    def test_recommendations_served_from_precomputed_store(self, tmp_path):
+        """Test fresh precomputed lists are served and stale ones fall back to live scoring"""
+        from app import app, ml_service
+        from precompute import PrecomputedStore
+        
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'},
+            {'id': 2, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator'}
+        ]
+        original_store = ml_service.precomputed
+        ml_service.precomputed = PrecomputedStore(str(tmp_path), max_age=3600)
+        ml_service.precomputed.write(np.array([5]), np.array([[2, 1]]), np.array([[0.9, 0.4]], dtype=np.float32))
+        
+        try:
+            with app.test_client() as client:
+                data = json.loads(client.get('/recommendations/5').data)
+                assert data['source'] == 'precomputed'
+                assert [r['id'] for r in data['recommendations']] == [2, 1]
+                
+                data = json.loads(client.post('/recommendations/5', json={
+                    'user_data': {'viewed_abbreviations': [2]}, 'limit': 5
+                }).data)
+                assert [r['id'] for r in data['recommendations']] == [1]
+                
+                ml_service.precomputed.meta['generated_at'] -= 7200
+                data = json.loads(client.post('/recommendations/5', json={
+                    'user_data': {'department': 'IT', 'interactions': []}, 'limit': 5
+                }).data)
+                assert 'source' not in data
+        finally:
+            ml_service.precomputed = original_store
+
+    def test_precompute_endpoint(self):
+        """Test precompute endpoint starts a background job"""
+        from app import app
+        with app.test_client() as client:
+            response = client.post('/precompute-recommendations', json={})
+            assert response.status_code in [202, 409]
+
+    def test_autocomplete_endpoint(self):
+        """Test autocomplete returns prefix matches first and tolerates typos"""
+        from app import app, ml_service
+        
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface', 'votes_count': 5},
+            {'id': 2, 'abbreviation': 'APR', 'meaning': 'Annual Percentage Rate', 'votes_count': 1},
+            {'id': 3, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator', 'votes_count': 3}
+        ]
+        
+        with app.test_client() as client:
+            data = json.loads(client.get('/autocomplete?q=ap').data)
+            assert data['status'] == 'success'
+            assert [s['id'] for s in data['suggestions']] == [1, 2]
+            assert data['suggestions'][0]['matched_field'] == 'abbreviation'
+            
+            data = json.loads(client.get('/autocomplete?q=unifrom').data)
+            assert data['suggestions'][0]['id'] == 3
+            assert data['suggestions'][0]['match'] == 'fuzzy'
+            
+            data = json.loads(client.get('/autocomplete?q=unifrom&fuzzy=false').data)
+            assert data['suggestions'] == []
+            
+            response = client.get('/autocomplete')
+            assert response.status_code == 400
+
+    def test_similar_abbreviations_served_from_cache(self):
+        """Test repeated similar-abbreviation queries hit the result cache until the snapshot changes"""
+        from app import app, ml_service
+        
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'},
+            {'id': 2, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator'}
+        ]
+        
+        with app.test_client() as client:
+            before = json.loads(client.get('/similar-abbreviations/cache').data)['cache']
+            first = json.loads(client.post('/similar-abbreviations', json={'text': 'Programming interface', 'limit': 5}).data)
+            second = json.loads(client.post('/similar-abbreviations', json={'text': '  programming   INTERFACE', 'limit': 5}).data)
+            after = json.loads(client.get('/similar-abbreviations/cache').data)['cache']
+            
+            assert second['similar_abbreviations'] == first['similar_abbreviations']
+            assert second['query'] == 'programming   INTERFACE'
+            assert after['hits'] == before['hits'] + 1
+            assert after['misses'] == before['misses'] + 1
+            assert 'coalesced' in json.loads(client.get('/similar-abbreviations/cache').data)['coalescing']
+            
+            ml_service.abbreviations_cache = [{'id': 3, 'abbreviation': 'HR', 'meaning': 'Human Resources'}]
+            data = json.loads(client.post('/similar-abbreviations', json={'text': 'Programming interface', 'limit': 5}).data)
+            assert data['similar_abbreviations'] == []
+
+    def test_similar_abbreviations_lsa_mode(self):
+        """Test LSA mode serves similar abbreviations and profile similarity from dense vectors"""
+        from app import app, ml_service
+        
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'},
+            {'id': 2, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator'},
+            {'id': 3, 'abbreviation': 'HR', 'meaning': 'Human Resources'}
+        ]
+        original_mode = ml_service.similarity_mode
+        ml_service.similarity_mode = 'lsa'
+        try:
+            with app.test_client() as client:
+                data = json.loads(client.post('/similar-abbreviations', json={'text': 'human resources', 'limit': 5}).data)
+                assert [s['id'] for s in data['similar_abbreviations']] == [3]
+            
+            catalog = ml_service.get_catalog()
+            features = {'department': None, 'search_history': ['programming'], 'common_categories': []}
+            scores = ml_service.calculate_abbreviation_scores(catalog, features)
+            assert scores.argmax() == 0
+            assert catalog.similarity_index('lsa').stats()['mode'] == 'lsa'
+        finally:
+            ml_service.similarity_mode = original_mode
+
+    def test_similar_abbreviations_batch_endpoint(self):
+        """Test the batch endpoint streams one JSON line per text, in order, matching single queries"""
+        from app import app, ml_service
+        
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'},
+            {'id': 2, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator'},
+            {'id': 3, 'abbreviation': 'HR', 'meaning': 'Human Resources'}
+        ]
+        texts = ['human resources', 'programming interface', 'nothing in common']
+        
+        with app.test_client() as client:
+            single = json.loads(client.post('/similar-abbreviations', json={'text': texts[1], 'limit': 3}).data)
+            response = client.post('/similar-abbreviations/batch', json={'texts': texts, 'limit': 3})
+            assert response.mimetype == 'application/x-ndjson'
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+            
+            assert [line['index'] for line in lines] == [0, 1, 2]
+            assert [s['id'] for s in lines[0]['similar_abbreviations']] == [3]
+            assert lines[1]['similar_abbreviations'] == single['similar_abbreviations']
+            assert lines[2]['similar_abbreviations'] == []
+            
+            assert client.post('/similar-abbreviations/batch', json={'texts': []}).status_code == 400
+            assert client.post('/similar-abbreviations/batch', json={'texts': ['ok', '']}).status_code == 400
+            for limit in ('many', None, 0, -3, 10 ** 6):
+                response = client.post('/similar-abbreviations/batch', json={'texts': ['ok'], 'limit': limit})
+                assert response.status_code == 400 and json.loads(response.data)['status'] == 'error'
+
+    def test_check_duplicate_endpoints(self):
+        """Test duplicate checks flag exact and near duplicates, and duplicates within a bulk import"""
+        from app import app, ml_service
+        
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface', 'category': 'IT'},
+            {'id': 2, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator'},
+            {'id': 3, 'abbreviation': 'HR', 'meaning': 'Human Resources'}
+        ]
+        
+        with app.test_client() as client:
+            data = json.loads(client.post('/check-duplicate', json={
+                'abbreviation': 'api', 'meaning': 'application programming  interface'
+            }).data)
+            assert data['exact_duplicate'] is True
+            assert data['duplicates'][0]['id'] == 1 and data['duplicates'][0]['category'] == 'IT'
+            
+            data = json.loads(client.post('/check-duplicate', json={
+                'abbreviation': 'HR', 'meaning': 'Human Resource'
+            }).data)
+            assert data['exact_duplicate'] is False
+            assert [d['id'] for d in data['duplicates']] == [3]
+            assert 0.6 < data['duplicates'][0]['similarity_score'] < 1
+            
+            assert client.post('/check-duplicate', json={'abbreviation': 'HR'}).status_code == 400
+            for bad in ({'limit': 'five'}, {'limit': -1}, {'limit': 10 ** 6}, {'threshold': 'high'}, {'threshold': 2}):
+                response = client.post('/check-duplicate', json=dict(bad, abbreviation='HR', meaning='Human Resources'))
+                assert response.status_code == 400 and json.loads(response.data)['status'] == 'error'
+            
+            items = [
+                {'abbreviation': 'SLA', 'meaning': 'Service Level Agreement'},
+                {'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator'},
+                {'abbreviation': 'SLA', 'meaning': 'Service Level Agreements'}
+            ]
+            response = client.post('/check-duplicate/batch', json={'items': items})
+            assert response.mimetype == 'application/x-ndjson'
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+            
+            assert [line['index'] for line in lines] == [0, 1, 2]
+            assert lines[0]['duplicates'] == [] and lines[0]['batch_duplicates'] == []
+            assert lines[1]['exact_duplicate'] is True and lines[1]['duplicates'][0]['id'] == 2
+            assert [d['index'] for d in lines[2]['batch_duplicates']] == [0]
+            
+            assert client.post('/check-duplicate/batch', json={'items': []}).status_code == 400
+            assert client.post('/check-duplicate/batch', json={'items': [{'abbreviation': 'A'}]}).status_code == 400
+            item = [{'abbreviation': 'API', 'meaning': 'Application Programming Interface'}]
+            for bad in ({'limit': 'five'}, {'limit': -1}, {'limit': 10 ** 6}, {'threshold': 'high'}, {'threshold': 2}):
+                response = client.post('/check-duplicate/batch', json=dict(bad, items=item))
+                assert response.status_code == 400 and json.loads(response.data)['status'] == 'error'
+    
+    def test_request_deadlines(self):
+        """Test requests past their deadline are rejected and shorter budgets cut backend calls and scoring"""
+        from app import app, ml_service
+        from deadlines import DEADLINE_HEADER
+        
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface', 'department': 'IT'},
+            {'id': 2, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator', 'votes_count': 3}
+        ]
+        
+        with app.test_client() as client:
+            response = client.get('/recommendations/trending', headers={DEADLINE_HEADER: '0'})
+            assert response.status_code == 504
+            
+            with patch('requests.get') as mock_get:
+                mock_get.return_value.status_code = 200
+                mock_get.return_value.json.return_value = {'department': 'IT', 'interactions': []}
+                response = client.get('/recommendations/5', headers={DEADLINE_HEADER: '0.5'})
+                assert response.status_code == 200
+                kwargs = mock_get.call_args.kwargs
+                assert 0 < kwargs['timeout'] <= 0.5
+                assert 0 < float(kwargs['headers'][DEADLINE_HEADER]) <= 0.5
+            
+            skipped = ml_service.deadline_stats['similarity_skipped']
+            with patch.object(ml_service, 'similarity_min_budget', 1000):
+                data = json.loads(client.post('/recommendations/5', json={
+                    'user_data': {'department': 'IT', 'interactions': []}
+                }).data)
+            assert [r['id'] for r in data['recommendations']] == [1, 2]
+            assert ml_service.deadline_stats['similarity_skipped'] == skipped + 1
+
+    def test_admission_control_sheds_overflow(self):
+        """Test a saturated endpoint class is shed with Retry-After while other classes keep serving"""
+        from app import app, ml_service
+        from resilience import ConcurrencyLimiter
+        
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [{'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'}]
+        limiter = ConcurrencyLimiter('scoring', max_concurrent=1, max_queue=0)
+        
+        with patch.dict(ml_service.admission, {'scoring': limiter}), app.test_client() as client:
+            held = limiter.acquire()
+            response = client.post('/recommendations/1', json={'user_data': {'department': 'IT'}})
+            assert response.status_code == 429
+            assert int(response.headers['Retry-After']) >= 1
+            assert client.get('/recommendations/trending').status_code == 200
+            
+            stats = json.loads(client.get('/admission').data)['admission']
+            assert stats['scoring']['rejected_queue_full'] == 1 and stats['scoring']['active'] == 1
+            assert stats['read']['active'] == 0
+            
+            limiter.release(held)
+            response = client.post('/recommendations/1', json={'user_data': {'department': 'IT'}})
+            assert response.status_code == 200
+            assert limiter.stats()['active'] == 0
+
+    def test_metrics_endpoint(self):
+        """Test /metrics exposes request and stage latencies, backend outcomes and catalog state"""
+        from app import app, ml_service
+        
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [
+            {'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'},
+            {'id': 2, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator'}
+        ]
+        
+        with app.test_client() as client:
+            # Latency is observed when the WSGI server closes the response
+            client.get('/recommendations/trending').close()
+            client.post('/similar-abbreviations', json={'text': 'programming interface'}).close()
+            with patch('requests.get') as mock_get:
+                mock_get.return_value.status_code = 404
+                client.get('/recommendations/3').close()
+            
+            response = client.get('/metrics')
+            assert response.status_code == 200
+            assert response.content_type.startswith('text/plain; version=0.0.4')
+            text = response.data.decode()
+        
+        assert 'ml_request_duration_seconds_count{route="/recommendations/trending",method="GET",status="200"}' in text
+        assert 'ml_request_duration_seconds_count{route="/recommendations/<int:user_id>",method="GET",status="200"}' in text
+        for stage in ('rank', 'vectorize', 'serialize'):
+            assert f'ml_stage_duration_seconds_count{{stage="{stage}"}}' in text
+        assert 'ml_backend_requests_total{outcome="http_4xx"}' in text
+        assert 'ml_catalog_rows 2' in text
+        assert 'ml_cache_lookups_total{result="miss"}' in text
+        assert '# TYPE ml_cache_saved_cpu_seconds_total counter' in text and '\nml_cache_saved_cpu_seconds_total ' in text
+        assert 'ml_admission_queue_depth{class="scoring"} 0' in text
+
+    def test_streamed_request_latency_includes_the_body(self):
+        """Test streamed batch responses are timed until their last line is produced"""
+        import time
+        from app import app, ml_service
+        
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [{'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'}]
+        
+        def slow_batch(catalog, texts, limit):
+            for _ in texts:
+                time.sleep(0.03)
+                yield []
+        
+        with patch.object(ml_service, 'find_similar_abbreviations_batch', side_effect=slow_batch), \
+                patch.object(ml_service.request_seconds, 'observe') as observe, app.test_client() as client:
+            response = client.post('/similar-abbreviations/batch', json={'texts': ['a', 'b']})
+            assert len(response.data.decode().splitlines()) == 2
+            response.close()
+        
+        seconds, labels = observe.call_args[0][0], observe.call_args[1]
+        assert labels['route'] == '/similar-abbreviations/batch' and labels['status'] == '200'
+        assert seconds >= 0.06
+
+    def test_profiling_endpoints(self, tmp_path):
+        """Test profiling needs the admin token and captures the next N requests to disk"""
+        from app import app, ml_service
+        from profiling import Profiler
+        
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [{'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'}]
+        
+        with app.test_client() as client:
+            assert client.post('/admin/profile', json={'requests': 1}).status_code == 404
+            
+            with patch.object(ml_service, 'profiler', Profiler(str(tmp_path), token='secret')):
+                assert client.post('/admin/profile', json={'requests': 1}).status_code == 403
+                headers = {'X-Admin-Token': 'secret'}
+                assert client.post('/admin/profile', json={'mode': 'perf', 'requests': 1},
+                                   headers=headers).status_code == 400
+                for interval in (0, -1, 0.0001, 'fast'):
+                    assert client.post('/admin/profile', json={'requests': 1, 'interval': interval},
+                                       headers=headers).status_code == 400
+                
+                response = client.post('/admin/profile', json={'mode': 'cprofile', 'requests': 2}, headers=headers)
+                assert response.status_code == 202
+                assert client.post('/admin/profile', json={'seconds': 1}, headers=headers).status_code == 409
+                client.get('/recommendations/trending')
+                client.get('/recommendations/trending')
+                
+                profile = json.loads(client.get('/admin/profile', headers=headers).data)['profiling']['session']
+                assert not profile['running'] and profile['completed_requests'] == 2
+                assert [os.path.basename(path)[-7:] for path in profile['files']] == ['.pstats']
+
+    def test_request_id_is_echoed_and_forwarded(self):
+        """Test a request's X-Request-ID is kept, echoed on the response and sent on backend calls"""
+        from app import app, ml_service
+        
+        ml_service.cache_timestamp = datetime.now()
+        ml_service.abbreviations_cache = [{'id': 1, 'abbreviation': 'API', 'meaning': 'Application Programming Interface'}]
+        
+        with app.test_client() as client:
+            generated = client.get('/recommendations/trending').headers['X-Request-ID']
+            assert len(generated) == 16
+            with patch('requests.get') as mock_get:
+                mock_get.return_value.status_code = 404
+                response = client.get('/recommendations/8', headers={'X-Request-ID': 'trace-8'})
+            assert response.headers['X-Request-ID'] == 'trace-8'
+            assert mock_get.call_args[1]['headers']['X-Request-ID'] == 'trace-8'
@@ -0,0 +1,54 @@
+import math
+import threading
+
+import pytest
+
+from conftest import FakeClock
+from deadlines import NO_DEADLINE, Deadline, DeadlineExceeded, current_deadline, reset_deadline, set_deadline
+
+
+class TestDeadline:
+    """Tests for request deadlines and their propagation"""
+
+    def test_budget_shrinks_and_caps_timeouts(self):
+        clock = FakeClock()
+        deadline = Deadline(2.0, clock=clock)
+
+        assert deadline.timeout(10) == 2.0 and deadline.timeout(0.5) == 0.5
+        clock.now += 1.5
+        assert deadline.remaining() == 0.5 and not deadline.expired()
+        assert deadline.timeout() == 0.5
+
+        clock.now += 1.0
+        assert deadline.expired() and deadline.remaining() == 0.0
+        with pytest.raises(DeadlineExceeded):
+            deadline.timeout(10)
+
+    def test_without_deadline_timeouts_are_unchanged(self):
+        assert NO_DEADLINE.remaining() == math.inf and not NO_DEADLINE.expired()
+        assert NO_DEADLINE.timeout(15) == 15 and NO_DEADLINE.timeout() is None
+
+    def test_from_header(self):
+        clock = FakeClock()
+
+        assert Deadline.from_header('1.5', 30, clock=clock).remaining() == 1.5
+        assert Deadline.from_header(None, 30, clock=clock).remaining() == 30
+        assert Deadline.from_header('soon', 30, clock=clock).remaining() == 30
+        assert Deadline.from_header('inf', 30, clock=clock).remaining() == 30
+        assert Deadline.from_header('-1', 30, clock=clock).expired()
+        assert Deadline.from_header(None, clock=clock).remaining() == math.inf
+
+    def test_current_deadline_is_per_request_and_not_inherited_by_threads(self):
+        assert current_deadline() is NO_DEADLINE
+        deadline = Deadline(5)
+        token = set_deadline(deadline)
+        try:
+            seen = []
+            thread = threading.Thread(target=lambda: seen.append(current_deadline()))
+            thread.start()
+            thread.join()
+            assert current_deadline() is deadline
+            assert seen == [NO_DEADLINE]
+        finally:
+            reset_deadline(token)
+        assert current_deadline() is NO_DEADLINE
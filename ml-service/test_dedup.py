@@ -0,0 +1,133 @@
+import random
+
+import numpy as np
+
+from dedup import DuplicateIndex, duplicate_key, earlier_duplicates, gram_postings, minhash_signatures, universal_hashes
+from text_index import char_ngrams
+
+
+ABBREVIATIONS = ['API', 'URL', 'HR', 'API', 'APR']
+MEANINGS = [
+    'Application Programming Interface',
+    'Uniform Resource Locator',
+    'Human Resources',
+    'Application Programing Interfaces',
+    'Annual Percentage Rate',
+]
+
+
+def random_phrases(count, seed=0):
+    rng = random.Random(seed)
+    words = [''.join(rng.choice('bcdfghklmnprstvz') + rng.choice('aeiou') for _ in range(rng.randint(2, 4)))
+             for _ in range(3000)]
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(2, 4))) for _ in range(count)]
+
+
+def trigram_cosine(a, b):
+    a, b = char_ngrams(' '.join(duplicate_key(*a))), char_ngrams(' '.join(duplicate_key(*b)))
+    return len(a & b) / np.sqrt(len(a) * len(b)) if a and b else 0.0
+
+
+class TestDuplicateIndex:
+    """Tests for the exact-key / MinHash LSH duplicate index"""
+
+    def index(self):
+        return DuplicateIndex(ABBREVIATIONS, MEANINGS)
+
+    def test_exact_duplicate_ignores_case_and_spacing(self):
+        rows, scores, exact = self.index().check(' api ', 'application  programming INTERFACE')
+
+        assert rows.tolist()[0] == 0 and exact.tolist()[0]
+        assert scores[0] == 1.0
+        assert not exact[1:].any()
+
+    def test_near_duplicates_ranked_by_trigram_cosine(self):
+        rows, scores, exact = self.index().check('API', 'Aplication Programming Interface', k=None, threshold=0.3)
+
+        assert set(rows[:2].tolist()) == {0, 3}
+        assert not exact.any()
+        assert np.all(np.diff(scores) <= 0)
+        expected = trigram_cosine(('API', 'Aplication Programming Interface'), (ABBREVIATIONS[0], MEANINGS[0]))
+        assert abs(scores[rows.tolist().index(0)] - expected) < 1e-6
+
+    def test_threshold_and_unrelated_submissions(self):
+        index = self.index()
+
+        assert len(index.check('XYZ', 'Something else entirely')[0]) == 0
+        assert all(score > 0.95 for score in index.check('API', 'Application Programming Interfac', threshold=0.95)[1])
+        assert len(index.check('', '')[0]) == 0
+
+    def test_batch_matches_single_checks(self):
+        index = self.index()
+        abbreviations = ['api', 'URL', 'HR', 'new']
+        meanings = ['Application Programming Interface', 'Uniform Resource Locators', 'Human Resource', 'entry']
+
+        results = list(index.check_batch(abbreviations, meanings, block_size=3))
+        assert len(results) == 4
+        for (a, m), (rows, scores, exact) in zip(zip(abbreviations, meanings), results):
+            single = index.check(a, m)
+            assert rows.tolist() == single[0].tolist()
+            assert np.allclose(scores, single[1]) and exact.tolist() == single[2].tolist()
+
+    def test_lsh_finds_perturbed_rows_among_many(self):
+        meanings = random_phrases(5000)
+        index = DuplicateIndex(['X'] * len(meanings), meanings)
+
+        found = [row in index.check('x', meanings[row][:-1] + 'e', k=10)[0].tolist() for row in range(0, 5000, 50)]
+        assert np.mean(found) >= 0.95
+
+    def test_earlier_duplicates_match_pairwise_checks(self):
+        abbreviations = ['API', 'URL', 'api', 'API', 'URL', 'HR', 'API ', 'URLs']
+        meanings = ['Application Programming Interface', 'Uniform Resource Locator',
+                    'application programming interface', 'Aplication Programming Interface',
+                    'Uniform Resource Locators', 'Human Resources', 'Application Programming Interface',
+                    'Uniform Resource Locators']
+
+        for limit in (0, 1, 2, 5):
+            for row, ((rows, scores, exact), (all_rows, all_scores, all_exact)) in enumerate(
+                zip(earlier_duplicates(abbreviations, meanings, limit, 0.5),
+                    DuplicateIndex(abbreviations, meanings).check_batch(abbreviations, meanings, None, 0.5))
+            ):
+                before = all_rows < row
+                assert rows.tolist() == all_rows[before][:limit].tolist()
+                assert np.allclose(scores, all_scores[before][:limit])
+                assert exact.tolist() == all_exact[before][:limit].tolist()
+
+    def test_earlier_duplicates_of_repeated_entries_are_capped(self):
+        results = list(earlier_duplicates(['API'] * 5000, ['Application Programming Interface'] * 5000, 3))
+
+        assert [rows.tolist() for rows, _, _ in results[:4]] == [[], [0], [0, 1], [0, 1, 2]]
+        assert all(rows.tolist() == [0, 1, 2] and exact.all() for rows, _, exact in results[4:])
+        assert DuplicateIndex(['API'] * 5000, ['api'] * 5000)._exact_rows(duplicate_key('api', 'API'), 2) == [0, 1]
+
+    def test_empty_index(self):
+        index = DuplicateIndex([], [])
+
+        rows, scores, exact = index.check('API', 'Application Programming Interface')
+        assert len(rows) == len(scores) == len(exact) == 0
+        assert index.stats()['items'] == 0
+
+
+class TestMinHash:
+    """Tests for the trigram postings and MinHash signatures"""
+
+    def test_unseen_grams_get_ids_past_the_vocabulary(self):
+        vocabulary = {}
+        gram_postings(['abcd'], vocabulary, extend=True)
+        indptr, ids = gram_postings(['abcx', 'bcx'], vocabulary)
+
+        assert len(vocabulary) == 2
+        assert indptr.tolist() == [0, 2, 3]
+        assert sorted(ids.tolist()) == [vocabulary['abc'], 2, 2]
+
+    def test_signature_agreement_estimates_jaccard(self):
+        vocabulary = {}
+        indptr, ids = gram_postings(['the quick brown fox jumps', 'the quick brown cat jumps', 'xy'], vocabulary, True)
+        rng = np.random.RandomState(0)
+        multipliers = rng.randint(1, 2 ** 31 - 1, size=512).astype(np.uint64)
+        offsets = rng.randint(0, 2 ** 31 - 1, size=512).astype(np.uint64)
+
+        signatures = minhash_signatures(indptr, ids, lambda grams: universal_hashes(grams, multipliers, offsets), 512)
+        a, b = char_ngrams('the quick brown fox jumps'), char_ngrams('the quick brown cat jumps')
+        assert abs(np.mean(signatures[0] == signatures[1]) - len(a & b) / len(a | b)) < 0.08
+        assert np.all(signatures[2] == 2 ** 31 - 1)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from factorization import ImplicitALS
+
+
+def two_cluster_interactions():
+    """Users 0-9 use items 100-104, users 10-19 use items 200-204"""
+    users, items = [], []
+    for user in range(20):
+        base = 100 if user < 10 else 200
+        for offset in range(5):
+            if (user + offset) % 5:  # each user misses one item of their cluster
+                users.append(user)
+                items.append(base + offset)
+    return np.array(users), np.array(items), np.ones(len(users))
+
+
+class TestImplicitALS:
+    """Tests for the implicit-feedback ALS recommender"""
+
+    def test_conjugate_gradient_matches_exact_solution(self):
+        model = ImplicitALS(factors=4, regularization=0.1, cg_steps=20)
+        rng = np.random.default_rng(0)
+        confidence = sparse.random(6, 8, density=0.5, format='csr', random_state=0, dtype=np.float32)
+        confidence.data = 1.0 + 10.0 * confidence.data
+        fixed = rng.standard_normal((8, 4)).astype(np.float32)
+
+        approx = model._least_squares(confidence, fixed, np.zeros((6, 4), dtype=np.float32))
+
+        dense = confidence.toarray()
+        for row in range(6):
+            c = np.where(dense[row] > 0, dense[row], 1.0)
+            p = (dense[row] > 0).astype(np.float64)
+            a = fixed.T @ np.diag(c) @ fixed + 0.1 * np.eye(4)
+            exact = np.linalg.solve(a, fixed.T @ (c * p))
+            assert approx[row] == pytest.approx(exact, abs=1e-3)
+
+    def test_recommends_missing_item_from_own_cluster(self):
+        users, items, weights = two_cluster_interactions()
+        model = ImplicitALS(factors=4, iterations=15, min_user_interactions=3).fit(users, items, weights)
+
+        # User 1 skipped item 104; it should rank first once seen items are excluded
+        seen = items[users == 1].tolist()
+        item_ids, scores = model.recommend(1, k=3, exclude_ids=seen)
+        assert item_ids[0] == 104
+        assert not set(item_ids.tolist()) & set(seen)
+        assert list(scores) == sorted(scores, reverse=True)
+
+    def test_unknown_and_sparse_users(self):
+        users, items, weights = two_cluster_interactions()
+        model = ImplicitALS(factors=4, iterations=2, min_user_interactions=5).fit(users, items, weights)
+        assert not model.has_user(999)
+        assert not model.has_user(1)  # only 4 interactions
+        item_ids, _ = model.recommend(999)
+        assert len(item_ids) == 0
+
+    def test_factors_are_contiguous_float32(self):
+        users, items, weights = two_cluster_interactions()
+        model = ImplicitALS(factors=4, iterations=2).fit(users, items, weights)
+        assert model.item_factors.dtype == np.float32
+        assert model.item_factors.flags['C_CONTIGUOUS']
+
+    def test_save_and_load_roundtrip(self, tmp_path):
+        users, items, weights = two_cluster_interactions()
+        model = ImplicitALS(factors=4, iterations=2, min_user_interactions=3).fit(users, items, weights)
+        path = str(tmp_path / 'als.npz')
+        model.save(path)
+
+        loaded = ImplicitALS.load(path)
+        assert loaded.version == model.version
+        assert loaded.has_user(1)
+        np.testing.assert_array_equal(loaded.recommend(1)[0], model.recommend(1)[0])
+        assert (loaded.seen != model.seen).nnz == 0
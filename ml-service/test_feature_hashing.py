@@ -0,0 +1,82 @@
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from feature_hashing import HashingFeatureStore, HashingSimilarityIndex
+
+TEXTS = [
+    'api application programming interface',
+    'url uniform resource locator',
+    'hr human resources department',
+    'rad rapid application development',
+    'crm customer relationship management',
+]
+
+
+def sync_index(store, ids, texts):
+    return HashingSimilarityIndex(store, store.sync(ids, texts))
+
+
+class TestHashingSimilarityIndex:
+    """Tests for hashed TF-IDF similarity with incremental document frequencies"""
+
+    def test_matches_tfidf_cosine(self):
+        index = sync_index(HashingFeatureStore(), range(5), TEXTS)
+        query = 'application development'
+
+        vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2)).fit(TEXTS)
+        expected = cosine_similarity(vectorizer.transform([query]), vectorizer.transform(TEXTS)).ravel()
+        np.testing.assert_allclose(index.scores(query), expected, atol=1e-6)
+        assert index.nearest(query, 1)[0].tolist() == [3]
+
+    def test_replicas_produce_identical_vectors(self):
+        first = sync_index(HashingFeatureStore(), range(5), TEXTS)
+        # Built in a different order, one abbreviation at a time
+        store = HashingFeatureStore()
+        for i in reversed(range(5)):
+            store.add(i, TEXTS[i])
+        second = HashingSimilarityIndex(store, store.sync(range(5), TEXTS))
+
+        np.testing.assert_allclose(first.scores('human resources'), second.scores('human resources'), atol=1e-6)
+
+    def test_incremental_sync_matches_full_build(self):
+        store = HashingFeatureStore()
+        store.sync([1, 2, 3], TEXTS[:3])
+        ids, texts = [4, 2, 3, 5], [TEXTS[3], 'hr human resources', TEXTS[2], TEXTS[4]]
+        incremental = sync_index(store, ids, texts)
+        full = sync_index(HashingFeatureStore(), ids, texts)
+
+        assert store.stats()['documents'] == 4
+        assert store.stats()['retired_slots'] == 2  # id 1 removed, id 2 changed
+        for query in ['application', 'human resources', 'customer management']:
+            np.testing.assert_allclose(incremental.scores(query), full.scores(query), atol=1e-6)
+
+    def test_unchanged_rows_are_not_revectorized(self):
+        store = HashingFeatureStore()
+        first = store.sync(range(5), TEXTS)
+        second = store.sync(range(5), TEXTS)
+
+        assert first.tolist() == second.tolist()
+        assert store.stats()['slots'] == 5
+
+    def test_snapshots_are_unaffected_by_later_updates(self):
+        store = HashingFeatureStore()
+        index = sync_index(store, range(5), TEXTS)
+        before = index.scores('application')
+        store.sync([10, 11], ['application server', 'application layer'])
+
+        np.testing.assert_array_equal(index.scores('application'), before)
+
+    def test_compaction_keeps_live_rows(self):
+        store = HashingFeatureStore()
+        for round_number in range(3):
+            ids = range(round_number * 1000, round_number * 1000 + 600)
+            index = sync_index(store, ids, [f"term{i} word{i % 7}" for i in ids])
+
+        assert store.stats()['slots'] < 1800
+        assert index.nearest('term2005', 1)[0].tolist() == [5]
+
+    def test_empty_query(self):
+        index = sync_index(HashingFeatureStore(), range(5), TEXTS)
+
+        assert index.scores('the and').tolist() == [0.0] * 5
@@ -0,0 +1,63 @@
+import math
+
+from metrics import Histogram, MetricsRegistry, format_value
+
+
+def parse(text):
+    """{'name{labels}': value} for every sample line of a text exposition"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            key, value = line.rsplit(' ', 1)
+            samples[key] = float(value)
+    return samples
+
+
+class TestMetricsRegistry:
+    """Tests for the in-process Prometheus-style metrics"""
+
+    def test_counters_by_label(self):
+        registry = MetricsRegistry()
+        calls = registry.counter('backend_requests_total', 'Backend calls', ('outcome',))
+        calls.inc(outcome='success')
+        calls.inc(2, outcome='success')
+        calls.inc(outcome='timeout')
+
+        text = registry.render()
+        assert '# TYPE ml_backend_requests_total counter' in text
+        samples = parse(text)
+        assert samples['ml_backend_requests_total{outcome="success"}'] == 3
+        assert samples['ml_backend_requests_total{outcome="timeout"}'] == 1
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('ml_stage_seconds', 'Stages', ('stage',), buckets=(0.01, 0.1, 1.0))
+        for value in (0.005, 0.01, 0.05, 0.5, 3.0):
+            histogram.observe(value, stage='score')
+        with histogram.time(stage='rank'):
+            pass
+
+        samples = {name + labels: value for name, labels, value in histogram.samples()}
+        assert [samples[f'ml_stage_seconds_bucket{{stage="score",le="{le}"}}'] for le in ('0.01', '0.1', '1.0', '+Inf')] \
+            == [2, 3, 4, 5]
+        assert samples['ml_stage_seconds_count{stage="score"}'] == 5
+        assert math.isclose(samples['ml_stage_seconds_sum{stage="score"}'], 3.565)
+        assert samples['ml_stage_seconds_count{stage="rank"}'] == 1
+
+    def test_collected_metrics_are_read_on_render(self):
+        registry = MetricsRegistry()
+        state = {'rows': 3}
+        registry.collected('catalog_rows', 'Catalog rows', lambda: {(): state['rows']})
+        registry.collected('model_info', 'Model', lambda: {('v"1',): 1}, labelnames=('version',))
+        registry.collected('broken', 'Raises', lambda: 1 / 0)
+
+        state['rows'] = 5
+        text = registry.render()
+        samples = parse(text)
+        assert samples['ml_catalog_rows'] == 5
+        assert samples['ml_model_info{version="v\\"1"}'] == 1
+        assert 'ml_broken' not in text and registry.errors == 1
+
+    def test_value_formatting(self):
+        assert format_value(3) == '3' and format_value(True) == '1'
+        assert format_value(0.25) == '0.25' and format_value(None) == 'NaN'
+        assert format_value(math.inf) == '+Inf'
@@ -0,0 +1,84 @@
+import pytest
+import numpy as np
+
+from conftest import FakeClock
+from popularity import DecayedCounters
+
+
+class TestDecayedCounters:
+    """Tests for streaming time-decayed popularity counters"""
+
+    def test_track_unknown_id_is_dropped(self):
+        """Events for abbreviations outside the catalog are counted as dropped"""
+        counters = DecayedCounters(clock=FakeClock())
+        counters.reindex([1, 2])
+
+        assert counters.track(3, 'view') is False
+        assert counters.track(None, 'view') is False
+        assert counters.stats()['dropped'] == 2
+
+    def test_counts_decay_per_window(self):
+        """Each window decays with its own time constant"""
+        clock = FakeClock()
+        counters = DecayedCounters(clock=clock)
+        counters.reindex([10, 20])
+
+        counters.track(10, 'view')
+        clock.now += 3600
+
+        counts = counters.snapshot()
+        assert counts.shape == (3, 2)
+        assert counts[0, 0] == pytest.approx(np.exp(-1.0))
+        assert counts[1, 0] == pytest.approx(np.exp(-1.0 / 24))
+        assert counts[:, 1].sum() == 0
+
+    def test_interaction_weights(self):
+        """Votes weigh more than views"""
+        clock = FakeClock()
+        counters = DecayedCounters(clock=clock)
+        counters.reindex([1, 2])
+
+        counters.track(1, 'view')
+        counters.track(2, 'vote')
+
+        scores = counters.scores()
+        assert scores[1] > scores[0] > 0
+
+    def test_reindex_carries_over_counts(self):
+        """Counts follow ids when the catalog order changes"""
+        counters = DecayedCounters(clock=FakeClock())
+        counters.reindex([1, 2, 3])
+        counters.track(2, 'vote')
+
+        counters.reindex([3, 2, 4])
+
+        scores = counters.scores()
+        assert scores[1] > 0
+        assert scores[0] == 0 and scores[2] == 0
+
+    def test_rebase_preserves_values(self):
+        """Moving the landmark does not change decayed counts"""
+        clock = FakeClock()
+        counters = DecayedCounters(clock=clock)
+        counters.reindex([1])
+        counters.track(1, 'view')
+
+        clock.now += 3600 * 60
+        counters.track(1, 'view')
+
+        assert counters.landmark == clock.now
+        assert counters.snapshot()[2, 0] == pytest.approx(1.0 + np.exp(-60 / 168))
+
+    def test_single_window_scores(self):
+        """Ranking can be restricted to one window"""
+        clock = FakeClock()
+        counters = DecayedCounters(clock=clock)
+        counters.reindex([1, 2])
+        counters.track(1, 'view')
+        clock.now += 86400
+        counters.track(2, 'view')
+
+        hourly = counters.scores(window='1h')
+        weekly = counters.scores(window='7d')
+        assert hourly[1] > hourly[0]
+        assert weekly[1] > weekly[0] > 0
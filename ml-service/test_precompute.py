@@ -0,0 +1,97 @@
+import time
+
+import numpy as np
+
+from factorization import ImplicitALS
+from precompute import PrecomputedStore, precompute_top_n, seen_matrix
+
+
+def trained_model():
+    rng = np.random.default_rng(0)
+    users = rng.integers(0, 40, 400)
+    items = rng.integers(100, 130, 400)
+    return ImplicitALS(factors=8, iterations=3).fit(users, items, np.ones(len(users))), users, items
+
+
+class TestPrecomputeTopN:
+    """Tests for chunked batch top-N computation"""
+
+    def test_matches_per_user_recommend(self):
+        model, _, _ = trained_model()
+        user_ids, items, scores = precompute_top_n(model, top_n=5, chunk_size=7, workers=3)
+
+        assert items.shape == (len(model.user_ids), 5)
+        for row, user_id in enumerate(user_ids.tolist()):
+            expected_items, expected_scores = model.recommend(user_id, 5)
+            np.testing.assert_array_equal(items[row], expected_items)
+            np.testing.assert_allclose(scores[row], expected_scores, rtol=1e-5)
+
+    def test_training_interactions_are_kept_with_the_model(self, tmp_path):
+        model, users, items = trained_model()
+        model.save(str(tmp_path / 'als.npz'))
+        loaded = ImplicitALS.load(str(tmp_path / 'als.npz'))
+
+        # A fresh process has no interaction log; the saved training pairs still exclude seen items
+        user_ids, top_items, _ = precompute_top_n(loaded, top_n=30, seen=loaded.seen + seen_matrix(loaded, [], []))
+        for row, user_id in enumerate(user_ids.tolist()):
+            assert not set(items[users == user_id].tolist()) & set(top_items[row][top_items[row] >= 0].tolist())
+
+    def test_seen_items_are_excluded(self):
+        model, users, items = trained_model()
+        seen = seen_matrix(model, users, items)
+        user_ids, top_items, _ = precompute_top_n(model, top_n=30, seen=seen)
+
+        for row, user_id in enumerate(user_ids.tolist()):
+            own = set(items[users == user_id].tolist())
+            recommended = set(top_items[row][top_items[row] >= 0].tolist())
+            assert not own & recommended
+
+
+class TestPrecomputedStore:
+    """Tests for the memory-mapped precomputed recommendation store"""
+
+    def test_write_and_lookup(self, tmp_path):
+        store = PrecomputedStore(str(tmp_path))
+        store.write(np.array([7, 3]), np.array([[1, 2, -1], [4, 5, 6]]),
+                    np.array([[0.9, 0.8, -np.inf], [0.7, 0.6, 0.5]], dtype=np.float32))
+
+        item_ids, scores = store.lookup(7)
+        assert item_ids.tolist() == [1, 2]
+        assert store.lookup(3)[0].tolist() == [4, 5, 6]
+        assert store.lookup(99) is None
+
+        reopened = PrecomputedStore(str(tmp_path))
+        assert reopened.load() is True
+        assert isinstance(reopened.items, np.memmap)
+        assert reopened.lookup(7)[0].tolist() == [1, 2]
+
+    def test_stale_entries_are_not_served(self, tmp_path):
+        store = PrecomputedStore(str(tmp_path), max_age=60)
+        store.write(np.array([1]), np.array([[5]]), np.array([[0.5]], dtype=np.float32))
+        store.meta['generated_at'] = time.time() - 120
+        assert store.lookup(1) is None
+        assert store.stats()['fresh'] is False
+
+    def test_old_versions_are_cleaned_up(self, tmp_path):
+        store = PrecomputedStore(str(tmp_path), keep_versions=2)
+        for run in range(4):
+            store.write(np.array([run]), np.array([[run]]), np.array([[0.5]], dtype=np.float32))
+            time.sleep(0.01)
+        versions = [p for p in tmp_path.iterdir() if p.is_dir()]
+        assert len(versions) <= 2
+        assert store.lookup(3) is not None
+
+    def test_runs_published_elsewhere_are_picked_up(self, tmp_path):
+        reader = PrecomputedStore(str(tmp_path), check_interval=0)
+        writer = PrecomputedStore(str(tmp_path))
+        assert reader.lookup(1) is None
+
+        writer.write(np.array([1]), np.array([[5]]), np.array([[0.5]], dtype=np.float32))
+        assert reader.lookup(1)[0].tolist() == [5]
+        first = reader.version
+
+        # Runs in the same second get distinct versions instead of overwriting mapped files
+        writer.write(np.array([1]), np.array([[6]]), np.array([[0.5]], dtype=np.float32))
+        assert reader.lookup(1)[0].tolist() == [6]
+        assert reader.version != first
+        assert not [p for p in tmp_path.iterdir() if p.name.endswith('.tmp')]
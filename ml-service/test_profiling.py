@@ -0,0 +1,97 @@
+import pstats
+import threading
+import time
+
+import pytest
+
+from profiling import Profiler, ProfilingSession, collapse
+
+
+def busy_work(seconds):
+    ends_at = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < ends_at:
+        total += sum(range(100))
+    return total
+
+
+class TestProfiling:
+    """Tests for on-demand sampled and cProfile captures"""
+
+    def test_collapse_is_root_first(self):
+        def inner():
+            import sys
+            return collapse(sys._getframe())
+
+        stack = inner().split(';')
+        assert stack[-1].startswith('inner (test_profiling.py:')
+        assert stack[-2].startswith('test_collapse_is_root_first (test_profiling.py:')
+
+    def test_sampled_capture_ends_after_requests(self, tmp_path):
+        session = ProfilingSession(str(tmp_path), mode='sample', requests=2, interval=0.001)
+        session.start()
+        for _ in range(2):
+            token = session.request_started()
+            busy_work(0.05)
+            session.request_finished(token)
+
+        assert session.wait(1) and not session.running
+        assert session.completed_requests == 2
+        [path] = session.files
+        assert path.endswith('.collapsed')
+        with open(path) as f:
+            lines = f.read().splitlines()
+        # Only the request thread is sampled, and every line is "stack count"
+        assert any('busy_work (test_profiling.py:' in line for line in lines)
+        assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+    def test_cprofile_capture_with_allocations(self, tmp_path):
+        session = ProfilingSession(str(tmp_path), mode='cprofile', requests=3, allocations=True)
+        session.start()
+        kept = []
+        for _ in range(3):
+            token = session.request_started()
+            kept.append([bytearray(1000) for _ in range(100)])
+            busy_work(0.001)
+            session.request_finished(token)
+
+        assert session.wait(1)
+        pstats_path, allocations_path = session.files
+        stats = pstats.Stats(pstats_path)
+        assert any(name == 'busy_work' for _, _, name in stats.stats)
+        with open(allocations_path) as f:
+            assert 'test_profiling.py' in f.read()
+
+    def test_timed_capture_stops_by_itself(self, tmp_path):
+        session = ProfilingSession(str(tmp_path), mode='sample', seconds=0.05, all_threads=True, interval=0.001)
+        session.start()
+        worker = threading.Thread(target=busy_work, args=(0.1,))
+        worker.start()
+        assert session.wait(1)
+        worker.join()
+        assert session.status()['samples'] > 0 and len(session.files) == 1
+
+    def test_profiler_runs_one_capture_at_a_time(self, tmp_path):
+        profiler = Profiler(str(tmp_path))
+        assert not profiler.enabled
+        assert profiler.request_started() is None
+
+        with pytest.raises(ValueError):
+            profiler.start(mode='sample')
+        with pytest.raises(ValueError):
+            profiler.start(mode='perf', seconds=1)
+        for interval in (0, -0.01, 0.0001, float('nan')):
+            with pytest.raises(ValueError):
+                profiler.start(seconds=1, interval=interval)
+
+        session = profiler.start(seconds=60)
+        assert profiler.start(seconds=1) is None
+        token = profiler.request_started()
+        profiler.request_finished(token)
+        assert profiler.stop() is session and not session.running
+        assert profiler.status()['session']['completed_requests'] == 1
+
+        # A finished capture is dropped by the next request, so the hooks are idle again
+        assert profiler.request_started() is None and profiler.session is None
+        assert profiler.start(requests=1) is not None
+        profiler.stop()
@@ -0,0 +1,66 @@
+import numpy as np
+
+from scipy import sparse
+
+from ranking import sparse_batch_top_k, top_k, top_k_rows, top_k_sparse_rows
+
+
+class TestTopK:
+    """Tests for the shared top-k selection utility"""
+
+    def test_matches_stable_full_sort(self):
+        rng = np.random.default_rng(0)
+        scores = rng.integers(0, 20, size=500).astype(np.float64)
+        for k in (1, 5, 10, 499, 500, 600):
+            expected = np.argsort(-scores, kind='stable')[:k]
+            np.testing.assert_array_equal(top_k(scores, k), expected)
+
+    def test_mask_and_threshold(self):
+        scores = np.array([0.5, 0.9, 0.05, 0.7, 0.3])
+        mask = np.array([True, False, True, True, True])
+        assert top_k(scores, 3, mask=mask).tolist() == [3, 0, 4]
+        assert top_k(scores, 5, threshold=0.1).tolist() == [1, 3, 0, 4]
+
+    def test_skips_non_finite_scores(self):
+        scores = np.array([np.nan, -np.inf, 1.0, np.inf])
+        assert top_k(scores, 4).tolist() == [2]
+
+    def test_empty_inputs(self):
+        assert top_k(np.array([]), 5).tolist() == []
+        assert top_k(np.array([1.0, 2.0]), 0).tolist() == []
+
+
+class TestTopKRows:
+    """Tests for row-wise top-k on score matrices"""
+
+    def test_row_wise_selection(self):
+        scores = np.array([[0.1, 0.9, 0.5], [0.3, -np.inf, 0.8]], dtype=np.float32)
+        indices, values = top_k_rows(scores, 2)
+        assert indices.tolist() == [[1, 2], [2, 0]]
+        np.testing.assert_allclose(values, [[0.9, 0.5], [0.8, 0.3]])
+
+    def test_k_larger_than_columns(self):
+        indices, values = top_k_rows(np.zeros((2, 3)), 10)
+        assert indices.shape == (2, 3)
+
+
+class TestSparseTopK:
+    """Tests for top-k over sparse score matrices"""
+
+    def test_rows_match_dense_top_k(self):
+        scores = sparse.random(20, 50, density=0.3, random_state=0, format='csr')
+        dense = scores.toarray()
+        for row, (columns, values) in enumerate(top_k_sparse_rows(scores, 4, threshold=0.2)):
+            expected = top_k(np.where(dense[row] != 0, dense[row], np.nan), 4, threshold=0.2)
+            assert columns.tolist() == expected.tolist()
+            np.testing.assert_allclose(values, dense[row][expected])
+
+    def test_blocked_product_matches_unblocked(self):
+        queries = sparse.random(30, 40, density=0.2, random_state=1, format='csr')
+        items = sparse.random(100, 40, density=0.2, random_state=2, format='csr')
+        blocked = list(sparse_batch_top_k(queries, items, 5, block_size=7))
+        whole = list(top_k_sparse_rows(queries @ items.T, 5))
+
+        assert len(blocked) == 30
+        for (a, _), (b, _) in zip(blocked, whole):
+            assert a.tolist() == b.tolist()
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from conftest import FakeClock
+from resilience import CircuitBreaker, CircuitOpenError, ConcurrencyLimiter, Overloaded
+
+
+def failing():
+    raise ConnectionError("backend down")
+
+
+def timing_out():
+    raise TimeoutError("caller gave up")
+
+
+class TestCircuitBreaker:
+    """Tests for the failure-rate circuit breaker"""
+
+    def breaker(self, **options):
+        clock = FakeClock()
+        return CircuitBreaker('backend', window=10, min_calls=4, reset_timeout=30, clock=clock, **options), clock
+
+    def test_opens_once_failure_rate_is_reached(self):
+        breaker, _ = self.breaker(failure_rate=0.5)
+        for _ in range(3):
+            breaker.call(lambda: 'ok')
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                breaker.call(failing)
+        assert breaker.stats()['state'] == 'closed'
+
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+        assert breaker.stats()['state'] == 'open'
+
+        with pytest.raises(CircuitOpenError) as error:
+            breaker.call(lambda: 'ok')
+        assert error.value.retry_after == 30
+        assert breaker.stats()['rejected'] == 1 and breaker.stats()['opened'] == 1
+
+    def test_needs_min_calls_before_opening(self):
+        breaker, _ = self.breaker()
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                breaker.call(failing)
+        assert breaker.allow()
+
+    def test_results_can_count_as_failures(self):
+        breaker, _ = self.breaker(failure_rate=1.0)
+        for status in (503, 500, 502, 504):
+            assert breaker.call(lambda: status, is_failure=lambda result: result >= 500) == status
+        assert breaker.stats()['state'] == 'open'
+
+    def test_half_open_probe_closes_or_reopens(self):
+        breaker, clock = self.breaker(failure_rate=1.0)
+        for _ in range(4):
+            breaker.record_failure()
+        assert not breaker.allow()
+
+        clock.now = 31
+        assert breaker.allow()
+        assert not breaker.allow()  # only one probe at a time
+        breaker.record_failure()
+        assert breaker.stats()['state'] == 'open' and breaker.retry_after() == 30
+
+        clock.now = 62
+        assert breaker.call(lambda: 'ok') == 'ok'
+        assert breaker.stats()['state'] == 'closed' and breaker.stats()['failure_rate'] == 0.0
+        assert breaker.allow() and breaker.allow()
+
+    def test_ignored_errors_are_not_counted(self):
+        breaker, clock = self.breaker(failure_rate=1.0)
+        for _ in range(4):
+            breaker.record_failure()
+        clock.now = 31
+
+        with pytest.raises(TimeoutError):
+            breaker.call(timing_out, ignore=(TimeoutError,))
+        assert breaker.stats()['state'] == 'half_open' and breaker.stats()['failures'] == 4
+        # The cancelled probe's slot is free again
+        assert breaker.allow()
+
+
+class TestConcurrencyLimiter:
+    """Tests for bounded concurrency with a priority-ordered wait queue"""
+
+    def wait_for_queue(self, limiter, depth):
+        while limiter.stats()['queue_depth'] < depth:
+            time.sleep(0.001)
+
+    def test_sheds_when_queue_is_full(self):
+        limiter = ConcurrencyLimiter('scoring', max_concurrent=2, max_queue=0)
+        limiter.acquire()
+        limiter.acquire()
+
+        with pytest.raises(Overloaded) as error:
+            limiter.acquire()
+        assert error.value.status == 429 and error.value.retry_after >= 1
+
+        limiter.release()
+        limiter.acquire()
+        assert limiter.stats()['admitted'] == 3 and limiter.stats()['rejected_queue_full'] == 1
+
+    def test_queued_calls_time_out(self):
+        limiter = ConcurrencyLimiter('read', max_concurrent=1, max_queue=4, queue_timeout=5)
+        limiter.acquire()
+
+        started = time.monotonic()
+        with pytest.raises(Overloaded) as error:
+            limiter.acquire(timeout=0.02)
+        assert error.value.status == 503 and time.monotonic() - started < 1
+        assert limiter.stats()['queue_depth'] == 0 and limiter.stats()['rejected_timeout'] == 1
+
+    def test_waiters_are_admitted_by_priority_then_arrival(self):
+        limiter = ConcurrencyLimiter('scoring', max_concurrent=1, max_queue=4, queue_timeout=5)
+        held = limiter.acquire()
+        order = []
+
+        def waiter(name, priority):
+            acquired_at = limiter.acquire(priority)
+            order.append(name)
+            limiter.release(acquired_at)
+
+        threads = []
+        for depth, (name, priority) in enumerate([('batch', 2), ('interactive', 1), ('batch-2', 2), ('urgent', 0)]):
+            threads.append(threading.Thread(target=waiter, args=(name, priority)))
+            threads[-1].start()
+            self.wait_for_queue(limiter, depth + 1)
+        limiter.release(held)
+        for thread in threads:
+            thread.join()
+
+        assert order == ['urgent', 'interactive', 'batch', 'batch-2']
+        assert limiter.stats()['active'] == 0 and limiter.stats()['queued'] == 4
@@ -0,0 +1,167 @@
+import numpy as np
+import pytest
+from sklearn.metrics.pairwise import cosine_similarity
+
+from similarity import (
+    LsaSimilarityIndex, SimilarityIndexStore, SparseSimilarityIndex, build_similarity_index, build_vectorizer
+)
+
+TEXTS = [
+    'api application programming interface',
+    'url uniform resource locator',
+    'hr human resources department',
+    'rad rapid application development',
+    'crm customer relationship management',
+]
+
+
+def topic_texts(rows=300, seed=0):
+    """Rows drawn from a few disjoint topic vocabularies"""
+    rng = np.random.RandomState(seed)
+    topics = [[f"{name}{i}" for i in range(12)] for name in ('net', 'fin', 'med', 'law')]
+    return [' '.join(rng.choice(topics[row % 4], 6)) for row in range(rows)]
+
+
+class TestSparseSimilarityIndex:
+    """Tests for the prebuilt TF-IDF similarity index"""
+
+    def test_matches_refit_cosine_for_in_vocabulary_queries(self):
+        index = SparseSimilarityIndex(TEXTS)
+        query = 'application development'
+
+        matrix = build_vectorizer(1000).fit(TEXTS).transform(TEXTS + [query])
+        expected = cosine_similarity(matrix[-1], matrix[:-1]).ravel()
+        np.testing.assert_allclose(index.scores(query), expected, rtol=1e-5)
+        assert index.scores(query).argmax() == 3
+
+    def test_empty_vocabulary(self):
+        index = SparseSimilarityIndex(['the', 'and'])
+
+        assert index.scores('the').tolist() == [0.0, 0.0]
+        assert index.stats()['nnz'] == 0
+
+
+class TestLsaSimilarityIndex:
+    """Tests for the dense LSA similarity index"""
+
+    def test_small_vocabulary_keeps_exact_tfidf(self):
+        lsa = LsaSimilarityIndex(TEXTS, dimensions=512)
+        sparse = SparseSimilarityIndex(TEXTS)
+
+        assert lsa.explained_variance == 1.0
+        np.testing.assert_allclose(lsa.scores('human resources'), sparse.scores('human resources'), atol=1e-6)
+
+    def test_vectors_are_contiguous_and_normalised(self):
+        index = LsaSimilarityIndex(topic_texts(), dimensions=8)
+
+        assert index.vectors.shape == (300, 8)
+        assert index.vectors.dtype == np.float32
+        assert index.vectors.flags['C_CONTIGUOUS']
+        np.testing.assert_allclose(np.linalg.norm(index.vectors, axis=1), 1.0, rtol=1e-5)
+
+    def test_scores_rank_same_topic_first(self):
+        texts = topic_texts()
+        index = LsaSimilarityIndex(texts, dimensions=8)
+
+        top = np.argsort(-index.scores('net1 net2 net3'))[:20]
+        assert all(row % 4 == 0 for row in top)
+        assert index.scores('unknown words').tolist() == [0.0] * len(texts)
+
+    def test_float16_matches_float32(self):
+        texts = topic_texts()
+        single = LsaSimilarityIndex(texts, dimensions=8)
+        half = LsaSimilarityIndex(texts, dimensions=8, dtype=np.float16)
+
+        assert half.vectors.dtype == np.float16
+        assert half.nbytes() < single.nbytes()
+        np.testing.assert_allclose(half.scores('fin1 fin5'), single.scores('fin1 fin5'), atol=2e-3)
+
+
+class TestApproximateNearest:
+    """Tests for LSA nearest-neighbour queries through the IVF index"""
+
+    def test_nearest_matches_exact_with_all_probes(self):
+        index = LsaSimilarityIndex(topic_texts(), dimensions=8)
+        exact_rows, exact_scores = index.nearest('net1 net2', 5)
+
+        index.build_ann(probes=1000)
+        rows, scores = index.nearest('net1 net2', 5)
+        assert sorted(rows.tolist()) == sorted(exact_rows.tolist())
+        np.testing.assert_allclose(scores, exact_scores, rtol=1e-5)
+
+    def test_small_catalogs_skip_the_ann_index(self):
+        assert build_similarity_index(topic_texts(), 'lsa', dimensions=8, ann_min_items=1000).ann is None
+        assert build_similarity_index(topic_texts(), 'lsa', dimensions=8, ann_min_items=100).ann is not None
+
+
+class TestSimilarityIndexStore:
+    """Tests for persisted similarity indexes"""
+
+    def test_saved_index_is_loaded_instead_of_refitted(self, tmp_path):
+        store = SimilarityIndexStore(str(tmp_path))
+        texts = topic_texts()
+        built = build_similarity_index(texts, 'lsa', dimensions=8, ann_min_items=100, store=store)
+        loaded = build_similarity_index(texts, 'lsa', dimensions=8, ann_min_items=100, store=store)
+
+        assert store.stats() == {'loads': 1, 'saves': 1, 'errors': 0}
+        assert loaded is not built and loaded.ann is not None
+        np.testing.assert_array_equal(loaded.vectors, built.vectors)
+        assert loaded.nearest('fin1', 3)[0].tolist() == built.nearest('fin1', 3)[0].tolist()
+
+    def test_key_depends_on_texts_and_settings(self, tmp_path):
+        store = SimilarityIndexStore(str(tmp_path))
+
+        assert store.key(TEXTS, 'lsa', dimensions=8) == store.key(list(TEXTS), 'lsa', dimensions=8)
+        assert store.key(TEXTS, 'lsa', dimensions=8) != store.key(TEXTS, 'lsa', dimensions=16)
+        assert store.key(TEXTS, 'tfidf') != store.key(TEXTS[:-1], 'tfidf')
+
+    def test_corrupt_entry_is_rebuilt(self, tmp_path):
+        store = SimilarityIndexStore(str(tmp_path))
+        key = store.key(TEXTS, 'tfidf')
+        (tmp_path / key).mkdir()
+        (tmp_path / key / 'index.pkl').write_bytes(b'not a pickle')
+
+        assert build_similarity_index(TEXTS, 'tfidf', store=store).scores('api').argmax() == 0
+        assert store.stats()['errors'] == 1
+        assert store.load(key) is not None
+
+    def test_old_versions_are_removed(self, tmp_path):
+        store = SimilarityIndexStore(str(tmp_path), keep_versions=2)
+        for i in range(4):
+            build_similarity_index(TEXTS[:i + 1], 'tfidf', store=store)
+
+        assert len(list(tmp_path.iterdir())) == 2
+
+
+class TestBatchQueries:
+    """Batch queries must return what the same queries would one at a time"""
+
+    QUERIES = ['net1 net2', 'fin3', 'unknown words', 'med4 law5 med6', 'law1']
+
+    def assert_batch_matches_single(self, index):
+        results = list(index.nearest_batch(self.QUERIES, 5, threshold=0.1, block_size=2))
+        assert len(results) == len(self.QUERIES)
+        for query, (rows, scores) in zip(self.QUERIES, results):
+            expected_rows, expected_scores = index.nearest(query, 5, threshold=0.1)
+            assert sorted(rows.tolist()) == sorted(expected_rows.tolist()), query
+            np.testing.assert_allclose(np.sort(scores), np.sort(expected_scores), rtol=1e-4, atol=1e-6)
+
+    def test_sparse(self):
+        self.assert_batch_matches_single(SparseSimilarityIndex(topic_texts()))
+
+    def test_lsa_exact_and_ann(self):
+        index = LsaSimilarityIndex(topic_texts(), dimensions=8)
+        self.assert_batch_matches_single(index)
+        index.build_ann(probes=4, n_lists=10)
+        self.assert_batch_matches_single(index)
+
+    def test_hashing(self):
+        self.assert_batch_matches_single(build_similarity_index(topic_texts(), 'hashing'))
+
+
+def test_build_similarity_index_modes():
+    assert build_similarity_index(TEXTS).mode == 'tfidf'
+    assert build_similarity_index(TEXTS, 'lsa', dimensions=4).stats()['dimensions'] == 4
+    assert build_similarity_index(TEXTS, 'hashing', ids=[5, 4, 3, 2, 1]).nearest('human resources', 1)[0].tolist() == [2]
+    with pytest.raises(ValueError):
+        build_similarity_index(TEXTS, 'bm25')
@@ -0,0 +1,105 @@
+import pytest
+
+from sketches import CountMinSketch, HyperLogLog, InteractionAnalytics
+
+
+class TestCountMinSketch:
+    """Tests for the Count-Min frequency sketch"""
+
+    def test_dimensions_follow_error_bounds(self):
+        cms = CountMinSketch(epsilon=0.01, delta=0.01)
+        assert cms.width == 272
+        assert cms.depth == 5
+
+    def test_never_underestimates(self):
+        cms = CountMinSketch(epsilon=0.01, delta=0.01)
+        for key in range(500):
+            cms.add(key, count=key % 7 + 1)
+
+        for key in range(500):
+            true_count = key % 7 + 1
+            assert true_count <= cms.estimate(key) <= true_count + 0.01 * cms.total * 3
+
+    def test_merge_requires_same_parameters(self):
+        a = CountMinSketch(epsilon=0.01, seed=1)
+        b = CountMinSketch(epsilon=0.01, seed=1)
+        a.add('x', 3)
+        b.add('x', 2)
+        a.merge(b)
+        assert a.estimate('x') >= 5
+        with pytest.raises(ValueError):
+            a.merge(CountMinSketch(epsilon=0.01, seed=2))
+
+
+class TestHyperLogLog:
+    """Tests for the HyperLogLog distinct counter"""
+
+    def test_small_cardinality_is_exact_enough(self):
+        hll = HyperLogLog(precision=12)
+        for user in range(100):
+            hll.add(user)
+            hll.add(user)
+        assert abs(hll.count() - 100) <= 3
+
+    def test_large_cardinality_within_error(self):
+        hll = HyperLogLog(precision=12)
+        for user in range(50000):
+            hll.add(f"user-{user}")
+        assert abs(hll.count() - 50000) / 50000 < 0.05
+
+    def test_merge_is_union(self):
+        a, b = HyperLogLog(10), HyperLogLog(10)
+        for user in range(0, 3000):
+            a.add(user)
+        for user in range(2000, 5000):
+            b.add(user)
+        a.merge(b)
+        assert abs(a.count() - 5000) / 5000 < 0.1
+
+    def test_precision_for_error(self):
+        assert HyperLogLog.precision_for_error(0.01) == 14
+        with pytest.raises(ValueError):
+            HyperLogLog(precision=2)
+
+
+class TestInteractionAnalytics:
+    """Tests for the combined interaction analytics sketches"""
+
+    def test_record_and_read(self):
+        analytics = InteractionAnalytics(epsilon=0.01)
+        for user in range(20):
+            analytics.record(user, 1, 'Technology')
+        analytics.record(1, 2, 'Business')
+
+        assert analytics.interaction_count(1) >= 20
+        assert abs(analytics.unique_users(1) - 20) <= 2
+        assert analytics.unique_users() == 20
+        assert abs(analytics.unique_users_by_category('technology') - 20) <= 2
+        assert analytics.heavy_hitters(1) == [(1, analytics.interaction_count(1))]
+
+    def test_keyed_counters_are_bounded(self):
+        analytics = InteractionAnalytics(epsilon=0.01, max_keys=2)
+        for abbr_id in range(5):
+            analytics.record(1, abbr_id)
+        assert analytics.stats()['tracked_abbreviations'] == 2
+        assert analytics.stats()['untracked_keys'] == 3
+
+    def test_snapshot_merge_across_replicas(self):
+        replica_a = InteractionAnalytics(epsilon=0.01)
+        replica_b = InteractionAnalytics(epsilon=0.01)
+        for user in range(10):
+            replica_a.record(user, 7, 'IT')
+        for user in range(5, 15):
+            replica_b.record(user, 7, 'IT')
+
+        replica_a.merge_snapshot(replica_b.snapshot())
+
+        assert replica_a.interaction_count(7) >= 20
+        assert abs(replica_a.unique_users(7) - 15) <= 2
+        assert abs(replica_a.unique_users_by_category('IT') - 15) <= 2
+
+    def test_merge_rejects_incompatible_snapshot(self):
+        replica_a = InteractionAnalytics(epsilon=0.01)
+        replica_b = InteractionAnalytics(epsilon=0.001)
+        with pytest.raises(ValueError):
+            replica_a.merge_snapshot(replica_b.snapshot())
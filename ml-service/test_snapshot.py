@@ -0,0 +1,132 @@
+import os
+
+import numpy as np
+
+from catalog import Catalog, StringColumn
+from collaborative import ItemItemModel
+from interactions import InteractionLog
+from similarity import SparseSimilarityIndex
+from snapshot import CatalogSnapshotStore
+
+
+RECORDS = [
+    {'id': 7, 'abbreviation': 'API', 'meaning': 'Application Programming Interface', 'description': 'Contract',
+     'category': 'IT', 'department': 'Engineering', 'votes_count': 5, 'comments_count': 2,
+     'created_at': '2024-01-01T00:00:00Z'},
+    {'id': 3, 'abbreviation': 'HR', 'meaning': 'Human Resources', 'description': 'Osoblje i zapošljavanje',
+     'category': 'Business', 'department': None, 'votes_count': 1},
+    {'id': 11, 'abbreviation': 'URL', 'meaning': 'Uniform Resource Locator', 'category': 'IT'},
+]
+
+
+def item_model():
+    log = InteractionLog(100)
+    for user, item in [(1, 7), (1, 3), (2, 7), (2, 3), (2, 11), (3, 11), (3, 7)]:
+        log.append(user, item, 'view')
+    model = ItemItemModel(top_n=5)
+    model.update(log)
+    return model
+
+
+class TestStringColumn:
+    """Tests for the UTF-8 buffer backed text column"""
+
+    def test_round_trips_strings(self):
+        values = ['API', '', 'Osoblje i zapošljavanje', '日本']
+        column = StringColumn.from_strings(values)
+
+        assert len(column) == 4
+        assert list(column) == values
+        assert [column[i] for i in range(4)] == values
+        assert column[-1] == '日本' and column[1:3] == values[1:3]
+        assert column.nbytes() == column.buffer.nbytes + column.offsets.nbytes
+
+
+class TestCatalogSnapshotStore:
+    """Tests for the versioned, memory-mapped catalog snapshot store"""
+
+    def test_round_trip_is_memory_mapped(self, tmp_path):
+        catalog = Catalog.from_records(RECORDS)
+        catalog.trending = (np.array([0.5, 0.1, 0.2]), 1000.0)
+        index = SparseSimilarityIndex(catalog.similarity_text)
+        store = CatalogSnapshotStore(str(tmp_path))
+
+        version = store.write(catalog, index, item_model())
+        snapshot = store.load()
+
+        assert snapshot.version == version == store.stats()['current']
+        loaded = snapshot.catalog
+        assert list(loaded.records()) == list(catalog.records())
+        assert isinstance(loaded.ids, np.memmap) and isinstance(loaded.meanings, StringColumn)
+        assert loaded.rows_for([3, 11, 99]).tolist() == [1, 2, -1]
+        np.testing.assert_array_equal(loaded.trending[0], [0.5, 0.1, 0.2])
+        assert loaded.memory_usage()['total'] > 0
+
+        np.testing.assert_allclose(snapshot.similarity_index.scores('human resources'), index.scores('human resources'))
+        assert not snapshot.similarity_index.matrix.data.flags.owndata
+
+        restored = ItemItemModel()
+        restored.load_state(*snapshot.item_state)
+        assert restored.neighbours(7) == item_model().neighbours(7)
+
+    def test_new_versions_replace_current_and_old_ones_are_removed(self, tmp_path):
+        store = CatalogSnapshotStore(str(tmp_path), keep_versions=2)
+        versions = []
+        for rows in (1, 2, 3):
+            versions.append(store.write(Catalog.from_records(RECORDS[:rows])))
+
+        assert len(store.load().catalog) == 3
+        assert len(set(versions)) == 3
+        assert len([name for name in os.listdir(tmp_path) if os.path.isdir(tmp_path / name)]) <= 2
+
+    def test_missing_or_unreadable_snapshot(self, tmp_path):
+        store = CatalogSnapshotStore(str(tmp_path))
+        assert store.load() is None
+
+        version = store.write(Catalog.from_records(RECORDS))
+        os.remove(tmp_path / version / 'ids.npy')
+        assert store.load() is None
+        assert store.stats()['errors'] == 1
+
+    def test_empty_catalog(self, tmp_path):
+        store = CatalogSnapshotStore(str(tmp_path))
+        store.write(Catalog.from_records([]), SparseSimilarityIndex([]))
+
+        snapshot = store.load()
+        assert len(snapshot.catalog) == 0
+        assert snapshot.similarity_index.matrix is None
+
+
+class TestSnapshotSharing:
+    """Tests for the refresh lease and generation counter workers on one host coordinate through"""
+
+    def test_one_refresher_per_directory(self, tmp_path):
+        first, second = CatalogSnapshotStore(str(tmp_path)), CatalogSnapshotStore(str(tmp_path))
+
+        assert first.acquire_refresh() and first.acquire_refresh()
+        assert not second.acquire_refresh()
+        first.release_refresh()
+        assert second.acquire_refresh()
+        assert second.stats()['refresher'] and not first.stats()['refresher']
+        second.release_refresh()
+
+    def test_followers_see_new_generations(self, tmp_path):
+        refresher, follower = CatalogSnapshotStore(str(tmp_path)), CatalogSnapshotStore(str(tmp_path))
+        assert follower.published() == 0 and not follower.changed()
+
+        refresher.write(Catalog.from_records(RECORDS[:2]))
+        assert follower.changed() and not refresher.changed()
+        assert len(follower.load().catalog) == 2
+        assert not follower.changed()
+
+        refresher.write(Catalog.from_records(RECORDS))
+        assert follower.published() == refresher.stats()['generation'] == 2
+        assert len(follower.load().catalog) == 3
+
+    def test_broken_publish_is_not_retried(self, tmp_path):
+        refresher, follower = CatalogSnapshotStore(str(tmp_path)), CatalogSnapshotStore(str(tmp_path))
+        version = refresher.write(Catalog.from_records(RECORDS))
+        os.remove(tmp_path / version / 'meta.json')
+
+        assert follower.load() is None
+        assert not follower.changed()
@@ -0,0 +1,92 @@
+import io
+import logging
+
+from structured_logging import (
+    AsyncHandler, KeyValueFormatter, StructuredLogger, configure_logging, parse_sample_rates,
+    request_id_from_header, reset_request_id, set_request_id
+)
+
+
+def capture(name):
+    """A logger whose records are kept in a list, bypassing the root handlers"""
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger, records
+
+
+class TestStructuredLogging:
+    """Tests for key-value, sampled and asynchronous logging"""
+
+    def test_key_value_lines(self):
+        formatter = KeyValueFormatter()
+        record = logging.makeLogRecord({
+            'name': 'app', 'levelno': logging.INFO, 'levelname': 'INFO', 'msg': 'catalog.cached',
+            'fields': {'rows': 3, 'error': 'bad "value"', 'empty': ''}, 'request_id': 'abc'
+        })
+        line = formatter.format(record)
+        assert line.split(' ', 1)[1] == (
+            'INFO app request_id=abc event=catalog.cached rows=3 error="bad \\"value\\"" empty=""'
+        )
+
+        plain = logging.makeLogRecord({'name': 'app', 'levelname': 'ERROR', 'msg': 'Failed: %s', 'args': ('x y',)})
+        assert formatter.format(plain).endswith('request_id=- msg="Failed: x y"')
+
+    def test_disabled_levels_and_sampling_skip_records(self):
+        logger, records = capture('test.structured.sampling')
+        log = StructuredLogger(logger, parse_sample_rates('hot=0,warm=0.5,bad=x'))
+        assert log.sample_rates == {'hot': 0.0, 'warm': 0.5}
+
+        log.debug('verbose', value=1)
+        for _ in range(10):
+            log.info('hot', value=1)
+        log.info('cold', value=2)
+        assert [(r.msg, r.fields) for r in records] == [('cold', {'value': 2})]
+        assert log.stats()['sampled_out'] == {'hot': 10}
+
+        for _ in range(200):
+            log.info('warm')
+        warm = [r for r in records if r.msg == 'warm']
+        assert 40 < len(warm) < 160 and warm[0].fields == {'sample_rate': 0.5}
+
+    def test_async_handler_captures_request_id_and_drops_when_full(self):
+        handler = AsyncHandler(maxsize=2)
+        logger = logging.getLogger('test.structured.async')
+        logger.handlers = [handler]
+        logger.propagate = False
+
+        token = set_request_id('req-1')
+        try:
+            StructuredLogger(logger).info('first')
+        finally:
+            reset_request_id(token)
+        logger.info('second')
+        logger.info('third')
+
+        first, second = handler.queue.get_nowait(), handler.queue.get_nowait()
+        assert (first.request_id, second.request_id) == ('req-1', '-')
+        assert handler.dropped == 1
+
+    def test_configure_logging_writes_from_a_listener(self):
+        root = logging.getLogger()
+        before = list(root.handlers), root.level
+        stream = io.StringIO()
+        root.handlers = [h for h in root.handlers if not isinstance(h, AsyncHandler)]
+        try:
+            handler = configure_logging('INFO', stream=stream)
+            assert configure_logging('DEBUG') is handler
+            StructuredLogger(logging.getLogger('test.structured.configure')).info('ready', workers=2)
+            handler.close()
+            assert 'test.structured.configure request_id=- event=ready workers=2' in stream.getvalue()
+        finally:
+            root.handlers, root.level = before
+
+    def test_request_id_from_header(self):
+        assert request_id_from_header('abc-123') == 'abc-123'
+        for value in (None, '', 'has space', 'new\nline', 'x' * 65):
+            generated = request_id_from_header(value)
+            assert generated != value and len(generated) == 16
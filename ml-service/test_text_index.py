@@ -0,0 +1,73 @@
+import random
+
+import numpy as np
+
+from text_index import TextIndex, build_postings, char_ngrams
+
+
+TEXTS = [
+    'api application programming interface',
+    'url uniform resource locator',
+    'hr human resources',
+    'rapid application development',
+    'it information technology',
+]
+
+
+class TestTextIndex:
+    """Tests for the token / trigram inverted index"""
+
+    def test_matches_substring_scan(self):
+        """Every query returns exactly the rows a brute-force `in` scan would"""
+        rng = random.Random(0)
+        words = ['api', 'rapid', 'capital', 'data', 'database', 'base', 'it', 'hr', 'x']
+        texts = [' '.join(rng.choice(words) for _ in range(rng.randint(1, 4))) for _ in range(300)]
+        index = TextIndex(texts)
+
+        queries = words + ['ap', 'a', 'ata', 'pital', 'data base', 'api rap', 'zzz', ' api', 'base ', '']
+        for query in queries:
+            expected = [row for row, text in enumerate(texts) if query in text]
+            assert index.rows(query).tolist() == expected, query
+
+    def test_case_insensitive_and_sorted(self):
+        index = TextIndex(TEXTS)
+
+        rows = index.rows('APPLICATION')
+        assert rows.tolist() == [0, 3]
+        assert rows.dtype == np.int32
+
+    def test_partial_words_match(self):
+        """Substring semantics: 'api' also matches inside 'rapid'"""
+        index = TextIndex(TEXTS)
+
+        assert index.rows('api').tolist() == [0, 3]
+        assert index.rows('source').tolist() == [1, 2]
+        assert index.rows('human res').tolist() == [2]
+        assert index.rows('missing').tolist() == []
+
+    def test_short_terms_use_vocabulary_scan(self):
+        index = TextIndex(TEXTS)
+
+        assert index.rows('it').tolist() == [4]
+        assert index.rows('it').tolist() == [4]  # served from the short-term cache
+        assert 'it' in index._short_cache
+
+    def test_stats(self):
+        stats = TextIndex(TEXTS).stats()
+
+        assert stats['rows'] == 5
+        assert stats['tokens'] > 0 and stats['grams'] > 0
+        assert stats['postings_bytes'] > 0
+
+
+class TestHelpers:
+    """Tests for posting-list construction helpers"""
+
+    def test_build_postings(self):
+        indptr, indices = build_postings([1, 0, 1, 2], [10, 20, 30, 40], 3)
+        assert indptr.tolist() == [0, 1, 3, 4]
+        assert indices.tolist() == [20, 10, 30, 40]
+
+    def test_char_ngrams(self):
+        assert char_ngrams('abcd') == {'abc', 'bcd'}
+        assert char_ngrams('ab') == set()
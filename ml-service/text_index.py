@@ -0,0 +1,145 @@
+import numpy as np
+
+GRAM_SIZE = 3
+_EMPTY = np.empty(0, dtype=np.int32)
+
+
+def char_ngrams(text, n=GRAM_SIZE):
+    """Distinct character n-grams of a string"""
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def build_postings(keys, values, n_keys):
+    """CSR posting lists (indptr, indices) from parallel key/value lists, values kept in insertion order"""
+    keys = np.asarray(keys, dtype=np.int64)
+    order = np.argsort(keys, kind='stable')
+    indptr = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_keys), out=indptr[1:])
+    return indptr, np.asarray(values, dtype=np.int32)[order]
+
+
+def intersect_all(arrays):
+    """Intersection of sorted unique integer arrays, smallest first"""
+    arrays = sorted(arrays, key=len)
+    result = arrays[0]
+    for array in arrays[1:]:
+        if not len(result):
+            break
+        result = np.intersect1d(result, array, assume_unique=True)
+    return result
+
+
+class TextIndex:
+    """Inverted index answering substring queries over a fixed list of lowercased texts
+
+    Rows are posted under their whitespace tokens, and the token vocabulary is
+    itself indexed by character trigrams. A query piece is resolved to the
+    vocabulary tokens containing it (trigram intersection, then verification),
+    whose row postings are merged; multi-word queries intersect per-piece rows
+    and verify the candidates. `rows(term)` therefore returns exactly the rows
+    where `term.lower() in text`, as a sorted int32 array.
+    """
+
+    def __init__(self, texts, short_cache_size=4096):
+        self.texts = texts
+        self.short_cache_size = short_cache_size
+        self._short_cache = {}
+
+        vocabulary = {}
+        token_keys, token_rows = [], []
+        for row, text in enumerate(texts):
+            for token in set(text.split()):
+                token_keys.append(vocabulary.setdefault(token, len(vocabulary)))
+                token_rows.append(row)
+        self.vocabulary = list(vocabulary)
+        self.token_indptr, self.token_rows = build_postings(token_keys, token_rows, len(self.vocabulary))
+
+        grams = {}
+        gram_keys, gram_tokens = [], []
+        for token_id, token in enumerate(self.vocabulary):
+            for gram in char_ngrams(token):
+                gram_keys.append(grams.setdefault(gram, len(grams)))
+                gram_tokens.append(token_id)
+        self.grams = grams
+        self.gram_indptr, self.gram_tokens = build_postings(gram_keys, gram_tokens, len(grams))
+
+    def __len__(self):
+        return len(self.texts)
+
+    def token_postings(self, token_id):
+        return self.token_rows[self.token_indptr[token_id]:self.token_indptr[token_id + 1]]
+
+    def gram_postings(self, gram):
+        slot = self.grams.get(gram)
+        if slot is None:
+            return _EMPTY
+        return self.gram_tokens[self.gram_indptr[slot]:self.gram_indptr[slot + 1]]
+
+    def matching_tokens(self, piece, starts=False, ends=False):
+        """Vocabulary token ids containing `piece` (a string without whitespace)
+
+        `starts` / `ends` additionally require the token to start / end with it.
+        """
+        if len(piece) >= GRAM_SIZE:
+            candidates = intersect_all([self.gram_postings(gram) for gram in char_ngrams(piece)])
+            token_ids = [token_id for token_id in candidates.tolist() if piece in self.vocabulary[token_id]]
+        else:
+            # Too short for trigrams: scan the vocabulary once and remember the answer
+            token_ids = self._short_cache.get(piece)
+            if token_ids is None:
+                token_ids = [token_id for token_id, token in enumerate(self.vocabulary) if piece in token]
+                if len(self._short_cache) >= self.short_cache_size:
+                    self._short_cache.clear()
+                self._short_cache[piece] = token_ids
+
+        if starts:
+            token_ids = [token_id for token_id in token_ids if self.vocabulary[token_id].startswith(piece)]
+        if ends:
+            token_ids = [token_id for token_id in token_ids if self.vocabulary[token_id].endswith(piece)]
+        return token_ids
+
+    def piece_rows(self, piece, starts=False, ends=False):
+        token_ids = np.asarray(self.matching_tokens(piece, starts, ends), dtype=np.int64)
+        if not len(token_ids):
+            return _EMPTY
+        if len(token_ids) == 1:
+            return self.token_postings(token_ids[0])
+
+        # Gather all posting slices at once, then de-duplicate through a row mask
+        starts = self.token_indptr[token_ids]
+        lengths = self.token_indptr[token_ids + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions = offsets + np.arange(int(lengths.sum()))
+        mask = np.zeros(len(self.texts), dtype=bool)
+        mask[self.token_rows[positions]] = True
+        return np.flatnonzero(mask).astype(np.int32)
+
+    def rows(self, term):
+        """Sorted rows whose text contains `term` (case-insensitive substring match)"""
+        term = term.lower()
+        pieces = term.split()
+        if not pieces:
+            if term:
+                return np.array([row for row, text in enumerate(self.texts) if term in text], dtype=np.int32)
+            return np.arange(len(self.texts), dtype=np.int32)
+
+        # Pieces bordered by whitespace in the term must start / end a token in the text
+        last = len(pieces) - 1
+        candidates = intersect_all([
+            self.piece_rows(piece, starts=i > 0 or term[0].isspace(), ends=i < last or term[-1].isspace())
+            for i, piece in enumerate(pieces)
+        ])
+        if len(pieces) == 1 and term == pieces[0]:
+            return candidates
+        return np.array([row for row in candidates.tolist() if term in self.texts[row]], dtype=np.int32)
+
+    def nbytes(self):
+        return self.token_indptr.nbytes + self.token_rows.nbytes + self.gram_indptr.nbytes + self.gram_tokens.nbytes
+
+    def stats(self):
+        return {
+            'rows': len(self),
+            'tokens': len(self.vocabulary),
+            'grams': len(self.grams),
+            'postings_bytes': self.nbytes(),
+        }